@@ -93,6 +93,9 @@ class SEOTesting:
             self.summary.update({"{} passing: ".format(module.modulename): passing})
             self.summary.update({"{} errors: ".format(module.modulename): len(errors)})
 
+            for key, value in module.summary.items():
+                self.summary.update({"{} {}: ".format(module.modulename, key): value})
+
             if errors:
                 _LOG.error("Run Errors:" + json.dumps(errors, indent=2))
 
@@ -89,7 +89,7 @@ class Config:
 
                 if self.module:
                     if self.module in self.modules:
-                        modules = config.pop("modules_activated")
+                        modules = config["modules_activated"]
                         self.__setattr__(self.module, Config())
                         for name, value in modules[self.module].items():
                             self.__getattribute__(self.module).__setattr__(name, value)
@@ -34,6 +34,7 @@ import multiprocessing as mp
 import numpy as np
 
 from seodeploy.lib.config import Config
+from seodeploy.lib.exceptions import IncorrectConfigException
 
 CONFIG = Config()
 
@@ -156,7 +157,138 @@ def to_dot(data):
     return [".".join(x) for x in iter_dot(data, [], [])]
 
 
-def process_page_data(sample_paths, prod_result, stage_result, module_config):
+def get_environments(module_config, required=()):
+    """Named environments of a module, baseline first.
+
+    Without `environments` in the module config, these are `prod` and `stage`.  Their
+    settings come from the module settings starting with `prod_` and `stage_`, so
+    `prod_host` is the `host` of `prod`, and `stage_auth_user` the `auth_user` of
+    `stage`.
+
+    Configured `environments` are rendered along with `prod`.  Each is a host, or a dict
+    with `host` and other environment settings.  Left empty, `prod` and `stage` keep
+    their default settings.  `baseline_environment` (default: `prod`) is the one every
+    other environment is compared against.
+
+    Parameters
+    ----------
+    module_config: Config
+        Module config.
+    required: tuple
+        Settings every environment needs besides `host`, eg. `site_id`.
+
+    Returns
+    -------
+    dict
+        In format: {'<name>': {'host': <str>, ...}, ...}
+
+    """
+
+    defaults = {name: {} for name in ("prod", "stage")}
+
+    for key, value in vars(module_config).items():
+        name, _, setting = key.partition("_")
+        if name in defaults and setting:
+            defaults[name][setting] = value
+
+    configured = getattr(module_config, "environments", None)
+
+    if configured:
+        environments = {"prod": defaults["prod"]}
+        for name, settings in configured.items():
+            if not settings:
+                settings = defaults.get(name, {})
+            elif isinstance(settings, str):
+                settings = {"host": settings}
+
+            if not settings.get("host"):
+                raise IncorrectConfigException(
+                    "Environment `{}` needs a `host`.".format(name)
+                )
+
+            environments[name] = {**settings, "host": settings["host"].strip(" /")}
+    else:
+        environments = defaults
+
+    for name, settings in environments.items():
+        for setting in required:
+            if not settings.get(setting):
+                raise IncorrectConfigException(
+                    "Environment `{}` needs a `{}`.".format(name, setting)
+                )
+
+    baseline = getattr(module_config, "baseline_environment", None) or "prod"
+
+    if baseline not in environments:
+        raise IncorrectConfigException(
+            "Unknown baseline_environment `{}`. Options: {}".format(
+                baseline, ", ".join(environments)
+            )
+        )
+
+    return {baseline: environments[baseline], **environments}
+
+
+def environment_auth(environments, url):
+    """Basic auth user and password of the environment `url` belongs to, if any."""
+
+    for settings in environments.values():
+        username = settings.get("auth_user")
+        password = settings.get("auth_pass")
+
+        if username and password and settings["host"] in url:
+            return (username, password)
+
+    return None
+
+
+def process_environment_data(sample_paths, results, module_config):
+    """Pairs the results of each environment with those of the baseline environment.
+
+    Parameters
+    ----------
+    sample_paths: list
+        List of Paths.
+    results: dict
+        Results of each environment, by name.
+        Fmt: {'<name>': [{'path': '/', 'page_data':{}, 'error': None}, ...], ...}
+    module_config: Config
+        Module config.
+
+    Returns
+    -------
+    dict
+        `process_page_data` output of each environment compared with the baseline, in
+        which the baseline is `prod` and the environment `stage`.
+        Fmt: {'<name>': {'<path>': {'prod': <data>, 'stage': <data>, 'error': error}}}
+
+    """
+
+    environments = get_environments(module_config)
+    baseline = next(iter(environments))
+
+    return {
+        name: process_page_data(
+            sample_paths,
+            results[baseline],
+            results[name],
+            module_config,
+            prod_host=environments[baseline]["host"],
+            stage_host=settings["host"],
+        )
+        for name, settings in environments.items()
+        if name != baseline
+    }
+
+
+def process_page_data(
+    sample_paths,
+    prod_result,
+    stage_result,
+    module_config,
+    prod_host=None,
+    stage_host=None,
+):
 
     """Reviews the returned results for errors and formats result.
 
@@ -172,6 +304,10 @@ def process_page_data(sample_paths, prod_result, stage_result, module_config):
         Fmt: [{'path': '/', 'page_data':{}, 'error': None}, ...]
     module_config: Config
         Module config.
+    prod_host: str
+        Host of the compared environment.  Defaults to `prod_host`.
+    stage_host: str
+        Host of the environment compared.  Defaults to `stage_host`.
 
     Returns
     -------
@@ -184,14 +320,15 @@ def process_page_data(sample_paths, prod_result, stage_result, module_config):
 
     result = {}
 
-    prod_data = list_to_dict(prod_result.copy(), "path")
-    stage_data = list_to_dict(stage_result.copy(), "path")
+    # Records are copied, as the baseline result is shared by every environment.
+    prod_data = list_to_dict([dict(r) for r in prod_result], "path")
+    stage_data = list_to_dict([dict(r) for r in stage_result], "path")
 
     for path in sample_paths:
         error = prod_data[path]["error"] or stage_data[path]["error"]
 
         stg_page_data = maybe_replace_staging(
-            stage_data[path]["page_data"], module_config
+            stage_data[path]["page_data"], module_config, prod_host, stage_host
         )
         prod_page_data = prod_data[path]["page_data"]
 
@@ -200,13 +337,15 @@ def process_page_data(sample_paths, prod_result, stage_result, module_config):
     return result
 
 
-def maybe_replace_staging(page_data, module_config):
+def maybe_replace_staging(page_data, module_config, prod_host=None, stage_host=None):
     """Replace host in JSON data if configured."""
 
     if module_config.replace_staging_host:
         json_data = json.dumps(page_data)
         json_data = re.sub(
-            re.escape(module_config.stage_host), module_config.prod_host, json_data
+            re.escape(stage_host or module_config.stage_host),
+            prod_host or module_config.prod_host,
+            json_data,
         )
         return json.loads(json_data)
 
@@ -52,6 +52,7 @@ class ModuleBase:
         """
         self.messages = None
         self.passing = None
+        self.summary = {}
         self.modulename = None
         self.exclusions = None
         self.sample_paths = sample_paths
@@ -150,13 +151,53 @@ class ModuleBase:
             _LOG.error(error)
             raise IncorrectConfigException(error)
 
-    def prepare_messages(self, diffs):
+    def run_environments(self, environment_data):
+        """Run diffs of each environment against the baseline environment.
+
+        Parameters
+        ----------
+        environment_data: dict
+            Page data of each environment, by name, as returned by
+            `process_environment_data`.
+
+        Returns
+        -------
+        tuple
+            messages, errors.  Both name their environment when several environments
+            are compared.
+
+        """
+
+        messages = []
+        errors = []
+
+        for environment, page_data in environment_data.items():
+
+            name = environment if len(environment_data) > 1 else None
+
+            diffs, env_errors = self.run_diffs(page_data)
+            self.annotate_diffs(diffs, page_data)
+
+            messages.extend(self.prepare_messages(diffs, environment=name))
+            errors.extend(
+                {**error, "environment": name} if name else error
+                for error in env_errors
+            )
+
+        return messages, errors
+
+    def annotate_diffs(self, diffs, page_data):
+        """Hook for modules to add details to diffs before messages are prepared."""
+
+    def prepare_messages(self, diffs, environment=None):
         """ Prepares Diff data as consistent messages.
 
         Parameters
         ----------
         diffs: list
             In format: [{'path': <str>, 'diffs': <list>}, ...].
+        environment: str
+            Name of the compared environment, added to each message if given.
 
         Returns
         -------
@@ -178,6 +219,9 @@ class ModuleBase:
                 # Add module and path
                 item_diff.update({"module": self.modulename, "path": path})
 
+                if environment:
+                    item_diff["environment"] = environment
+
                 messages.append(item_diff)
 
         return messages
@@ -30,7 +30,12 @@ import pytz
 
 from seodeploy.lib.modules import ModuleBase
 from seodeploy.lib.config import Config
-from seodeploy.modules.contentking.functions import run_contentking, load_report
+from seodeploy.lib.helpers import get_environments
+from seodeploy.modules.contentking.functions import (
+    ENVIRONMENT_SETTINGS,
+    run_contentking,
+    load_report,
+)
 from seodeploy.modules.contentking.exceptions import ContentSamplingError
 
 
@@ -47,20 +52,21 @@ class SEOTestingModule(ModuleBase):
 
         self.time_zone = pytz.timezone(self.config.contentking.TIMEZONE)
 
+        # Environments without a ContentKing website fail here, not on every check.
+        get_environments(self.config.contentking, ENVIRONMENT_SETTINGS)
+
     def run(self, sample_paths=None):
         """Run the ContentKing Module."""
 
         start_time = datetime.now().astimezone(self.time_zone)
         self.sample_paths = sample_paths or self.sample_paths
 
-        page_data = run_contentking(
-            sample_paths, start_time, self.time_zone, self.config
+        environment_data = run_contentking(
+            sample_paths, start_time, self.time_zone, self.config, summary=self.summary
         )
 
         # self.errors updated here.
-        diffs, errors = self.run_diffs(page_data)
-
-        self.messages = self.prepare_messages(diffs)
+        self.messages, errors = self.run_environments(environment_data)
 
         return self.messages, errors
 
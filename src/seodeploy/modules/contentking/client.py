@@ -0,0 +1,371 @@
+#!/usr/bin/env python
+# coding: utf-8
+#
+# Copyright (c) 2020 JR Oakes
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+"""ContentKing API client for SEODeploy Module."""
+
+from urllib.parse import urljoin
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+
+import os
+import json
+import time
+import random
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from seodeploy.lib.logging import get_logger
+from seodeploy.modules.contentking.exceptions import ContentKingAPIError
+from seodeploy.modules.contentking.ratelimit import get_rate_limiter
+
+_LOG = get_logger(__name__)
+
+USER_AGENT = "Python CI/CD Testing"
+
+# Responses worth retrying: rate limited, or the API is briefly unavailable.
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# One client per process, as pooled connections cannot be shared across a fork.
+_CLIENTS = {}
+
+
+class ContentKingClient:
+    """Client for the ContentKing CMS and Reporting APIs.
+
+    Requests share a keep-alive connection pool, so thousands of pings and polls do
+    not each pay for a TCP and TLS handshake.  Timeouts, connection errors and
+    retryable statuses are retried with exponential backoff and full jitter, waiting
+    as long as the `Retry-After` header asks when the API sends one.  With a
+    `limiter`, every attempt first waits for the rate limit of its API.
+
+    """
+
+    def __init__(
+        self,
+        endpoint,
+        cms_api_key=None,
+        report_api_key=None,
+        timeout=20,
+        pool_size=10,
+        retries=3,
+        backoff=1.0,
+        max_backoff=60.0,
+        limiter=None,
+    ):
+        """Initialize ContentKingClient Class.
+
+        Parameters
+        ----------
+        endpoint: str
+            Base URL of the ContentKing API.
+        cms_api_key: str
+            CMS API key, used to ping changed URLs.
+        report_api_key: str
+            Reporting API key, used to load reports.
+        timeout: int
+            Seconds to wait for each request.
+        pool_size: int
+            Maximum number of pooled connections.
+        retries: int
+            Number of times a failed request is retried.
+        backoff: float
+            Seconds the first retry waits at most.  Doubled on every retry.
+        max_backoff: float
+            Most seconds any retry waits, unless the API asks for longer.
+        limiter: RateLimiter
+            Rate limits of the CMS and Reporting APIs.
+
+        """
+
+        self.endpoint = endpoint.rstrip("/") + "/"
+        self.pool_size = pool_size
+        self.cms_api_key = cms_api_key
+        self.report_api_key = report_api_key
+        self.timeout = timeout
+        self.retries = int(retries)
+        self.backoff = float(backoff)
+        self.max_backoff = float(max_backoff)
+        self.limiter = limiter
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update(
+            {"User-Agent": USER_AGENT, "Content-Type": "application/json"}
+        )
+        self.session.verify = False
+
+    @classmethod
+    def from_config(cls, config):
+        """Build a ContentKingClient from the contentking config and `api_client`."""
+
+        settings = getattr(config.contentking, "api_client", None) or {}
+
+        return cls(
+            config.contentking.ENDPOINT,
+            cms_api_key=config.contentking.CMS_API_KEY,
+            report_api_key=config.contentking.REPORT_API_KEY,
+            timeout=config.contentking.API_TIMEOUT,
+            limiter=get_rate_limiter(config),
+            **settings,
+        )
+
+    def close(self):
+        """Close pooled connections."""
+        self.session.close()
+
+    def report(self, path, params=None, timeout=None):
+        """Load a report from the Reporting API.
+
+        Parameters
+        ----------
+        path: str
+            Report path, relative to the API endpoint.
+        params: dict
+            Query string parameters.
+        timeout: float
+            Most seconds for the request, retries included.  See `request`.
+
+        Returns
+        -------
+        dict
+            Report data, or None if the request failed.
+
+        """
+
+        return self.request("GET", path, "reporting", params=params, timeout=timeout)
+
+    def check_url(self, url):
+        """Ask the CMS API to recrawl a URL.
+
+        Returns
+        -------
+        dict
+            API response, or None if the request failed.
+
+        """
+
+        return self.request("POST", "check_url", "cms", data=json.dumps({"url": url}))
+
+    def request(self, method, path, api, timeout=None, **kwargs):
+        """Send a request to `api`, `cms` or `reporting`, retrying transient failures.
+
+        With a `timeout`, in seconds, attempts and the waits between them stop once it
+        has passed, and no attempt waits past it for the rate limit or a response.  Successful responses
+        whose body is not JSON are retried like server errors.
+
+        Returns
+        -------
+        dict
+            JSON body of the successful response, or None once the request failed for
+            good.
+
+        """
+
+        api_url = urljoin(self.endpoint, path)
+        api_key = self.cms_api_key if api == "cms" else self.report_api_key
+        headers = {"Authorization": "token {}".format(api_key)}
+
+        deadline = time.monotonic() + timeout if timeout else None
+
+        for attempt in range(self.retries + 1):
+
+            response = None
+            attempt_timeout = self.timeout
+            remaining = None
+
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+
+            # The rate limit wait counts towards the timeout as well.
+            if self.limiter is not None:
+                if self.limiter.acquire(api, remaining) is None:
+                    _LOG.error("Timed out waiting for the rate limit: " + api_url)
+                    break
+
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    _LOG.error("Timed out before requesting: " + api_url)
+                    break
+                attempt_timeout = min(attempt_timeout, remaining)
+
+            try:
+                response = self.session.request(
+                    method, api_url, headers=headers, timeout=attempt_timeout, **kwargs
+                )
+
+                if response.status_code not in RETRY_STATUSES:
+                    # Raise HTTPError if not 20X
+                    response.raise_for_status()
+
+                    # A proxy or maintenance page can answer 200 with a non-JSON body.
+                    try:
+                        return response.json()
+                    except ValueError as err:
+                        _LOG.error(
+                            "Invalid JSON from ContentKing API for {}: {}".format(
+                                api_url, str(err)
+                            )
+                        )
+
+                else:
+                    _LOG.error(
+                        "ContentKing API returned {} for: {}".format(
+                            response.status_code, api_url
+                        )
+                    )
+
+            # Requests raises `ConnectionError` for some timeouts as well.
+            except (
+                requests.exceptions.Timeout,
+                requests.exceptions.ConnectionError,
+            ) as err:
+                _LOG.error(str(err))
+
+            except requests.exceptions.HTTPError as err:
+                _LOG.error("{} ({})".format(str(err), _api_message(response)))
+                return None
+
+            # If it is an unknown error, let's raise it as an API error.
+            except Exception as err:  # noqa
+                _LOG.error("Unspecified ContentKing Error: " + str(err))
+                raise ContentKingAPIError(str(err))
+
+            if attempt < self.retries:
+                wait = self.wait(attempt, response)
+                if deadline is not None and time.monotonic() + wait >= deadline:
+                    break
+                time.sleep(wait)
+
+        return None
+
+    def wait(self, attempt, response=None):
+        """Seconds to wait before retry number `attempt` (from 0).
+
+        The `Retry-After` header of the response wins.  Otherwise, a random time up to
+        `backoff` doubled on every retry, capped at `max_backoff`.
+
+        """
+
+        retry_after = _retry_after(response)
+
+        if retry_after is not None:
+            return retry_after
+
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2**attempt))
+
+
+class AsyncContentKingClient:
+    """Sends ContentKing requests concurrently from asyncio.
+
+    Requests run on the pooled connections of a ContentKingClient, in a thread pool of
+    `concurrency` threads, so no more than that many are in flight at once.
+
+    """
+
+    def __init__(self, client, concurrency=10):
+        """Initialize AsyncContentKingClient Class.
+
+        Parameters
+        ----------
+        client: ContentKingClient
+            Client sending the requests.
+        concurrency: int
+            Maximum number of requests at once.  Limited to the client pool size.
+
+        """
+
+        self.client = client
+        self.concurrency = max(1, min(int(concurrency), client.pool_size))
+        self._executor = ThreadPoolExecutor(max_workers=self.concurrency)
+
+    def close(self):
+        """Stop the request threads."""
+        self._executor.shutdown(wait=True)
+
+    async def check_url(self, url):
+        """Ask the CMS API to recrawl a URL.  See `ContentKingClient.check_url`."""
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.client.check_url, url)
+
+    async def report(self, path, params=None):
+        """Load a report from the Reporting API.  See `ContentKingClient.report`."""
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, self.client.report, path, params
+        )
+
+
+def get_client(config):
+    """ContentKing client of the current process, built from `config` on first use."""
+
+    key = (
+        os.getpid(),
+        config.contentking.ENDPOINT,
+        config.contentking.CMS_API_KEY,
+        config.contentking.REPORT_API_KEY,
+    )
+
+    if key not in _CLIENTS:
+        _CLIENTS[key] = ContentKingClient.from_config(config)
+
+    return _CLIENTS[key]
+
+
+def _retry_after(response):
+    """Seconds asked for by the `Retry-After` header, if any."""
+
+    value = response.headers.get("Retry-After") if response is not None else None
+
+    if not value:
+        return None
+
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+def _api_message(response):
+    """Error message of an API response."""
+
+    try:
+        return response.json()["message"]
+    except (ValueError, KeyError, TypeError):
+        return response.text if response is not None else ""
@@ -26,20 +26,27 @@
 
 from urllib.parse import urljoin
 from datetime import datetime
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
-import json
-import time
-import requests
+import math
+import asyncio
 from tqdm.auto import tqdm
 
 from seodeploy.lib.logging import get_logger
-from seodeploy.lib.helpers import group_batcher, mp_list_map, process_page_data
+from seodeploy.lib.helpers import get_environments, process_environment_data
+from seodeploy.modules.contentking.client import AsyncContentKingClient, get_client
 from seodeploy.modules.contentking.exceptions import ContentKingAPIError
+from seodeploy.modules.contentking.polling import RecrawlScheduler
+from seodeploy.modules.contentking.ratelimit import get_rate_limiter
 
 _LOG = get_logger(__name__)
 
+# Settings every environment needs besides its host: the ContentKing website.
+ENVIRONMENT_SETTINGS = ("site_id",)
 
-def load_report(report, config, **data):
+
+def load_report(report, config, timeout=None, **data):
     """Reporting class for ContentKing.
 
         Description: Receives a report type and names parameters passed to function.
@@ -62,10 +69,9 @@ def load_report(report, config, **data):
             * per_page: How many pages to return at a time from the `pages` endpoint. Max is 500, (integer)
 
 
-        TODO:
-            * Currently there is minimal error handling.
-            * Should this be turned into a class?
-            * Need to add rate limit to generator function `get_paged_reports`.
+        Requests wait for the rate limit of the Reporting API.  Pages of paged reports
+        are requested concurrently.  A `timeout`, in seconds, bounds the request of an
+        unpaged report, retries included.
 
     """
 
@@ -84,183 +90,136 @@ def load_report(report, config, **data):
         }
         return reports.get(report, "404").format(**data)
 
-    def get_report(report, config, data, query_string=None):
+    def get_report(report, config, data, query_string=None, timeout=None):
         """Requests report from ContenKing API"""
 
-        api_url = urljoin(config.contentking.ENDPOINT + "/", api_reports(report, data))
-
-        headers = {
-            "User-Agent": "Python CI/CD Testing",
-            "Authorization": "token {}".format(config.contentking.REPORT_API_KEY),
-            "Content-Type": "application/json",
-        }
-
-        tries = 3
-        for i in range(tries):
+        return get_client(config).report(
+            api_reports(report, data), params=query_string, timeout=timeout
+        )
 
-            try:
+    def get_paged_report(report, config, data):
+        """Function for handling paged reports from ContentKing API.
 
-                options = {
-                    "url": api_url,
-                    "params": query_string,
-                    "headers": headers,
-                    "timeout": config.contentking.API_TIMEOUT,
-                    "verify": False,
-                }
-
-                response = requests.get(
-                    api_url,
-                    params=query_string,
-                    headers=headers,
-                    timeout=config.contentking.API_TIMEOUT,
-                    verify=False,
-                )
-
-                # Raise HTTPError if not 20X
-                response.raise_for_status()
-                break
-
-            except requests.exceptions.Timeout as err:
-                _LOG.error(str(err))
-                time.sleep((i + 1) * 10)
-
-            # Not sure why Requests throws this instead of `Timeout` for timeouts.
-            except requests.exceptions.ConnectionError as err:
-                _LOG.error(str(err))
-                time.sleep((i + 1) * 10)
-
-            except requests.exceptions.HTTPError as err:
-                api_message = response.json()["message"]
-                _LOG.error("{} ({})".format(str(err), api_message))
-                break
-
-            # If it is an unknown error, let's break and raise exception.
-            except Exception as err:  # noqa
-                _LOG.error("Unspecified ContentKing Error:" + str(err))
-                _LOG.error("API Request Options:" + json.dumps(options, indent=2))
-                raise ContentKingAPIError(str(err))
-
-        if response and response.status_code == 200:
-            return response.json()
-
-        return None
+        After the first page, up to `report_concurrency` pages are requested at once,
+        within the rate limit of the Reporting API, and yielded in order.  Pages past
+        the `total` of the first page, when the API returns one, are not requested.
+        Otherwise, requests stop at the first page that is short or fails.
 
-    def get_paged_report(report, config, data):
-        """Function for handling paged reports from ContentKing API."""
+        """
 
-        page = 1
         per_page = data.get("per_page", 100)
-        while True:
+        concurrency = int(getattr(config.contentking, "report_concurrency", None) or 1)
+
+        def _page(page):
             query_string = {"page": page, "per_page": per_page}
+            return get_report(report, config, data, query_string=query_string)
 
-            result = get_report(report, config, data, query_string=query_string)
+        result = _page(1)
 
-            if result:
-                urls = result["urls"]
-                yield urls
+        if not result:
+            yield []
+            return
 
-                time.sleep(2)  # Arbitrarily selected wait.
+        yield result["urls"]
 
-                if len(urls) < per_page:
-                    break
+        if len(result["urls"]) < per_page:
+            return
 
-                page += 1
+        total = result.get("total")
+        last_page = math.ceil(total / per_page) if total is not None else None
 
-            else:
-                yield []
-                break
+        pending = deque()
+        next_page = 2
 
-    paged_reports = ["pages"]
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            try:
+                while True:
+                    while len(pending) < concurrency and (
+                        last_page is None or next_page <= last_page
+                    ):
+                        pending.append(executor.submit(_page, next_page))
+                        next_page += 1
 
-    if report in paged_reports:
-        return get_paged_report(report, config, data)
+                    if not pending:
+                        break
 
-    return get_report(report, config, data)
+                    result = pending.popleft().result()
 
+                    if not result:
+                        yield []
+                        break
 
-def _notify_change(url, config):
-    """Pings ContentKing CMS API about URL changes."""
+                    urls = result["urls"]
+                    yield urls
 
-    api_url = urljoin(config.contentking.ENDPOINT + "/", "check_url")
+                    if len(urls) < per_page:
+                        break
 
-    headers = {
-        "User-Agent": "Python CI/CD Testing",
-        "Authorization": "token {}".format(config.contentking.CMS_API_KEY),
-        "Content-Type": "application/json",
-    }
+            # Pages not needed anymore, also when the caller stops reading early.
+            finally:
+                for future in pending:
+                    future.cancel()
 
-    data = json.dumps({"url": url})
+    paged_reports = ["pages"]
 
-    tries = 3
-    for i in range(tries):
+    if report in paged_reports:
+        return get_paged_report(report, config, data)
 
+    return get_report(report, config, data, timeout=timeout)
+
+
+async def _ping_urls(pinger, urls, progress):
+    """Pings ContentKing about every URL at once, within the client concurrency."""
+
+    async def _ping(url):
         try:
-            response = requests.post(
-                api_url,
-                data=data,
-                headers=headers,
-                timeout=config.contentking.API_TIMEOUT,
-                verify=False,
-            )
-            # Raise HTTPError if not 20X
-            response.raise_for_status()
-            break
-
-        except requests.exceptions.Timeout as err:
-            _LOG.error(str(err))
-            time.sleep((i + 1) * 10)
-
-        # Not sure why Requests throws this instead of `Timeout` for timeouts.
-        except requests.exceptions.ConnectionError as err:
-            _LOG.error(str(err))
-            time.sleep((i + 1) * 10)
-
-        except requests.exceptions.HTTPError as err:
-            api_message = response.json()["message"]
-            _LOG.error("{} ({})".format(str(err), api_message))
-            break
+            result = await pinger.check_url(url)
 
         # Just want to catch any other errors to the log, so we can add in here.
-        except Exception as err:  # noqa
+        except ContentKingAPIError as err:
             _LOG.error("Unspecified Error:" + str(err))
-            break
-
-    if response and response.status_code == 200:
-        return response.json()
+            result = None
 
-    return None
+        progress.update()
+        return url, "ok" if result else "error"
 
+    tasks = {
+        name: [asyncio.ensure_future(_ping(url)) for url in env_urls]
+        for name, env_urls in urls.items()
+    }
 
-def ping_prod_paths(sample_paths, config):
-    """Converts all production paths to URLs and pings ContentKing."""
+    return {name: dict(await asyncio.gather(*pings)) for name, pings in tasks.items()}
 
-    results = {}
-    for path in sample_paths:
-        url = urljoin(config.contentking.PROD_HOST, path)
-        result = _notify_change(url, config)
 
-        if result:
-            results[url] = "ok"
-        else:
-            results[url] = "error"
+def ping_urls(urls, config):
+    """Pings ContentKing about URL changes of several environments concurrently.
 
-    return results
+    Parameters
+    ----------
+    urls: dict
+        URLs of each environment, by name.
+    config: class
+        Module configuration class.
 
+    Returns
+    -------
+    dict
+        In format: {'<name>': {'<url>': 'ok' | 'error', ...}, ...}
 
-def ping_stage_paths(sample_paths, config):
-    """Converts all staging paths to URLs and pings ContentKing."""
+    """
 
-    results = {}
-    for path in sample_paths:
-        url = urljoin(config.contentking.STAGE_HOST, path)
-        result = _notify_change(url, config)
+    concurrency = int(getattr(config.contentking, "ping_concurrency", None) or 1)
+    pinger = AsyncContentKingClient(get_client(config), concurrency)
+    loop = asyncio.new_event_loop()
 
-        if result:
-            results[url] = "ok"
-        else:
-            results[url] = "error"
+    total = sum(len(env_urls) for env_urls in urls.values())
 
-    return results
+    try:
+        with tqdm(total=total, desc="Pinging API URLs of all environments") as progress:
+            return loop.run_until_complete(_ping_urls(pinger, urls, progress))
+    finally:
+        loop.close()
+        pinger.close()
 
 
 def has_ping_errors(name, sample_paths, ping_results):
@@ -285,7 +244,7 @@ def has_ping_errors(name, sample_paths, ping_results):
 
 def run_path_pings(sample_paths, config):
 
-    """Pings ContentKing with Paths across both staging and production websites.
+    """Pings ContentKing with Paths across the websites of all environments.
 
     Parameters
     ----------
@@ -300,34 +259,28 @@ def run_path_pings(sample_paths, config):
 
     """
 
-    # Ping Content King for Production and Staging URLs
-    batches = group_batcher(
-        sample_paths, list, config.contentking.BATCH_SIZE, fill=None
-    )
-    prod_ping_results = {}
-    stage_ping_results = {}
-
-    for batch in tqdm(batches, desc="Pinging API Production and Staging URLs"):
-        prod_ping_results.update(ping_prod_paths(batch, config))
-        stage_ping_results.update(ping_stage_paths(batch, config))
+    # Ping Content King for the URLs of every environment at once
+    environments = get_environments(config.contentking, ENVIRONMENT_SETTINGS)
+    urls = {
+        name: [urljoin(settings["host"], path) for path in sample_paths]
+        for name, settings in environments.items()
+    }
+    ping_results = ping_urls(urls, config)
 
     # Check results
-    if prod_ping_results:
-        prod_sent_errors = has_ping_errors(
-            "Production", sample_paths, prod_ping_results
-        )
-    else:
-        _LOG.error("No results from Production pings.")
+    failed = []
 
-    if stage_ping_results:
-        stage_sent_errors = has_ping_errors("Staging", sample_paths, stage_ping_results)
-    else:
-        _LOG.error("No results from Staging pings.")
+    for name, results in ping_results.items():
+        if not results:
+            _LOG.error("No results from {} pings.".format(name))
+            failed.append(name)
+        elif has_ping_errors(name, sample_paths, results):
+            failed.append(name)
 
-    if prod_sent_errors or stage_sent_errors:
+    if failed:
         raise ContentKingAPIError(
-            "There were issues sending the production and/or staging URLs to ContentKing. "
-            "Please check the error log."
+            "There were issues sending the {} URLs to ContentKing. "
+            "Please check the error log.".format(", ".join(failed))
         )
 
     return True
@@ -404,104 +357,53 @@ def parse_url_data(url_data):
     return result
 
 
-class BreakCounter:
-
-    """Simple safety valve class to stop checking dead sites."""
-
-    def __init__(self, max_attempts=5):
-        self.item = None
-        self.reset(max_attempts)
-
-    def reset(self, max_attempts=5):
-        self.max_attempts = max_attempts
-        self.attempts = 0
-        self.item = None
-
-    def __call__(self, item):
-        self.item = self.item or item
-        if self.item == item:
-            self.attempts += 1
-            time.sleep(self.attempts * 5)
-        if self.attempts > self.max_attempts:
-            raise Exception(
-                "Max attempts reached.  Host may not be active in ContentKing."
-            )
-
-
-def _check_results(paths, config=None, data=None):
+def _check_url(path, config=None, data=None, timeout=None):
     """Loads path data from ContentKing and returns cleaned data report.
 
        Checks to see if the latest crawl timestamp is more recent than when this process started.
 
     Parameters
     ----------
-    paths: list
-        List of paths to check.
+    path: str
+        Path to check.
     config: class
         Configuration class.
     data: dict
         Meta data containing host information.
+    timeout: float
+        Most seconds to wait for the URL report.
 
     Returns
     -------
-    list
-        List of page data.
+    dict
+        Page data, or None if the URL was not recrawled yet.
 
     """
 
-    unchecked = paths.copy()
-    results = []
-    break_counter = BreakCounter()
-
-    while unchecked:
-
-        # Grab the first
-        path = unchecked.pop(0)
-        url = urljoin(data["host"], path)
-
-        try:
-
-            url_data = load_report("url", config, id=data["site_id"], url=url)
+    url = urljoin(data["host"], path)
+    url_data = load_report("url", config, timeout=timeout, id=data["site_id"], url=url)
 
-            if url_data and data["time_col"] in url_data:
-                last_check = datetime.fromisoformat(
-                    url_data[data["time_col"]]
-                ).astimezone(data["time_zone"])
-                time_delta = (data["start_time"] - last_check).total_seconds()
+    if not url_data or data["time_col"] not in url_data:
+        error = "Invalid response from API URL report."
+        _LOG.error(error)
+        return {"path": path, "page_data": None, "error": error}
 
-                if time_delta < 0:
-
-                    result = {
-                        "path": path,
-                        "page_data": parse_url_data(url_data),
-                        "error": None,
-                    }
-
-                    results.append(result)
-
-                else:
-                    # This blows up the process if too many fails.
-                    break_counter(path)
-                    unchecked.append(path)
-
-            else:
-                error = "Invalid response from API URL report."
-                _LOG.error(error)
-                result = {"path": path, "page_data": None, "error": error}
-                results.append(result)
+    last_check = datetime.fromisoformat(url_data[data["time_col"]]).astimezone(
+        data["time_zone"]
+    )
+    time_delta = (data["start_time"] - last_check).total_seconds()
 
-        except Exception as e:  # noqa
-            error = "Unknown Error: " + str(e)
-            _LOG.error(error)
-            result = {"path": path, "page_data": None, "error": error}
-            results.append(result)
+    if time_delta < 0:
+        return {"path": path, "page_data": parse_url_data(url_data), "error": None}
 
-    return results
+    return None
 
 
-def run_check_results(sample_paths, start_time, time_zone, config):
+def run_check_results(sample_paths, start_time, time_zone, config, summary=None):
     """Monitors paths that were pinged for updated timestamp. Compares allowed differences.
 
+    The paths of every environment are polled together by a RecrawlScheduler.
+
     Parameters
     ----------
     sample_paths: list
@@ -512,58 +414,59 @@ def run_check_results(sample_paths, start_time, time_zone, config):
         Default timezone to keep times the same.
     config: class
         Module configuration class.
+    summary: dict
+        Run summary, updated with the recrawl checks.
 
     Returns
     -------
     dict
-        Page Data dict.
+        Page Data dict of each environment compared with the baseline environment, by
+        environment name.
 
     """
 
-    batches = group_batcher(
-        sample_paths, list, config.contentking.BATCH_SIZE, fill=None
-    )
+    environments = get_environments(config.contentking, ENVIRONMENT_SETTINGS)
 
-    prod_data = {
-        "start_time": start_time,
-        "time_zone": time_zone,
-        "site_id": config.contentking.PROD_SITE_ID,
-        "host": config.contentking.PROD_HOST,
-        "time_col": config.contentking.TIME_COL,
+    env_data = {
+        name: {
+            "start_time": start_time,
+            "time_zone": time_zone,
+            "site_id": settings.get("site_id"),
+            "host": settings["host"],
+            "time_col": config.contentking.TIME_COL,
+        }
+        for name, settings in environments.items()
     }
 
-    stage_data = {
-        "start_time": start_time,
-        "time_zone": time_zone,
-        "site_id": config.contentking.STAGE_SITE_ID,
-        "host": config.contentking.STAGE_HOST,
-        "time_col": config.contentking.TIME_COL,
-    }
+    def _check(item, remaining):
+        name, path = item
+        return _check_url(path, config=config, data=env_data[name], timeout=remaining)
 
-    prod_result = []
-    stage_result = []
+    scheduler = RecrawlScheduler.from_config(_check, config)
+    items = [(name, path) for name in environments for path in sample_paths]
 
-    # Iterates batches to send to API for data update.
-    for batch in tqdm(batches, desc="Checking crawl status of URLs"):
+    with tqdm(total=len(items), desc="Checking crawl status of URLs") as progress:
+        checked = scheduler.run(items, progress=progress)
 
-        prod_result.extend(
-            mp_list_map(batch, _check_results, config=config, data=prod_data)
-        )
-        stage_result.extend(
-            mp_list_map(batch, _check_results, config=config, data=stage_data)
+    results = {name: [] for name in environments}
+
+    for (name, path), (result, error) in checked.items():
+        results[name].append(
+            result or {"path": path, "page_data": None, "error": error}
         )
 
-        time.sleep(config.contentking.BATCH_WAIT)
+    if summary is not None:
+        summary.update(scheduler.summary)
 
-    # Review for Errors and process into dictionary
-    page_data = process_page_data(
-        sample_paths, prod_result, stage_result, config.contentking
+    # Review for Errors and process into dictionary per environment
+    environment_data = process_environment_data(
+        sample_paths, results, config.contentking
     )
 
-    return page_data
+    return environment_data
 
 
-def run_contentking(sample_paths, start_time, time_zone, config):
+def run_contentking(sample_paths, start_time, time_zone, config, summary=None):
     """Main function that kicks off ContentKing Processing.
 
     Parameters
@@ -576,18 +479,29 @@ def run_contentking(sample_paths, start_time, time_zone, config):
         Default timezone to keep times the same.
     config: class
         Module configuration class.
+    summary: dict
+        Run summary, updated with the recrawl checks, and the requests and rate limit
+        waits of each API.
 
     Returns
     -------
     dict
-        Page Data dict.
+        Page Data dict of each environment compared with the baseline environment, by
+        environment name.
 
     """
 
+    limiter = get_rate_limiter(config)
+
     # Runs the sample paths against ContentKing API to ask for recrawling.
     run_path_pings(sample_paths, config)
 
-    # Checks results via multi-threading
-    page_data = run_check_results(sample_paths, start_time, time_zone, config)
+    # Polls results until every URL was recrawled
+    page_data = run_check_results(
+        sample_paths, start_time, time_zone, config, summary=summary
+    )
+
+    if summary is not None:
+        summary.update(limiter.summary)
 
     return page_data
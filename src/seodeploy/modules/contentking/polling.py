@@ -0,0 +1,213 @@
+#!/usr/bin/env python
+# coding: utf-8
+#
+# Copyright (c) 2020 JR Oakes
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+"""Recrawl polling scheduler for SEODeploy ContentKing Module."""
+
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import time
+import heapq
+import random
+
+from seodeploy.lib.logging import get_logger
+
+_LOG = get_logger(__name__)
+
+DEADLINE_ERROR = "Not recrawled before the polling deadline ({} checks)."
+
+
+class RecrawlScheduler:
+    """Polls URLs until ContentKing has recrawled each of them.
+
+    URLs wait in a priority queue ordered by when they may next be checked, and up to
+    `concurrency` checks run at once.  A URL not recrawled yet is checked again after
+    an exponential backoff with jitter, so a slow URL only delays itself.  URLs still
+    not recrawled at the `deadline` are given up, each with the reason.  Checks are
+    not started past the deadline, and are given the seconds left until it.
+
+    """
+
+    def __init__(
+        self,
+        check,
+        concurrency=10,
+        initial_delay=5.0,
+        backoff=2.0,
+        max_delay=120.0,
+        deadline=600.0,
+    ):
+        """Initialize RecrawlScheduler Class.
+
+        Parameters
+        ----------
+        check: function
+            Called with an item and the seconds left before the deadline, or None
+            without one, returns its result, or None if not recrawled yet.  Exceptions give the item up with
+            their message.
+        concurrency: int
+            Maximum number of checks at once.
+        initial_delay: float
+            Seconds before the second check of an item.
+        backoff: float
+            Factor the delay grows by after each check.
+        max_delay: float
+            Most seconds between two checks of an item.
+        deadline: float
+            Seconds after which items not recrawled yet are given up.  `0` is
+            unlimited.
+
+        """
+
+        self.check = check
+        self.concurrency = max(1, int(concurrency))
+        self.initial_delay = float(initial_delay)
+        self.backoff = float(backoff)
+        self.max_delay = float(max_delay)
+        self.deadline = float(deadline or 0)
+
+        self.checks = 0
+        self.given_up = 0
+        self.elapsed = 0.0
+
+    @classmethod
+    def from_config(cls, check, config):
+        """Build a RecrawlScheduler from the `polling` block of the config."""
+
+        settings = getattr(config.contentking, "polling", None) or {}
+        return cls(check, **settings)
+
+    @property
+    def summary(self):
+        """Checks, given up items and seconds spent polling, for the run summary."""
+
+        return {
+            "recrawl checks": self.checks,
+            "recrawl given up": self.given_up,
+            "recrawl seconds": round(self.elapsed, 2),
+        }
+
+    def delay(self, checks):
+        """Seconds to wait before checking an item again, after `checks` checks.
+
+        Jitter spreads checks of items pinged together, between half and all of the
+        exponential delay.
+
+        """
+
+        delay = min(self.max_delay, self.initial_delay * self.backoff ** (checks - 1))
+        return random.uniform(delay / 2, delay)
+
+    def run(self, items, progress=None):
+        """Poll all items.
+
+        Parameters
+        ----------
+        items: list
+            Hashable items passed to `check`.
+        progress: tqdm
+            Progress bar updated as items finish.
+
+        Returns
+        -------
+        dict
+            In format: {<item>: (<result>, <error>), ...}
+
+        """
+
+        start = time.monotonic()
+        deadline = start + self.deadline if self.deadline else None
+
+        # Entries: (next check time, order, item, checks so far)
+        queue = [(start, order, item, 0) for order, item in enumerate(items)]
+        heapq.heapify(queue)
+
+        results = {}
+        running = {}
+
+        def _finish(item, result, error=None):
+            results[item] = (result, error)
+            if progress is not None:
+                progress.update()
+
+        def _give_up(item, checks):
+            error = DEADLINE_ERROR.format(checks)
+            _LOG.error("{} {}".format(item, error))
+            self.given_up += 1
+            _finish(item, None, error)
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+
+            while queue or running:
+
+                now = time.monotonic()
+
+                while queue and queue[0][0] <= now and len(running) < self.concurrency:
+                    _, order, item, checks = heapq.heappop(queue)
+
+                    if deadline is not None and now >= deadline:
+                        _give_up(item, checks)
+                        continue
+
+                    remaining = deadline - now if deadline is not None else None
+                    future = executor.submit(self.check, item, remaining)
+                    running[future] = (order, item, checks + 1)
+
+                timeout = None
+                if queue and len(running) < self.concurrency:
+                    timeout = max(0.0, queue[0][0] - time.monotonic())
+
+                if not running:
+                    if queue:
+                        time.sleep(timeout)
+                    continue
+
+                done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    order, item, checks = running.pop(future)
+                    self.checks += 1
+
+                    try:
+                        result = future.result()
+                    except Exception as err:  # noqa
+                        error = "Unknown Error: " + str(err)
+                        _LOG.error(error)
+                        _finish(item, None, error)
+                        continue
+
+                    if result is not None:
+                        _finish(item, result)
+                        continue
+
+                    next_check = time.monotonic() + self.delay(checks)
+
+                    if deadline is not None and next_check > deadline:
+                        _give_up(item, checks)
+                    else:
+                        heapq.heappush(queue, (next_check, order, item, checks))
+
+        self.elapsed = time.monotonic() - start
+
+        return results
@@ -0,0 +1,198 @@
+#!/usr/bin/env python
+# coding: utf-8
+#
+# Copyright (c) 2020 JR Oakes
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+"""Rate limits of the ContentKing APIs for SEODeploy Module."""
+
+import time
+import multiprocessing as mp
+
+from seodeploy.lib.logging import get_logger
+from seodeploy.lib.exceptions import IncorrectConfigException
+
+_LOG = get_logger(__name__)
+
+# Requests per second, and requests allowed at once, of each API by default.
+DEFAULT_LIMITS = {
+    "cms": {"rate": 5.0, "burst": 5},
+    "reporting": {"rate": 5.0, "burst": 5},
+}
+
+# One limiter per set of API keys, created before worker processes are forked.
+_LIMITERS = {}
+
+
+class TokenBucket:
+    """Token bucket shared by the threads and processes of a run.
+
+    Tokens refill at `rate` per second, up to `burst`.  Every request takes one.  When
+    none are left, a request reserves the next token and waits for it, so waiting
+    requests are served in turn and the rate holds however many threads send requests.
+    The state is kept in shared memory, so processes forked after the bucket is
+    created draw from the same tokens.
+
+    """
+
+    def __init__(self, rate, burst=None):
+        """Initialize TokenBucket Class.
+
+        Parameters
+        ----------
+        rate: float
+            Requests per second.
+        burst: int
+            Requests allowed at once after an idle period.  Defaults to one second
+            of requests.
+
+        """
+
+        self.rate = float(rate)
+        self.burst = float(burst or max(1.0, self.rate))
+
+        if self.rate <= 0 or self.burst < 1:
+            raise IncorrectConfigException(
+                "Rate limits need a positive `rate` and a `burst` of at least 1."
+            )
+
+        self._lock = mp.Lock()
+        self._tokens = mp.Value("d", self.burst, lock=False)
+        self._updated = mp.Value("d", time.monotonic(), lock=False)
+        self._requests = mp.Value("i", 0, lock=False)
+        self._waits = mp.Value("i", 0, lock=False)
+        self._waited = mp.Value("d", 0.0, lock=False)
+
+    def acquire(self, timeout=None):
+        """Take a token, waiting until one is available.
+
+        Parameters
+        ----------
+        timeout: float
+            Most seconds to wait.  No token is taken if it would come later.
+
+        Returns
+        -------
+        float
+            Seconds waited, or None if no token came within `timeout`.
+
+        """
+
+        with self._lock:
+            now = time.monotonic()
+            refill = (now - self._updated.value) * self.rate
+            tokens = min(self.burst, self._tokens.value + refill)
+            self._updated.value = now
+
+            wait = max(0.0, (1 - tokens) / self.rate)
+
+            if timeout is not None and wait > timeout:
+                self._tokens.value = tokens
+                return None
+
+            self._tokens.value = tokens - 1
+
+            self._requests.value += 1
+            if wait:
+                self._waits.value += 1
+                self._waited.value += wait
+
+        if wait:
+            time.sleep(wait)
+
+        return wait
+
+    @property
+    def summary(self):
+        """Requests, waits and seconds waited so far."""
+
+        with self._lock:
+            return {
+                "requests": self._requests.value,
+                "waits": self._waits.value,
+                "wait seconds": round(self._waited.value, 2),
+            }
+
+
+class RateLimiter:
+    """Rate limits of the CMS and Reporting APIs, each with its own token bucket."""
+
+    def __init__(self, cms=None, reporting=None):
+        """Initialize RateLimiter Class.
+
+        Parameters
+        ----------
+        cms: dict
+            `rate` and `burst` of the CMS API.
+        reporting: dict
+            `rate` and `burst` of the Reporting API.
+
+        """
+
+        settings = {"cms": cms or {}, "reporting": reporting or {}}
+
+        self.buckets = {
+            api: TokenBucket(**{**DEFAULT_LIMITS[api], **limits})
+            for api, limits in settings.items()
+        }
+
+    @classmethod
+    def from_config(cls, config):
+        """Build a RateLimiter from the `rate_limit` block of the contentking config."""
+
+        settings = getattr(config.contentking, "rate_limit", None) or {}
+        return cls(**settings)
+
+    def acquire(self, api, timeout=None):
+        """Take a token of `api`, `cms` or `reporting`, waiting if needed."""
+        return self.buckets[api].acquire(timeout)
+
+    @property
+    def summary(self):
+        """Requests and rate limit waits of each API, for the run summary."""
+
+        summary = {}
+
+        for api, bucket in self.buckets.items():
+            for key, value in bucket.summary.items():
+                summary["{} api {}".format(api, key)] = value
+
+        return summary
+
+
+def get_rate_limiter(config):
+    """Rate limiter of the API keys in `config`, shared by every process of the run.
+
+    Call it before starting worker processes, so they inherit the same limiter.
+
+    """
+
+    key = (
+        config.contentking.ENDPOINT,
+        config.contentking.CMS_API_KEY,
+        config.contentking.REPORT_API_KEY,
+    )
+
+    if key not in _LIMITERS:
+        _LIMITERS[key] = RateLimiter.from_config(config)
+
+    return _LIMITERS[key]
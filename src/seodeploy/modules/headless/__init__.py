@@ -36,6 +36,7 @@ os.environ["PYPPETEER_CHROMIUM_REVISION"] = str(
 )
 
 from seodeploy.modules.headless.functions import run_render  # noqa
+from seodeploy.modules.headless.helpers import annotate_text_similarity  # noqa
 
 
 class SEOTestingModule(ModuleBase):
@@ -55,10 +56,14 @@ class SEOTestingModule(ModuleBase):
 
         self.sample_paths = sample_paths or self.sample_paths
 
-        page_data = run_render(self.sample_paths, self.config)
+        environment_data = run_render(
+            self.sample_paths, self.config, summary=self.summary
+        )
 
-        diffs, errors = self.run_diffs(page_data)
-
-        self.messages = self.prepare_messages(diffs)
+        self.messages, errors = self.run_environments(environment_data)
 
         return self.messages, errors
+
+    def annotate_diffs(self, diffs, page_data):
+        """Add the estimated similarity of changed page texts."""
+        annotate_text_similarity(diffs, page_data)
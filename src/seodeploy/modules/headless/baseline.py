@@ -0,0 +1,343 @@
+#!/usr/bin/env python
+# coding: utf-8
+#
+# Copyright (c) 2020 JR Oakes
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+"""Production baseline cache for the Headless module."""
+
+import os
+import json
+import time
+import hashlib
+from urllib.parse import urljoin
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from seodeploy.lib.logging import get_logger
+from seodeploy.lib.helpers import environment_auth, get_environments
+
+from seodeploy.modules.headless.cache import atomic_write
+from seodeploy.modules.headless.helpers import USER_AGENT, body_hash
+
+_LOG = get_logger(__name__)
+
+# Headless settings that do not change rendered page data.
+FINGERPRINT_EXCLUDED = {
+    "batch_size",
+    "browser_pool_size",
+    "browser_recycle_pages",
+    "browser_max_rss_mb",
+    "browser_endpoints",
+    "render_workers",
+    "tab_concurrency",
+    "adaptive_concurrency",
+    "render_mode",
+    "static_timeout",
+    "stage_host",
+    "stage_auth_user",
+    "stage_auth_pass",
+    "environments",
+    "baseline_environment",
+    "replace_staging_host",
+    "baseline_cache",
+    "phase_timings_file",
+    "run_budget",
+}
+
+
+def config_fingerprint(config):
+    """Hash of the headless settings that affect rendered page data.
+
+    Only the settings of the headless module, from the loaded config file, count.  The
+    module config also holds the top-level settings and the settings of every other
+    module.
+
+    """
+
+    modules = getattr(config, "modules_activated", None) or {}
+    settings = {
+        k.lower(): v
+        for k, v in (modules.get("headless") or {}).items()
+        if k.lower() not in FINGERPRINT_EXCLUDED
+    }
+    data = json.dumps(settings, sort_keys=True, default=str)
+
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+class BaselineCache:
+    """Persistent cache of production page data, reused while production is unchanged.
+
+    Entries are keyed by URL and a fingerprint of the render settings, and expire
+    after `ttl`.  Before reuse, an entry is revalidated with a conditional GET: it is
+    fresh on `304 Not Modified`, on a matching ETag, or, when production sends no
+    ETag, on a matching hash of the body the render received.  Validators all come
+    from the render response, so storing an entry sends no requests.  The least
+    recently used entries are evicted once the cache grows past `max_mb`.
+
+    """
+
+    def __init__(
+        self,
+        enabled=False,
+        directory=None,
+        ttl=None,
+        max_mb=None,
+        revalidate=True,
+        fingerprint="",
+        user_agent=None,
+        concurrency=4,
+        timeout=30,
+        environments=None,
+    ):
+        """Initialize BaselineCache Class.
+
+        Parameters
+        ----------
+        enabled: bool
+            Whether production renders are cached.
+        directory: str
+            Cache location.  Defaults to `.seodeploy_baseline`.
+        ttl: int
+            Seconds an entry is reused for.  `0` never expires.  Defaults to `86400`.
+        max_mb: int
+            Maximum cache size in megabytes.  `0` is unlimited.  Defaults to `500`.
+        revalidate: bool
+            Whether entries are revalidated against production before reuse.
+        fingerprint: str
+            Hash of the render settings.
+        user_agent: str
+            User Agent for revalidation requests.
+        concurrency: int
+            Maximum number of revalidation requests at once.
+        timeout: int
+            Seconds to wait for each revalidation request.
+        environments: dict
+            Environment settings, for the basic auth of revalidation requests.
+
+        """
+
+        self.enabled = bool(enabled)
+        self.directory = directory or ".seodeploy_baseline"
+        self.ttl = 86400 if ttl is None else int(ttl)
+        self.max_bytes = (500 if max_mb is None else int(max_mb)) * 1024 * 1024
+        self.revalidate = revalidate
+        self.fingerprint = fingerprint
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.environments = environments or {}
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=concurrency, pool_maxsize=concurrency)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({"User-Agent": user_agent or USER_AGENT})
+
+    @classmethod
+    def from_config(cls, config):
+        """Build a BaselineCache from the `baseline_cache` block of the headless config."""
+
+        settings = getattr(config.headless, "baseline_cache", None) or {}
+
+        return cls(
+            fingerprint=config_fingerprint(config),
+            user_agent=config.headless.USER_AGENT,
+            concurrency=int(getattr(config.headless, "tab_concurrency", 1) or 1),
+            timeout=int(getattr(config.headless, "static_timeout", 30) or 30),
+            environments=get_environments(config.headless),
+            **settings,
+        )
+
+    def close(self):
+        """Close pooled connections."""
+        self.session.close()
+
+    def lookup(self, paths, host):
+        """Returns cached page data of the paths still fresh on production.
+
+        Parameters
+        ----------
+        paths: list
+            Paths to look up.
+        host: str
+            Production host.
+
+        Returns
+        -------
+        dict
+            In format: {'<path>': <page data>, ...}
+
+        """
+
+        if not self.enabled:
+            return {}
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            entries = pool.map(self._lookup, [urljoin(host, path) for path in paths])
+
+        return {
+            path: entry["page_data"]
+            for path, entry in zip(paths, entries)
+            if entry is not None
+        }
+
+    def store(self, results, host):
+        """Stores successful production results.
+
+        Parameters
+        ----------
+        results: list
+            In format: [{'path': <str>, 'page_data': <dict>, 'error': <str>}, ...]
+        host: str
+            Production host.
+
+        """
+
+        if not self.enabled:
+            return
+
+        results = [r for r in results if r["page_data"] and not r["error"]]
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            list(
+                pool.map(
+                    lambda r: self._store(urljoin(host, r["path"]), r["page_data"]),
+                    results,
+                )
+            )
+
+    def evict(self):
+        """Removes expired entries, then the least recently used beyond `max_mb`."""
+
+        if not self.enabled or not os.path.isdir(self.directory):
+            return
+
+        now = time.time()
+        files = []
+
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith(".json"):
+                continue
+
+            stat = entry.stat()
+
+            if self.ttl and now - stat.st_mtime > self.ttl:
+                os.remove(entry.path)
+            else:
+                files.append((stat.st_atime, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in files)
+
+        for _, size, path in sorted(files):
+            if not self.max_bytes or total <= self.max_bytes:
+                break
+            os.remove(path)
+            total -= size
+
+    def _lookup(self, url):
+        """Returns the entry for `url` if present, unexpired and still valid."""
+
+        entry = self._load(url)
+
+        if entry is None:
+            return None
+
+        if self.ttl and time.time() - entry["created"] > self.ttl:
+            return None
+
+        if self.revalidate and not self._is_unchanged(url, entry["validators"]):
+            return None
+
+        # Marks the entry as recently used, for eviction.
+        os.utime(self._path(url), (time.time(), os.path.getmtime(self._path(url))))
+
+        return entry
+
+    def _is_unchanged(self, url, validators):
+        """Whether production still serves the content the entry was rendered from."""
+
+        headers = {}
+        if validators.get("etag"):
+            headers["If-None-Match"] = validators["etag"]
+        if validators.get("last_modified"):
+            headers["If-Modified-Since"] = validators["last_modified"]
+
+        try:
+            response = self.session.get(
+                url,
+                headers=headers,
+                auth=environment_auth(self.environments, url),
+                timeout=self.timeout,
+            )
+        except requests.exceptions.RequestException as err:
+            _LOG.error("Baseline revalidation failed for: {} ({})".format(url, err))
+            return False
+
+        if response.status_code == 304:
+            return True
+
+        if validators.get("etag"):
+            return response.headers.get("ETag") == validators["etag"]
+
+        if validators.get("body_hash"):
+            return body_hash(response.content) == validators["body_hash"]
+
+        return False
+
+    def _store(self, url, page_data):
+        """Store page data with the validators production served it with."""
+
+        headers = page_data.get("headers") or {}
+
+        # Without an ETag, changes are detected from the body the render received.
+        validators = {
+            "etag": headers.get("etag"),
+            "last_modified": headers.get("last-modified"),
+            "body_hash": page_data.get("body_hash"),
+        }
+
+        entry = {
+            "url": url,
+            "fingerprint": self.fingerprint,
+            "created": time.time(),
+            "validators": validators,
+            "page_data": page_data,
+        }
+
+        os.makedirs(self.directory, exist_ok=True)
+        atomic_write(self._path(url), json.dumps(entry))
+
+    def _load(self, url):
+        """Returns the stored entry for `url`, or None."""
+
+        try:
+            with open(self._path(url)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _path(self, url):
+        """Content-addressed location of the entry for `url` and the settings."""
+        key = hashlib.sha256((self.fingerprint + url).encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, key + ".json")
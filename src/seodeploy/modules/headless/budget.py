@@ -0,0 +1,201 @@
+#!/usr/bin/env python
+# coding: utf-8
+#
+# Copyright (c) 2020 JR Oakes
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+"""Run time budget and adaptive render timeouts for the Headless module."""
+
+import time
+from collections import deque
+
+import numpy as np
+
+from seodeploy.modules.headless.exceptions import IncorrectConfigException
+
+# Error of renders skipped or cut short because the run budget ran out.
+BUDGET_ERROR = "Run budget exhausted for: "
+
+# Navigation times kept per host for adaptive timeouts.
+TIMEOUT_WINDOW = 200
+
+# Navigations observed on a host before its timeout adapts.
+TIMEOUT_MIN_SAMPLES = 10
+
+
+class RunBudget:
+
+    """Wall clock budget of a render run, and per-URL timeouts within it.
+
+    Once `seconds` have passed since `start`, renders are no longer started, and
+    running navigations never wait past the deadline.  With `deferred_retries`,
+    renders are tried once inline, and failed renders are retried in up to that many
+    rounds after the first pass, while the budget lasts.
+
+    With `adaptive_timeout`, navigation timeouts of a host follow its observed
+    navigation times: `timeout_factor` times their `timeout_percentile`, between
+    `min_timeout_ms` and the configured readiness timeout.  Timed out navigations
+    count as taking their timeout.
+
+    The budget is copied to each worker process, so each adapts its own timeouts.
+
+    """
+
+    def __init__(
+        self,
+        seconds=0,
+        deferred_retries=0,
+        adaptive_timeout=False,
+        timeout_percentile=95,
+        timeout_factor=3.0,
+        min_timeout_ms=5000,
+    ):
+        """Initialize RunBudget Class.
+
+        Parameters
+        ----------
+        seconds: int
+            Run time budget.  `0` is unlimited.
+        deferred_retries: int
+            Rounds of retries of failed renders after the first pass.  `0` retries
+            inline instead, up to three tries per render.
+        adaptive_timeout: bool
+            Whether navigation timeouts follow observed navigation times.
+        timeout_percentile: float
+            Percentile of navigation times adaptive timeouts are based on.
+        timeout_factor: float
+            Multiple of the percentile allowed before a navigation times out.
+        min_timeout_ms: int
+            Lowest adaptive timeout, in milliseconds.
+
+        """
+
+        self.seconds = float(seconds or 0)
+        self.deferred_retries = int(deferred_retries or 0)
+        self.adaptive_timeout = bool(adaptive_timeout)
+        self.timeout_percentile = float(timeout_percentile or 95)
+        self.timeout_factor = float(timeout_factor or 3.0)
+        self.min_timeout_ms = int(min_timeout_ms or 0)
+
+        if not 0 < self.timeout_percentile <= 100:
+            raise IncorrectConfigException(
+                "run_budget timeout_percentile must be between 0 and 100."
+            )
+
+        self.deadline = None
+        self.started = None
+        self.skipped = 0
+        self.retried = 0
+        self.recovered = 0
+        self._navigations = {}
+
+    @classmethod
+    def from_config(cls, config):
+        """Build a RunBudget from the `run_budget` block of the headless config."""
+        settings = getattr(config.headless, "run_budget", None) or {}
+        return cls(**settings)
+
+    @property
+    def tries(self):
+        """Inline tries of each render."""
+        return 1 if self.deferred_retries else 3
+
+    @property
+    def remaining(self):
+        """Seconds left in the budget.  None if unlimited."""
+
+        if self.deadline is None:
+            return None
+
+        return max(self.deadline - time.time(), 0.0)
+
+    @property
+    def exhausted(self):
+        """Whether the deadline has passed."""
+        return self.remaining == 0.0
+
+    @property
+    def summary(self):
+        """Budget consumption and retry counts of the run."""
+
+        summary = {}
+
+        if self.seconds:
+            used = time.time() - self.started if self.started else 0.0
+            summary["run budget (s)"] = self.seconds
+            summary["run budget used (s)"] = round(used, 1)
+            summary["run budget used (%)"] = round(100 * used / self.seconds, 1)
+            summary["renders skipped (budget)"] = self.skipped
+
+        if self.deferred_retries:
+            summary["deferred retries"] = self.retried
+            summary["deferred retries recovered"] = self.recovered
+
+        return summary
+
+    def start(self):
+        """Start the clock."""
+
+        self.started = time.time()
+
+        if self.seconds:
+            self.deadline = self.started + self.seconds
+
+        return self
+
+    def timeout(self, host, timeout):
+        """Navigation timeout for `host`, in milliseconds.
+
+        Parameters
+        ----------
+        host: str
+            Host being rendered.
+        timeout: int
+            Configured timeout, in milliseconds.  Adaptive timeouts never exceed it.
+
+        """
+
+        samples = self._navigations.get(host)
+
+        if self.adaptive_timeout and samples and len(samples) >= TIMEOUT_MIN_SAMPLES:
+            observed = np.percentile(samples, self.timeout_percentile)
+            timeout = min(
+                max(observed * self.timeout_factor, self.min_timeout_ms), timeout
+            )
+
+        if self.deadline is not None:
+            timeout = min(timeout, self.remaining * 1000)
+
+        return max(int(timeout), 1)
+
+    def observe(self, host, elapsed):
+        """Record a navigation of `host`, in milliseconds.
+
+        Navigations that timed out are recorded at their timeout, a lower bound of
+        their navigation time, so a host that starts timing out gets longer timeouts.
+
+        """
+
+        if self.adaptive_timeout:
+            self._navigations.setdefault(host, deque(maxlen=TIMEOUT_WINDOW)).append(
+                elapsed
+            )
@@ -0,0 +1,175 @@
+#!/usr/bin/env python
+# coding: utf-8
+#
+# Copyright (c) 2020 JR Oakes
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+"""Shared on-disk asset cache for Headless renders."""
+
+import os
+import json
+import time
+import hashlib
+import tempfile
+
+from seodeploy.modules.headless.intercept import domain_match, _hostname
+from seodeploy.modules.headless.exceptions import IncorrectConfigException
+
+
+# Resource types cached when none are configured.
+CACHED_RESOURCE_TYPES = ["stylesheet", "script", "font", "image"]
+
+MODES = ["disabled", "cold", "warm"]
+
+
+class AssetCache:
+
+    """Disk-backed cache of subresources, shared by all renders and worker processes.
+
+    Modes:
+        * disabled: No caching.
+        * cold: Assets always load from the network, as on a first visit, and are
+          stored for later runs.  Performance metrics stay comparable.
+        * warm: Stored assets are served from disk, as for a returning visitor.  Use
+          for content runs; performance then reflects a primed cache.
+
+    Entries are stored per asset host under `directory`, keyed by URL.
+
+    """
+
+    def __init__(
+        self, mode=None, directory=None, hosts=None, resource_types=None, ttl=None
+    ):
+        """Initialize AssetCache Class.
+
+        Parameters
+        ----------
+        mode: str
+            One of `MODES`.  Defaults to `disabled`.
+        directory: str
+            Cache location.  Defaults to `.seodeploy_cache` in the working directory.
+        hosts: list
+            Asset domains (and subdomains) to cache.  Empty caches every host.
+        resource_types: list
+            Chrome resource types to cache, eg. `stylesheet`, `script`, `font`.
+        ttl: int
+            Seconds an entry is served for.  `0` never expires.  Defaults to `86400`.
+
+        """
+
+        self.mode = mode or "disabled"
+
+        if self.mode not in MODES:
+            raise IncorrectConfigException(
+                "Unknown asset_cache mode `{}`. Options: {}".format(
+                    self.mode, ", ".join(MODES)
+                )
+            )
+
+        self.directory = directory or ".seodeploy_cache"
+        self.hosts = {d.lower().strip(".") for d in hosts or []}
+        self.resource_types = set(resource_types or CACHED_RESOURCE_TYPES)
+        self.ttl = 86400 if ttl is None else int(ttl)
+
+    @classmethod
+    def from_config(cls, config):
+        """Build an AssetCache from the `asset_cache` block of the headless config."""
+        settings = getattr(config.headless, "asset_cache", None) or {}
+        return cls(**settings)
+
+    @property
+    def active(self):
+        """Whether assets are stored."""
+        return self.mode != "disabled"
+
+    @property
+    def serves(self):
+        """Whether stored assets are served instead of loaded from the network."""
+        return self.mode == "warm"
+
+    def caches(self, url, resource_type, method="GET"):
+        """Returns True if the request is cacheable."""
+
+        if not self.active or method != "GET":
+            return False
+
+        if resource_type not in self.resource_types:
+            return False
+
+        host = _hostname(url)
+
+        return bool(host) and (not self.hosts or domain_match(host, self.hosts))
+
+    def get(self, url):
+        """Returns a stored response, or None if missing or expired.
+
+        Returns
+        -------
+        dict
+            In format: {'status': <int>, 'headers': <dict>, 'body': <bytes>}
+
+        """
+
+        path = self._path(url)
+
+        try:
+            if self.ttl and time.time() - os.path.getmtime(path) > self.ttl:
+                return None
+
+            with open(path + ".json") as f:
+                meta = json.load(f)
+            with open(path, "rb") as f:
+                body = f.read()
+
+        except (OSError, ValueError):
+            return None
+
+        return {"status": meta["status"], "headers": meta["headers"], "body": body}
+
+    def contains(self, url):
+        """Whether a fresh entry is stored for `url`."""
+        return self.get(url) is not None
+
+    def put(self, url, status, headers, body):
+        """Store a response.  Writes are atomic, so workers never read partial files."""
+
+        path = self._path(url)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Metadata first: an entry only counts as stored once its body exists.
+        atomic_write(path + ".json", json.dumps({"status": status, "headers": headers}))
+        atomic_write(path, body)
+
+    def _path(self, url):
+        """File location of the entry for `url`."""
+        key = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, _hostname(url) or "_", key)
+
+
+def atomic_write(path, data):
+    """Write to a temporary file in the same directory, then move it into place."""
+
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path))
+
+    with os.fdopen(fd, "wb") as f:
+        f.write(data.encode("utf-8") if isinstance(data, str) else data)
+
+    os.replace(tmp, path)
@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+# coding: utf-8
+#
+# Copyright (c) 2020 JR Oakes
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+"""Lightweight JS and CSS coverage collection over CDP."""
+
+from seodeploy.modules.headless.helpers import disjoint_ranges
+
+# Scripts injected by pyppeteer itself are not page assets.
+EVALUATION_SCRIPT_URLS = [
+    "__pyppeteer_evaluation_script__",
+    "__puppeteer_evaluation_script__",
+]
+
+
+class CoverageCollector:
+    """Collects JS and CSS coverage byte counts from a CDP session.
+
+    Sizes come from the coverage ranges and stylesheet headers, so no script or
+    stylesheet source is transferred over CDP.
+
+    """
+
+    def __init__(self, client):
+        """Initialize CoverageCollector Class.
+
+        Parameters
+        ----------
+        client: CDPSession
+            CDP session of the page to collect coverage for.
+
+        """
+
+        self.client = client
+        self.stylesheets = {}
+        self.js = None
+        self.css = None
+
+    async def start(self):
+        """Start precise JS coverage and CSS rule usage tracking."""
+
+        self.client.on("CSS.styleSheetAdded", self._on_stylesheet_added)
+
+        await self.client.send("Profiler.enable")
+        await self.client.send(
+            "Profiler.startPreciseCoverage", {"callCount": False, "detailed": True}
+        )
+        await self.client.send("DOM.enable")
+        await self.client.send("CSS.enable")
+        await self.client.send("CSS.startRuleUsageTracking")
+
+    async def stop(self):
+        """Stop collection and keep coverage in the format used by `parse_coverage`."""
+
+        js_coverage = await self.client.send("Profiler.takePreciseCoverage")
+        css_coverage = await self.client.send("CSS.stopRuleUsageTracking")
+
+        self.client.remove_listener("CSS.styleSheetAdded", self._on_stylesheet_added)
+
+        await self.client.send("Profiler.stopPreciseCoverage")
+        await self.client.send("Profiler.disable")
+        await self.client.send("CSS.disable")
+        await self.client.send("DOM.disable")
+
+        self.js = self._parse_js(js_coverage["result"])
+        self.css = self._parse_css(css_coverage["ruleUsage"])
+
+    def _on_stylesheet_added(self, event):
+        """Record stylesheet URL and size."""
+
+        header = event["header"]
+        self.stylesheets[header["styleSheetId"]] = {
+            "url": header.get("sourceURL", ""),
+            "length": header.get("length", 0),
+        }
+
+    @staticmethod
+    def _parse_js(scripts):
+        """Convert Profiler script coverage to used ranges and total bytes."""
+
+        results = []
+
+        for script in scripts:
+
+            url = script["url"]
+
+            if not url or any(s in url for s in EVALUATION_SCRIPT_URLS):
+                continue
+
+            ranges = [r for function in script["functions"] for r in function["ranges"]]
+
+            if not ranges:
+                continue
+
+            results.append(
+                {
+                    "url": url,
+                    "ranges": disjoint_ranges(ranges),
+                    # The script's top-level function range spans the whole source.
+                    "total": max(r["endOffset"] for r in ranges),
+                }
+            )
+
+        return results
+
+    def _parse_css(self, rule_usage):
+        """Convert CSS rule usage to used ranges and total bytes."""
+
+        rules = {}
+
+        for rule in rule_usage:
+            rules.setdefault(rule["styleSheetId"], []).append(
+                {
+                    "startOffset": rule["startOffset"],
+                    "endOffset": rule["endOffset"],
+                    "count": 1 if rule["used"] else 0,
+                }
+            )
+
+        results = []
+
+        for stylesheet_id, stylesheet in self.stylesheets.items():
+
+            if not stylesheet["url"]:
+                continue
+
+            results.append(
+                {
+                    "url": stylesheet["url"],
+                    "ranges": disjoint_ranges(rules.get(stylesheet_id, [])),
+                    "total": int(stylesheet["length"]),
+                }
+            )
+
+        return results
@@ -33,3 +33,7 @@ class URLMissingException(Exception):
 
 class IncorrectConfigException(Exception):
     """IncorrectConfigException class for exceptions in this module."""
+
+
+class BrowserCrashedException(Exception):
+    """BrowserCrashedException class for exceptions in this module."""
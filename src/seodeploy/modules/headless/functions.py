@@ -22,20 +22,41 @@
 # OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
 # WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 
+import json
 from urllib.parse import urljoin
+from contextlib import nullcontext
 from tqdm import tqdm
 
 from seodeploy.lib.logging import get_logger
-from seodeploy.lib.helpers import group_batcher, mp_list_map, process_page_data
+from seodeploy.lib.helpers import (
+    get_environments,
+    group_batcher,
+    mp_list_map,
+    process_environment_data,
+)
 
 from seodeploy.modules.headless.render import HeadlessChrome  # noqa
+from seodeploy.modules.headless.static import StaticRenderer
+from seodeploy.modules.headless.pool import BrowserPool
+from seodeploy.modules.headless.workers import RenderWorkers
+from seodeploy.modules.headless.baseline import BaselineCache
+from seodeploy.modules.headless.budget import RunBudget, BUDGET_ERROR
 from seodeploy.modules.headless.exceptions import HeadlessException  # noqa
+from seodeploy.modules.headless.exceptions import IncorrectConfigException
+from seodeploy.modules.headless.helpers import (
+    aggregate_performance,
+    aggregate_timings,
+    CONTENT_MODES,
+    PERFORMANCE_STATISTICS,
+)
+
+RENDER_ENGINES = ["chrome", "static"]
 
 _LOG = get_logger(__name__)
 
 
-def _render_paths(paths, config=None, host=None):
-    """Render paths in Google Chrome.
+def _render_static_paths(paths, config=None, host=None):
+    """Render paths without JavaScript, over pooled HTTP connections.
 
     Parameters
     ----------
@@ -53,29 +74,297 @@ def _render_paths(paths, config=None, host=None):
 
     """
 
-    # Initializes and creates browser.
-    chrome = HeadlessChrome(config=config)
+    renderer = StaticRenderer(config=config)
+
+    urls = [urljoin(host, path) for path in paths]
+    results = _path_results(paths, renderer.render_many(urls))
+
+    renderer.close()
+
+    return results
 
-    results = []
 
-    for path in paths:
+def _path_results(paths, results):
+    """Pairs render results with their paths."""
 
-        url = urljoin(host, path)
+    path_results = []
 
-        # Renders pages in same browser.
-        result = chrome.render(url)
+    for path, result in zip(paths, results):
 
         if result["error"]:
-            results.append({"path": path, "page_data": None, "error": result["error"]})
+            path_results.append(
+                {"path": path, "page_data": None, "error": result["error"]}
+            )
         else:
-            results.append(
+            path_results.append(
                 {"path": path, "page_data": result["page_data"], "error": None}
             )
 
-    return results
+    return path_results
+
+
+def _split_paired_results(paired_result):
+    """Splits joined records into prod and stage results for `process_page_data`."""
+
+    prod_result = []
+    stage_result = []
+
+    for record in paired_result:
+        for side, result in (("prod", prod_result), ("stage", stage_result)):
+            result.append(
+                {
+                    "path": record["path"],
+                    "page_data": record[side],
+                    "error": record["error"],
+                }
+            )
+
+    return prod_result, stage_result
+
+
+def _aggregate_runs(results, keys, statistic="median"):
+    """Collapses repeated renders of each path into one record with aggregate performance.
+
+    Parameters
+    ----------
+    results: list
+        Records of all runs, in format: [{'path': <str>, <key>: <page data>, 'error': <str>}, ...]
+    keys: list
+        Record keys holding page data.
+    statistic: str
+        Aggregate used as the compared `performance` value.
+
+    Returns
+    -------
+    list
+        One record per path.  Failed runs are left out of the aggregates, and a path only
+        has an error if all of its runs failed.
+
+    """
+
+    grouped = {}
+    for record in results:
+        grouped.setdefault(record["path"], []).append(record)
+
+    paths = list(grouped)
+    aggregates = {}
+
+    for key in keys:
+        path_runs = [[r[key] for r in grouped[path] if r[key]] for path in paths]
+        aggregates[key] = aggregate_performance(path_runs, statistic=statistic)
+
+    records = []
+
+    for i, path in enumerate(paths):
+        record = {key: aggregates[key][i] for key in keys}
+        record["path"] = path
+        record["error"] = None
+
+        if any(record[key] is None for key in keys):
+            record["error"] = next(r["error"] for r in grouped[path] if r["error"])
 
+        records.append(record)
+
+    return records
+
+
+def _render_timings(records, key, host):
+    """Per-render phase timings of records holding page data under `key`."""
+    return [
+        {"path": record["path"], "host": host, "timings": record[key]["timings"]}
+        for record in records
+        if record.get(key) and record[key].get("timings")
+    ]
+
+
+def _write_timings(filename, phases, renders):
+    """Saves run phase aggregates and per-render phase timings as JSON."""
+
+    try:
+        with open(filename, "w") as f:
+            json.dump({"phases": phases, "renders": renders}, f, indent=2)
+    except OSError as err:
+        _LOG.error("Error saving phase timings: " + str(err))
+        return
+
+    _LOG.info("Phase timings saved to: " + filename)
+
+
+def _map_paths(paths, fnc, **kwargs):
+    """`mp_list_map` that skips empty path lists."""
+    return mp_list_map(paths, fnc, **kwargs) if paths else []
+
+
+def _render_batch(batch, config, environments, workers, cached=None, timings=None):
+    """Render a batch on every environment with the configured engine and mode.
+
+    With `performance_runs` over 1, each path is rendered that many times and the runs
+    are aggregated.
+
+    Paths in `cached` already have a fresh baseline, so they are only rendered on the
+    other environments, and are left out of the baseline result.
+
+    Phase timings of every render, including repeated runs, are appended to `timings`.
+
+    Parameters
+    ----------
+    environments: dict
+        Host of each environment, by name, baseline first.
+
+    Returns
+    -------
+    dict
+        Results of each environment, by name.
+
+    """
+
+    cached = cached or {}
+    timings = [] if timings is None else timings
+    baseline = next(iter(environments))
+    paths = {
+        name: [path for path in batch if name != baseline or path not in cached]
+        for name in environments
+    }
+
+    if workers is None:
+        results = {
+            name: _map_paths(
+                paths[name], _render_static_paths, config=config, host=host
+            )
+            for name, host in environments.items()
+        }
+        for name, result in results.items():
+            timings.extend(_render_timings(result, "page_data", name))
+        return results
+
+    runs = int(getattr(config.headless, "performance_runs", None) or 1)
+    statistic = getattr(config.headless, "performance_statistic", None) or "median"
+
+    def _runs(paths):
+        return [path for _ in range(runs) for path in paths]
+
+    def _aggregate(records, keys):
+        return _aggregate_runs(records, keys, statistic) if runs > 1 else records
+
+    # Paired tasks render the baseline and one other environment together.
+    paired = (
+        getattr(config.headless, "render_mode", None) == "paired"
+        and len(environments) == 2
+    )
 
-def run_render(sample_paths, config):
+    tasks = {}
+
+    if paired:
+        other = list(environments)[1]
+        hosts = (environments[baseline], environments[other])
+        tasks[baseline] = [("paired", path) + hosts for path in _runs(paths[baseline])]
+        tasks[other] = [
+            ("host", path, environments[other])
+            for path in _runs(paths[other])
+            if path in cached
+        ]
+    else:
+        for name, host in environments.items():
+            tasks[name] = [("host", path, host) for path in _runs(paths[name])]
+
+    # All tasks of the batch are queued at once, so workers never wait on a host.
+    records = workers.map([task for name in tasks for task in tasks[name]])
+
+    results = {}
+    start = 0
+    for name, name_tasks in tasks.items():
+        results[name] = records[start : start + len(name_tasks)]
+        start += len(name_tasks)
+
+    if paired:
+        timings.extend(_render_timings(results[baseline], "prod", baseline))
+        timings.extend(_render_timings(results[baseline], "stage", other))
+        timings.extend(_render_timings(results[other], "page_data", other))
+
+        baseline_result, other_result = _split_paired_results(
+            _aggregate(results[baseline], ["prod", "stage"])
+        )
+        other_result.extend(_aggregate(results[other], ["page_data"]))
+        return {baseline: baseline_result, other: other_result}
+
+    for name, result in results.items():
+        timings.extend(_render_timings(result, "page_data", name))
+
+    return {name: _aggregate(result, ["page_data"]) for name, result in results.items()}
+
+
+def _render_retries(failed, config, workers):
+    """Render (path, host) pairs, returning one record each, in order."""
+
+    if workers is not None:
+        return workers.map([("host", path, host) for path, host in failed])
+
+    records = {}
+    for host in {host for _, host in failed}:
+        paths = [path for path, path_host in failed if path_host == host]
+        records[host] = iter(
+            _map_paths(paths, _render_static_paths, config=config, host=host)
+        )
+
+    return [next(records[host]) for _, host in failed]
+
+
+def _retry_failed(results, environments, config, workers, budget, timings):
+    """Retries failed renders after the first pass, in up to `deferred_retries` rounds.
+
+    Renders skipped for the run budget are not retried, and no round starts once the
+    budget is exhausted.  Records of `results` are updated in place.
+
+    """
+
+    for _ in range(budget.deferred_retries):
+
+        failed = [
+            (name, record)
+            for name, result in results.items()
+            for record in result
+            if record["page_data"] is None
+            and record["error"]
+            and not record["error"].startswith(BUDGET_ERROR)
+        ]
+
+        if not failed or budget.exhausted:
+            break
+
+        _LOG.info("Retrying {} failed renders.".format(len(failed)))
+
+        retries = _render_retries(
+            [(record["path"], environments[name]) for name, record in failed],
+            config,
+            workers,
+        )
+        budget.retried += len(failed)
+
+        for (name, record), retry in zip(failed, retries):
+            timings.extend(_render_timings([retry], "page_data", name))
+            record["error"] = retry["error"]
+
+            if retry["page_data"] is not None:
+                record["page_data"] = retry["page_data"]
+                budget.recovered += 1
+
+    # Paired records share the error of either side.  The error is kept on the
+    # side that failed, so recovered paths are cleared.
+    for result in results.values():
+        for record in result:
+            if record["page_data"] is not None:
+                record["error"] = None
+
+
+def _skipped_records(paths):
+    """Records of paths not rendered because the run budget is exhausted."""
+    return [
+        {"path": path, "page_data": None, "error": BUDGET_ERROR + path}
+        for path in paths
+    ]
+
+
+def run_render(sample_paths, config, summary=None):
     """Main function that kicks off Headless Processing.
 
     Parameters
@@ -84,36 +373,135 @@ def run_render(sample_paths, config):
         List of paths to check.
     config: class
         Configuration class
+    summary: dict
+        Updated with run statistics, such as browser restarts, phase timings and
+        run budget consumption.
 
     Returns
     -------
     dict
-        Page Data dict.
+        Page Data dict of each environment compared with the baseline environment, by
+        environment name.
 
     """
 
     batches = group_batcher(sample_paths, list, config.headless.BATCH_SIZE, fill=None)
 
-    prod_result = []
-    stage_result = []
+    # All environments render in one pass, on the same browsers.
+    environments = {
+        name: settings["host"]
+        for name, settings in get_environments(config.headless).items()
+    }
+    baseline_environment = next(iter(environments))
+    baseline_host = environments[baseline_environment]
+
+    engine = getattr(config.headless, "render_engine", None) or "chrome"
 
-    # Iterates batches to send to API for data update.
-    for batch in tqdm(batches, desc="Rendering URLs"):
+    if engine not in RENDER_ENGINES:
+        raise IncorrectConfigException(
+            "Unknown render_engine `{}`. Options: {}".format(
+                engine, ", ".join(RENDER_ENGINES)
+            )
+        )
 
-        prod_result.extend(
-            mp_list_map(
-                batch, _render_paths, config=config, host=config.headless.PROD_HOST
+    statistic = getattr(config.headless, "performance_statistic", None) or "median"
+
+    if statistic not in PERFORMANCE_STATISTICS:
+        raise IncorrectConfigException(
+            "Unknown performance_statistic `{}`. Options: {}".format(
+                statistic, ", ".join(PERFORMANCE_STATISTICS)
             )
         )
-        stage_result.extend(
-            mp_list_map(
-                batch, _render_paths, config=config, host=config.headless.STAGE_HOST
+
+    content_mode = getattr(config.headless, "content_mode", None) or "fingerprint"
+
+    if content_mode not in CONTENT_MODES:
+        raise IncorrectConfigException(
+            "Unknown content_mode `{}`. Options: {}".format(
+                content_mode, ", ".join(CONTENT_MODES)
             )
         )
 
-    # Review for Errors and process into dictionary:
-    page_data = process_page_data(
-        sample_paths, prod_result, stage_result, config.headless
+    if (
+        getattr(config.headless, "render_mode", None) == "paired"
+        and len(environments) != 2
+    ):
+        _LOG.warning(
+            "render_mode `paired` needs exactly two environments, {} are configured. "
+            "Rendering every environment unpaired.".format(len(environments))
+        )
+
+    results = {name: [] for name in environments}
+
+    # Baseline renders reused while the baseline is unchanged.
+    baseline = BaselineCache.from_config(config)
+    baseline_hits = 0
+    timings = []
+
+    budget = RunBudget.from_config(config).start()
+
+    # Browsers and render workers are started once and shared across all batches.
+    pool = BrowserPool(config=config) if engine == "chrome" else None
+    workers = RenderWorkers(config, pool, budget=budget) if engine == "chrome" else None
+
+    with pool or nullcontext(), workers or nullcontext():
+
+        # Iterates batches to send to API for data update.
+        for batch in tqdm(batches, desc="Rendering URLs"):
+
+            if budget.exhausted:
+                for result in results.values():
+                    result.extend(_skipped_records(batch))
+                continue
+
+            cached = baseline.lookup(batch, baseline_host)
+
+            batch_results = _render_batch(
+                batch, config, environments, workers, cached, timings
+            )
+            baseline.store(batch_results[baseline_environment], baseline_host)
+
+            batch_results[baseline_environment].extend(
+                {"path": path, "page_data": page_data, "error": None}
+                for path, page_data in cached.items()
+            )
+            baseline_hits += len(cached)
+
+            for name, result in batch_results.items():
+                results[name].extend(result)
+
+        _retry_failed(results, environments, config, workers, budget, timings)
+
+    budget.skipped = sum(
+        1
+        for result in results.values()
+        for record in result
+        if record["page_data"] is None
+        and (record["error"] or "").startswith(BUDGET_ERROR)
+    )
+
+    baseline.evict()
+    baseline.close()
+
+    phases = aggregate_timings(
+        [render["timings"] for render in timings]
+        + [{"pool_launch": seconds} for seconds in (pool.launch_times if pool else [])]
     )
 
-    return page_data
+    timings_file = getattr(config.headless, "phase_timings_file", None)
+    if timings_file and phases:
+        _write_timings(timings_file, phases, timings)
+
+    if summary is not None:
+        if pool is not None:
+            summary.update(pool.summary)
+        if baseline.enabled:
+            summary.update({"baseline cache hits": baseline_hits})
+        if phases:
+            summary.update({"phase timings": phases})
+        summary.update(budget.summary)
+
+    # Review for Errors and process into dictionary per environment:
+    environment_data = process_environment_data(sample_paths, results, config.headless)
+
+    return environment_data
@@ -23,8 +23,15 @@
 # WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 
 from urllib.parse import quote_plus
+from contextlib import contextmanager
+import json
+import hashlib
+import time
+import warnings
 
-from seodeploy.lib.helpers import dot_get
+import numpy as np
+
+from seodeploy.lib.helpers import dot_get, get_environments, to_dot
 
 # Default User Agent for requests.  If not set in YAML.
 USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/79.0.3945.130 Safari/537.36"  # pylint: disable=line-too-long
@@ -58,6 +65,243 @@ EXTRACTIONS = {
     "schema": "() => [...document.querySelectorAll('script[type=\"application/ld+json\"]')].map( el => {return JSON.parse(el.textContent);})",  # pylint: disable=line-too-long
 }
 
+# Browser-side calculated performance metrics.
+CALCULATED_METRICS = {
+    "firstPaint": "() => performance.getEntriesByName('first-paint')[0].startTime",
+    "firstContentfulPaint": "() => performance.getEntriesByName('first-contentful-paint')[0].startTime",  # pylint: disable=line-too-long
+    "largestContentfulPaint": "() => window.largestContentfulPaint",
+    "cumulativeLayoutShift": "() => window.cumulativeLayoutShiftScore",
+}
+
+# Elements removed before reading page text content.
+CONTENT_EXCLUDE_SELECTOR = "script, iframe, style, noscript, link"
+
+# `fingerprint` returns only a hash and MinHash of page text, `text` also the text.
+CONTENT_MODES = ["fingerprint", "text"]
+
+# Words per shingle, and number of MinHash values, of text fingerprints.
+SHINGLE_SIZE = 5
+MINHASH_SIZE = 64
+
+# Text fingerprint computed in the browser.  Mirrored by `content_fingerprint`.
+FINGERPRINT_SCRIPT = """
+    const fnv1a = (text, seed) => {
+        let h = (0x811c9dc5 ^ seed) >>> 0;
+        for (let i = 0; i < text.length; i++) {
+            h ^= text.charCodeAt(i);
+            h = Math.imul(h, 0x01000193);
+        }
+        return h >>> 0;
+    };
+    const fmix = (h) => {
+        h ^= h >>> 16;
+        h = Math.imul(h, 0x85ebca6b);
+        h ^= h >>> 13;
+        h = Math.imul(h, 0xc2b2ae35);
+        h ^= h >>> 16;
+        return h >>> 0;
+    };
+    const fingerprint = (text) => {
+        const hex = (h) => h.toString(16).padStart(8, '0');
+        const words = text ? text.split(' ') : [];
+        const minhash = words.length ? new Array(%(size)d).fill(0xffffffff) : [];
+        const shingles = words.length ? Math.max(words.length - %(k)d + 1, 1) : 0;
+        for (let i = 0; i < shingles; i++) {
+            const h = fnv1a(words.slice(i, i + %(k)d).join(' '), 0);
+            for (let j = 0; j < minhash.length; j++) {
+                const v = fmix((h ^ Math.imul(j + 1, 0x9e3779b1)) >>> 0);
+                if (v < minhash[j]) { minhash[j] = v; }
+            }
+        }
+        return {hash: hex(fnv1a(text, 0)) + hex(fnv1a(text, 0x9e3779b9)), minhash: minhash};
+    };""" % {
+    "size": MINHASH_SIZE,
+    "k": SHINGLE_SIZE,
+}
+
+
+def build_extraction_script(extractions, calculated, content_mode="fingerprint"):
+    """Compiles extractions and metrics into one script returning a single payload.
+
+    Each extractor runs in its own try/catch.  A failed extractor, or one returning
+    `undefined`, comes back as an explicit null, with any error under `errors`.
+    Text content is read from a clone of the body, leaving the page DOM intact, and
+    is fingerprinted in the browser.  The text itself is only returned in `text` mode.
+
+    Parameters
+    ----------
+    extractions: dict
+        Key to JS function string, eg. `EXTRACTIONS`.
+    calculated: dict
+        Key to JS function string, eg. `CALCULATED_METRICS`.
+    content_mode: str
+        One of `CONTENT_MODES`.
+
+    Returns
+    -------
+    str
+        JS function returning: {'extractions': {}, 'calculated': {}, 'timing': {}, 'content': str, 'fingerprint': {}, 'errors': {}}
+
+    """
+
+    def _js_object(functions):
+        return (
+            "{"
+            + ",".join("{}: {}".format(json.dumps(k), v) for k, v in functions.items())
+            + "}"
+        )
+
+    return """() => {
+    const result = {extractions: {}, calculated: {}, timing: null, content: null, fingerprint: null, errors: {}};
+    const run = (group, functions) => {
+        for (const [key, fn] of Object.entries(functions)) {
+            let value = null;
+            try { value = fn(); } catch (e) { result.errors[key] = String(e); }
+            result[group][key] = value === undefined ? null : value;
+        }
+    };%s
+    run('extractions', %s);
+    run('calculated', %s);
+    try {
+        result.timing = JSON.parse(JSON.stringify(window.performance.timing));
+    } catch (e) { result.errors.timing = String(e); }
+    try {
+        const body = document.body.cloneNode(true);
+        body.querySelectorAll(%s).forEach((el) => el.remove());
+        const text = body.textContent.split(/\\s+/).filter(Boolean).join(' ').toLowerCase();
+        result.fingerprint = fingerprint(text);
+        if (%s) { result.content = text; }
+    } catch (e) { result.errors.content = String(e); }
+    return result;
+}""" % (
+        FINGERPRINT_SCRIPT,
+        _js_object(extractions),
+        _js_object(calculated),
+        json.dumps(CONTENT_EXCLUDE_SELECTOR),
+        json.dumps(content_mode == "text"),
+    )
+
+
+EXTRACTION_SCRIPTS = {
+    mode: build_extraction_script(EXTRACTIONS, CALCULATED_METRICS, mode)
+    for mode in CONTENT_MODES
+}
+
+EXTRACTION_SCRIPT = EXTRACTION_SCRIPTS["fingerprint"]
+
+
+def _fnv1a(text, seed=0):
+    """32 bit FNV-1a hash over the UTF-16 code units of `text`, as in JavaScript."""
+
+    h = (0x811C9DC5 ^ seed) & 0xFFFFFFFF
+
+    for unit in np.frombuffer(text.encode("utf-16-le"), dtype="<u2").tolist():
+        h = ((h ^ unit) * 0x01000193) & 0xFFFFFFFF
+
+    return h
+
+
+def _fmix(h):
+    """MurmurHash3 finalizer over an array of 32 bit values."""
+
+    mask = np.uint64(0xFFFFFFFF)
+
+    h = h ^ (h >> np.uint64(16))
+    h = (h * np.uint64(0x85EBCA6B)) & mask
+    h = h ^ (h >> np.uint64(13))
+    h = (h * np.uint64(0xC2B2AE35)) & mask
+    return h ^ (h >> np.uint64(16))
+
+
+def content_fingerprint(text, shingle_size=SHINGLE_SIZE, size=MINHASH_SIZE):
+    """Hash and MinHash signature of normalized text, matching `FINGERPRINT_SCRIPT`.
+
+    Returns
+    -------
+    dict
+        In format: {'hash': <str>, 'minhash': <list>}
+
+    """
+
+    words = text.split(" ") if text else []
+    count = max(len(words) - shingle_size + 1, 1) if words else 0
+
+    shingles = np.array(
+        [_fnv1a(" ".join(words[i : i + shingle_size])) for i in range(count)],
+        dtype=np.uint64,
+    )
+    seeds = (np.arange(1, size + 1, dtype=np.uint64) * np.uint64(0x9E3779B1)) & (
+        np.uint64(0xFFFFFFFF)
+    )
+
+    minhash = []
+    if count:
+        # Every shingle against every seed at once; the minimum per seed is kept.
+        minhash = _fmix(shingles[:, None] ^ seeds[None, :]).min(axis=0).tolist()
+
+    return {
+        "hash": "{:08x}{:08x}".format(_fnv1a(text), _fnv1a(text, 0x9E3779B9)),
+        "minhash": minhash,
+    }
+
+
+def body_hash(content):
+    """Hash of a response body, to revalidate pages served without an ETag."""
+    return hashlib.sha256(content).hexdigest()
+
+
+def hashes_bodies(config):
+    """Whether renders hash response bodies, for the baseline cache."""
+
+    settings = getattr(config.headless, "baseline_cache", None) or {}
+    return bool(settings.get("enabled")) and settings.get("revalidate", True)
+
+
+def renders_paired(config):
+    """Whether renders are paired: `render_mode: paired` with two environments."""
+
+    return (
+        getattr(config.headless, "render_mode", None) == "paired"
+        and len(get_environments(config.headless)) == 2
+    )
+
+
+def minhash_similarity(minhash1, minhash2):
+    """Estimated Jaccard similarity of the shingles of two texts, or None."""
+
+    if not minhash1 or not minhash2 or len(minhash1) != len(minhash2):
+        return None
+
+    return float(np.mean(np.array(minhash1) == np.array(minhash2)))
+
+
+def annotate_text_similarity(diffs, page_data):
+    """Sets the element of page text diffs to the estimated similarity of the texts.
+
+    Parameters
+    ----------
+    diffs: list
+        In format: [{'path': <str>, 'diffs': <list>}, ...].
+    page_data: dict
+        Page data of the compared paths, as returned by `run_render`.
+
+    """
+
+    for path_diffs in diffs:
+        data = page_data[path_diffs["path"]]
+
+        for diff in path_diffs["diffs"]:
+            if diff["item"] != "content.text_hash" or diff["type"] != "change":
+                continue
+
+            similarity = minhash_similarity(
+                dot_get("text_minhash", data["prod"]),
+                dot_get("text_minhash", data["stage"]),
+            )
+            if similarity is not None:
+                diff["element"] = "similarity: {:.2f}".format(similarity)
+
+
 # Helper Scripts to include in document on page launch.
 DOCUMENT_SCRIPTS = """() => {
 
@@ -185,6 +429,11 @@ def format_results(data):
     return {
         "status": dot_get("status", data),
         "headers": dot_get("headers", data),
+        "body_hash": dot_get("body_hash", data),
+        "engine": dot_get("engine", data) or "chrome",
+        "readiness": dot_get("readiness", data),
+        "asset_cache": dot_get("asset_cache", data),
+        "timings": dot_get("timings", data),
         "content": {
             "canonical": dot_get("canonical", data),
             "robots": dot_get("robots", data),
@@ -195,7 +444,10 @@ def format_results(data):
             "links": dot_get("links", data),
             "images": dot_get("images", data),
             "schema": dot_get("schema", data),
+            "text": dot_get("text.content", data),
+            "text_hash": dot_get("text.hash", data),
         },
+        "text_minhash": dot_get("text.minhash", data),
         "performance": {
             "nodes": dot_get("metrics.performanceMetrics.Nodes", data),
             "resources": dot_get("metrics.performanceMetrics.Resources", data),
@@ -267,10 +519,204 @@ def parse_numerical_dict(data, r=2):
 # Performance Timing Functions
 def parse_performance_timing(p_timing):
     """Changes performance timing results to deltas."""
+    if not p_timing:
+        return None
     ns = p_timing["navigationStart"]
     return {k: v - ns if v else 0 for k, v in p_timing.items()}
 
 
+PERFORMANCE_STATISTICS = ["median", "p75"]
+
+
+def aggregate_performance(path_runs, statistic="median", r=2):
+    """Aggregates the performance of repeated renders of each path.
+
+    All paths, runs and metrics are stacked in one array, so the percentiles of every
+    metric are computed in a single pass.  Missing values are ignored.
+
+    Parameters
+    ----------
+    path_runs: list
+        For each path, list of page data from its successful runs.
+    statistic: str
+        Aggregate used as the compared `performance` value, `median` or `p75`.
+    r: int
+        Decimal places of aggregates.
+
+    Returns
+    -------
+    list
+        For each path, page data of its first run with `performance` replaced by the
+        aggregates, and `performance_stats` holding median, p75, IQR and run count of
+        each metric.  None for paths without successful runs.
+
+    """
+
+    metrics = next((list(runs[0]["performance"]) for runs in path_runs if runs), [])
+    depth = max([len(runs) for runs in path_runs] + [1])
+
+    values = np.full((len(path_runs), depth, len(metrics)), np.nan)
+
+    for i, runs in enumerate(path_runs):
+        for j, page_data in enumerate(runs):
+            # None becomes NaN.
+            values[i, j] = np.array(
+                [page_data["performance"].get(metric) for metric in metrics],
+                dtype=float,
+            )
+
+    with warnings.catch_warnings():
+        # Metrics missing from every run of a path aggregate to NaN.
+        warnings.simplefilter("ignore", RuntimeWarning)
+        p25, median, p75 = np.nanpercentile(values, [25, 50, 75], axis=1)
+
+    stats = {"median": median, "p75": p75, "iqr": p75 - p25}
+    counts = np.sum(~np.isnan(values), axis=1)
+
+    def _value(array, i, k):
+        return None if np.isnan(array[i, k]) else round(float(array[i, k]), r)
+
+    results = []
+
+    for i, runs in enumerate(path_runs):
+
+        if not runs:
+            results.append(None)
+            continue
+
+        page_data = dict(runs[0])
+        page_data["performance"] = {
+            metric: _value(stats[statistic], i, k) for k, metric in enumerate(metrics)
+        }
+        page_data["performance_stats"] = {
+            metric: {
+                **{name: _value(array, i, k) for name, array in stats.items()},
+                "runs": int(counts[i, k]),
+            }
+            for k, metric in enumerate(metrics)
+        }
+        results.append(page_data)
+
+    return results
+
+
+@contextmanager
+def timed(timings, phase):
+    """Adds the seconds spent in the block to `timings[phase]`."""
+
+    start = time.perf_counter()
+
+    try:
+        yield
+    finally:
+        timings[phase] = timings.get(phase, 0) + time.perf_counter() - start
+
+
+def aggregate_timings(timings, r=3):
+    """Aggregates per-render phase timings of a run.
+
+    Parameters
+    ----------
+    timings: list
+        Phase timings of each render, in format: {<phase>: <seconds>, ...}
+    r: int
+        Decimal places of aggregates.
+
+    Returns
+    -------
+    dict
+        p50, p95 and max seconds of each phase, and the number of renders timing it.
+
+    """
+
+    phases = list(dict.fromkeys(phase for timing in timings for phase in timing))
+
+    values = np.array(
+        [[timing.get(phase) for phase in phases] for timing in timings], dtype=float
+    ).reshape(len(timings), len(phases))
+
+    if not values.size:
+        return {}
+
+    p50, p95, maximum = np.vstack(
+        [np.nanpercentile(values, [50, 95], axis=0), np.nanmax(values, axis=0)]
+    )
+    counts = np.sum(~np.isnan(values), axis=0)
+
+    return {
+        phase: {
+            "p50": round(float(p50[k]), r),
+            "p95": round(float(p95[k]), r),
+            "max": round(float(maximum[k]), r),
+            "count": int(counts[k]),
+        }
+        for k, phase in enumerate(phases)
+    }
+
+
+def is_compared(ignore, item):
+    """Returns True if any field under dot notation `item` of the ignore config is compared.
+
+    Fields set to `True` are ignored.  `False` and float tolerances are compared.
+    """
+
+    section = dot_get(item, ignore or {})
+
+    if section is None:
+        return False
+
+    if not isinstance(section, dict):
+        return section is not True
+
+    return any(dot_get(field, section) is not True for field in to_dot(section))
+
+
+def disjoint_ranges(ranges):
+    """Flattens nested CDP coverage ranges into disjoint used ranges.
+
+    Parameters
+    ----------
+    ranges: list
+        Ranges in format: [{'startOffset': int, 'endOffset': int, 'count': int}, ...]
+        Inner ranges override the count of the ranges containing them.
+
+    Returns
+    -------
+    list
+        Used ranges in format: [{'start': int, 'end': int}, ...]
+
+    """
+
+    points = []
+    for rng in ranges:
+        length = rng["endOffset"] - rng["startOffset"]
+        # Sort: by offset, ends before starts, outer starts first, inner ends first.
+        points.append((rng["startOffset"], 1, -length, rng["count"]))
+        points.append((rng["endOffset"], 0, length, rng["count"]))
+
+    points.sort(key=lambda p: p[:3])
+
+    results = []
+    counts = []
+    last_offset = 0
+
+    for offset, is_start, _, count in points:
+        if counts and last_offset < offset and counts[-1] > 0:
+            if results and results[-1]["end"] == last_offset:
+                results[-1]["end"] = offset
+            else:
+                results.append({"start": last_offset, "end": offset})
+
+        last_offset = offset
+
+        if is_start:
+            counts.append(count)
+        else:
+            counts.pop()
+
+    return [r for r in results if r["end"] - r["start"] > 1]
+
+
 def parse_ranges(ranges):
     """Helper function to parse coverage data ranges."""
     total_length = 0
@@ -292,10 +738,10 @@ def parse_coverage_objects(coverage):
 
     for file in coverage:
 
-        (url, ranges, text) = file.values()
+        url = file["url"]
 
-        used = parse_ranges(ranges)
-        total = len(text)
+        used = parse_ranges(file["ranges"])
+        total = file["total"] if "total" in file else len(file["text"])
 
         unused = total - used
 
@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+# coding: utf-8
+#
+# Copyright (c) 2020 JR Oakes
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+"""Request interception profiles for Headless renders."""
+
+from functools import lru_cache
+from urllib.parse import urlsplit
+
+from seodeploy.modules.headless.exceptions import IncorrectConfigException
+
+
+# Resource types blocked by the `resource_types` profile when none are configured.
+BLOCKED_RESOURCE_TYPES = ["image", "media", "font"]
+
+PROFILES = ["passthrough", "resource_types", "third_party", "first_party"]
+
+
+class RequestFilter:
+
+    """Decides which subresource requests to block during a render.
+
+    Profiles:
+        * passthrough: Load everything.  Use for performance runs.
+        * resource_types: Block requests of the types in `block_resource_types`.
+        * third_party: Block requests to any domain (or subdomain) in `block_domains`.
+        * first_party: Block requests to any host other than the rendered host or `allow_domains`.
+
+    Domains are matched by walking the labels of a request host against a set, so
+    each lookup costs a few set operations regardless of list size.
+
+    """
+
+    def __init__(
+        self,
+        profile=None,
+        block_resource_types=None,
+        block_domains=None,
+        allow_domains=None,
+    ):
+        """Initialize RequestFilter Class.
+
+        Parameters
+        ----------
+        profile: str
+            One of `PROFILES`.  Defaults to `passthrough`.
+        block_resource_types: list
+            Chrome resource types to block, eg. `image`, `font`, `media`, `script`.
+        block_domains: list
+            Domains blocked by the `third_party` profile.
+        allow_domains: list
+            Extra domains allowed by the `first_party` profile.
+
+        """
+
+        self.profile = profile or "passthrough"
+
+        if self.profile not in PROFILES:
+            raise IncorrectConfigException(
+                "Unknown intercept profile `{}`. Options: {}".format(
+                    self.profile, ", ".join(PROFILES)
+                )
+            )
+
+        self.resource_types = set(block_resource_types or BLOCKED_RESOURCE_TYPES)
+        self.block_domains = {d.lower().strip(".") for d in block_domains or []}
+        self.allow_domains = {d.lower().strip(".") for d in allow_domains or []}
+
+    @classmethod
+    def from_config(cls, config):
+        """Build a RequestFilter from the `intercept` block of the headless config."""
+        settings = getattr(config.headless, "intercept", None) or {}
+        return cls(**settings)
+
+    @property
+    def active(self):
+        """Whether any request could be blocked."""
+        return self.profile != "passthrough"
+
+    def blocks(self, url, resource_type, page_host):
+        """Returns True if the request should be aborted.
+
+        Parameters
+        ----------
+        url: str
+            Requested URL.
+        resource_type: str
+            Chrome resource type of the request.
+        page_host: str
+            Host of the page being rendered.
+
+        """
+
+        if resource_type == "document" or not self.active:
+            return False
+
+        if self.profile == "resource_types":
+            return resource_type in self.resource_types
+
+        host = _hostname(url)
+
+        if not host:
+            return False
+
+        if self.profile == "third_party":
+            return domain_match(host, self.block_domains)
+
+        # first_party
+        site = page_host.lower()
+        site = site[4:] if site.startswith("www.") else site
+        return not domain_match(host, self.allow_domains | {site})
+
+
+@lru_cache(maxsize=4096)
+def _hostname(url):
+    """Cached hostname lookup, since pages request many URLs from few hosts."""
+    return urlsplit(url).hostname
+
+
+def domain_match(host, domains):
+    """Returns True if `host` is, or is a subdomain of, any domain in the set `domains`."""
+
+    labels = host.lower().split(".")
+
+    for i in range(len(labels)):
+        if ".".join(labels[i:]) in domains:
+            return True
+
+    return False
@@ -0,0 +1,301 @@
+#!/usr/bin/env python
+# coding: utf-8
+#
+# Copyright (c) 2020 JR Oakes
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+"""Adaptive per-host concurrency limits for the Headless module."""
+
+import time
+import asyncio
+import threading
+
+from seodeploy.lib.logging import get_logger
+
+from seodeploy.modules.headless.exceptions import IncorrectConfigException
+
+_LOG = get_logger(__name__)
+
+# Weight of each new healthy sample in the latency baseline of a host.
+LATENCY_SMOOTHING = 0.2
+
+
+class HostLimit:
+
+    """AIMD concurrency limit of one host.
+
+    The limit grows by one for every `limit` healthy requests (additive increase), and
+    is multiplied by `backoff` when a request fails or takes longer than
+    `latency_factor` times the healthy latency baseline (multiplicative decrease).
+    Requests already in flight when the limit drops were started under the old limit,
+    so their failures do not back off again.
+
+    """
+
+    def __init__(self, initial, minimum, maximum, backoff, latency_factor):
+
+        self.limit = float(min(max(initial, minimum), maximum))
+        self.minimum = minimum
+        self.maximum = maximum
+        self.backoff = backoff
+        self.latency_factor = latency_factor
+        self.active = 0
+        self.latency = None
+        self.decreases = 0
+        self._holdoff = 0
+
+    @property
+    def available(self):
+        """Whether another request may start."""
+        return self.active < int(self.limit)
+
+    def update(self, latency, failed):
+        """Adjust the limit after a request finished.
+
+        Returns
+        -------
+        bool
+            True if the limit was decreased.
+
+        """
+
+        self._holdoff = max(0, self._holdoff - 1)
+
+        spike = (
+            self.latency is not None and latency > self.latency_factor * self.latency
+        )
+
+        if failed or spike:
+            if self._holdoff or self.limit <= self.minimum:
+                return False
+
+            self.limit = max(float(self.minimum), self.limit * self.backoff)
+            self.decreases += 1
+            self._holdoff = self.active
+            return True
+
+        self.limit = min(float(self.maximum), self.limit + 1 / self.limit)
+
+        if self.latency is None:
+            self.latency = latency
+        else:
+            self.latency += LATENCY_SMOOTHING * (latency - self.latency)
+
+        return False
+
+
+class Slot:
+
+    """A running request.  Set `failed` for failures that raise no exception."""
+
+    def __init__(self, host):
+        self.host = host
+        self.failed = False
+        self.start = time.perf_counter()
+
+
+class BaseHostLimiter:
+
+    """Per-host AIMD limits.  Disabled limiters never wait."""
+
+    def __init__(
+        self,
+        enabled=False,
+        initial=None,
+        minimum=None,
+        maximum=None,
+        backoff=None,
+        latency_factor=None,
+    ):
+        """Initialize BaseHostLimiter Class.
+
+        Parameters
+        ----------
+        enabled: bool
+            Whether concurrency adapts.  Otherwise only the fixed concurrency applies.
+        initial: int
+            Starting limit of each host.  Defaults to `2`.
+        minimum: int
+            Lowest limit of each host.  Defaults to `1`.
+        maximum: int
+            Highest limit of each host.  Usually the fixed concurrency of the caller.
+        backoff: float
+            Factor the limit is multiplied by on a failure.  Defaults to `0.5`.
+        latency_factor: float
+            Requests slower than this many times the healthy latency count as
+            failures.  Defaults to `3.0`.
+
+        """
+
+        self.enabled = bool(enabled)
+        self.minimum = int(minimum or 1)
+        self.maximum = max(int(maximum or 1), self.minimum)
+        self.initial = int(initial or 2)
+        self.backoff = 0.5 if backoff is None else float(backoff)
+        self.latency_factor = float(latency_factor or 3.0)
+
+        if not 0 < self.backoff < 1:
+            raise IncorrectConfigException(
+                "adaptive_concurrency backoff must be between 0 and 1."
+            )
+
+        self.limits = {}
+
+    @classmethod
+    def from_config(cls, config, maximum):
+        """Build a limiter from the `adaptive_concurrency` block of the headless config."""
+        settings = getattr(config.headless, "adaptive_concurrency", None) or {}
+        return cls(**{**settings, "maximum": maximum})
+
+    def _limit(self, host):
+        if host not in self.limits:
+            self.limits[host] = HostLimit(
+                self.initial,
+                self.minimum,
+                self.maximum,
+                self.backoff,
+                self.latency_factor,
+            )
+        return self.limits[host]
+
+    def _finish(self, slot, failed):
+        """Release the slot and adjust the limit of its host."""
+
+        limit = self.limits[slot.host]
+        limit.active -= 1
+
+        if limit.update(time.perf_counter() - slot.start, failed or slot.failed):
+            _LOG.info(
+                "Backing off {} to {} concurrent requests.".format(
+                    slot.host, int(limit.limit)
+                )
+            )
+
+
+class HostLimiter(BaseHostLimiter):
+
+    """Per-host AIMD limits shared by threads.
+
+    Usage::
+
+        with limiter.slot(host) as slot:
+            response = fetch(url)
+            slot.failed = response.status_code >= 500
+
+    Exceptions raised in the block count as failures.
+
+    """
+
+    def __init__(self, **kwargs):
+        super(HostLimiter, self).__init__(**kwargs)
+        self._condition = threading.Condition()
+
+    def slot(self, host):
+        """Context manager that waits for a free slot of `host`."""
+        return _ThreadSlot(self, host)
+
+
+class _ThreadSlot:
+    def __init__(self, limiter, host):
+        self.limiter = limiter
+        self.host = host
+        self.slot = None
+
+    def __enter__(self):
+
+        limiter = self.limiter
+        self.slot = Slot(self.host)
+
+        if limiter.enabled:
+            with limiter._condition:
+                limit = limiter._limit(self.host)
+                limiter._condition.wait_for(lambda: limit.available)
+                limit.active += 1
+            self.slot.start = time.perf_counter()
+
+        return self.slot
+
+    def __exit__(self, exc_type, exc, tb):
+
+        limiter = self.limiter
+
+        if limiter.enabled:
+            with limiter._condition:
+                limiter._finish(self.slot, exc_type is not None)
+                limiter._condition.notify_all()
+
+
+class AsyncHostLimiter(BaseHostLimiter):
+
+    """Per-host AIMD limits shared by the tasks of one event loop.
+
+    Usage::
+
+        async with limiter.slot(host) as slot:
+            dom = await render(url)
+            slot.failed = dom["status"] >= 500
+
+    Exceptions raised in the block count as failures.
+
+    """
+
+    def __init__(self, **kwargs):
+        super(AsyncHostLimiter, self).__init__(**kwargs)
+        self._condition = None
+
+    def slot(self, host):
+        """Async context manager that waits for a free slot of `host`."""
+        return _AsyncSlot(self, host)
+
+
+class _AsyncSlot:
+    def __init__(self, limiter, host):
+        self.limiter = limiter
+        self.host = host
+        self.slot = None
+
+    async def __aenter__(self):
+
+        limiter = self.limiter
+        self.slot = Slot(self.host)
+
+        if limiter.enabled:
+            # Created on first use, inside the event loop that uses it.
+            if limiter._condition is None:
+                limiter._condition = asyncio.Condition()
+
+            async with limiter._condition:
+                limit = limiter._limit(self.host)
+                await limiter._condition.wait_for(lambda: limit.available)
+                limit.active += 1
+            self.slot.start = time.perf_counter()
+
+        return self.slot
+
+    async def __aexit__(self, exc_type, exc, tb):
+
+        limiter = self.limiter
+
+        if limiter.enabled:
+            async with limiter._condition:
+                limiter._finish(self.slot, exc_type is not None)
+                limiter._condition.notify_all()
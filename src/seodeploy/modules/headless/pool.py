@@ -0,0 +1,529 @@
+#!/usr/bin/env python
+# coding: utf-8
+#
+# Copyright (c) 2020 JR Oakes
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+"""Browser pool shared by Headless render workers."""
+
+import os
+import asyncio
+import threading
+import time
+import multiprocessing as mp
+from contextlib import contextmanager
+
+from pyppeteer import launch
+
+from seodeploy.lib.logging import get_logger
+from seodeploy.lib.config import Config
+
+from seodeploy.modules.headless.exceptions import BrowserCrashedException
+
+
+_LOG = get_logger(__name__)
+
+HEALTH_CHECK_TIMEOUT = 10
+
+
+def process_tree_rss(pid):
+    """Resident memory, in bytes, of a process and all its descendants.
+
+    Chromium spreads a browser over renderer, GPU and utility processes, so the
+    whole tree is summed.  Returns None where `/proc` is unavailable.
+
+    """
+
+    children = {}
+    rss = {}
+
+    try:
+        entries = [entry for entry in os.listdir("/proc") if entry.isdigit()]
+    except OSError:
+        return None
+
+    for entry in entries:
+        try:
+            with open("/proc/{}/stat".format(entry)) as f:
+                # Fields after the parenthesised command name; ppid is the second.
+                fields = f.read().rsplit(")", 1)[1].split()
+            with open("/proc/{}/statm".format(entry)) as f:
+                rss[int(entry)] = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(int(fields[1]), []).append(int(entry))
+
+    if pid not in rss:
+        return None
+
+    total = 0
+    stack = [pid]
+    while stack:
+        current = stack.pop()
+        total += rss.get(current, 0)
+        stack.extend(children.get(current, []))
+
+    return total
+
+
+def parse_endpoints(endpoints):
+    """List of DevTools endpoints from a list or a comma separated string."""
+
+    if isinstance(endpoints, str):
+        endpoints = endpoints.split(",")
+
+    return [endpoint.strip() for endpoint in endpoints or [] if endpoint.strip()]
+
+
+class BrowserLease:
+
+    """Browser endpoint leased to a worker, and what the worker did with it.
+
+    `pid` is the browser process of a pool browser, None for fleet endpoints.
+
+    """
+
+    def __init__(self, endpoint, pid=None):
+        self.endpoint = endpoint
+        self.pid = pid
+        self.pages = 0
+        self.healthy = True
+
+
+class BrowserPool:
+
+    """Long-lived pool of Chromium browsers owned by the Headless module for a run.
+
+    Browsers are launched once in the parent process and leased by their DevTools
+    endpoint, so worker processes connect to a running browser instead of launching
+    their own for every batch.
+
+    Returned leases pass through a supervisor thread before they are leased again.
+    It relaunches browsers that crashed or stopped responding, and recycles browsers
+    that rendered `browser_recycle_pages` pages or grew past `browser_max_rss_mb`.
+    Render workers hold a lease for the whole run.  They check the browser process,
+    by the `pid` of the lease, and return the lease early if the browser stopped
+    answering or grew past that memory.
+
+    With `browser_endpoints`, no browsers are launched.  The pool leases the given
+    DevTools endpoints of an external browser fleet instead, shared by any number of
+    workers, always to the endpoint with the fewest active leases.  Endpoints that
+    failed are avoided until every endpoint has failed.
+
+    """
+
+    def __init__(self, config=None, size=None):
+        """Initialize BrowserPool Class.
+
+        Parameters
+        ----------
+        config: Config class
+            Module config class.
+        size: int
+            Number of browsers to launch.  Defaults to `browser_pool_size`, then `max_threads`.
+
+        """
+
+        self.config = config or Config(module="headless")
+        self.endpoints = parse_endpoints(
+            getattr(self.config.headless, "browser_endpoints", None)
+        )
+        self.size = int(
+            size
+            or len(self.endpoints)
+            or getattr(self.config.headless, "browser_pool_size", None)
+            or getattr(self.config, "max_threads", None)
+            or 1
+        )
+        self.recycle_pages = int(
+            getattr(self.config.headless, "browser_recycle_pages", None) or 0
+        )
+        self.max_rss = (
+            int(getattr(self.config.headless, "browser_max_rss_mb", None) or 0)
+            * 1024
+            * 1024
+        )
+        self.browsers = []
+        self.pages = {}
+        self.restarts = {"crashed": 0, "pages": 0, "memory": 0}
+        self.launch_times = []
+
+        self._loop = None
+        self._manager = None
+        self._leases = None
+        self._returns = None
+        self._supervisor = None
+        self._load = None
+        self._failures = None
+        self._lock = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __getstate__(self):
+        """Only the lease queues are shipped to worker processes."""
+        return {
+            "size": self.size,
+            "endpoints": self.endpoints,
+            "browsers": [],
+            "_leases": self._leases,
+            "_returns": self._returns,
+            "_load": self._load,
+            "_failures": self._failures,
+            "_lock": self._lock,
+        }
+
+    def __setstate__(self, state):
+        self.__dict__.update({"config": None, "_loop": None, "_manager": None, **state})
+
+    @property
+    def summary(self):
+        """Browser restart counts, by reason, or endpoint failures of a fleet."""
+
+        if self.endpoints:
+            return {"browser endpoint failures": sum((self._failures or {}).values())}
+
+        return {
+            "browser restarts": sum(self.restarts.values()),
+            **{
+                "browser restarts ({})".format(reason): count
+                for reason, count in self.restarts.items()
+            },
+        }
+
+    def start(self):
+        """Launch the pool browsers and make them available for lease."""
+
+        self._manager = mp.Manager()
+
+        if self.endpoints:
+            self._load = self._manager.dict(
+                {endpoint: 0 for endpoint in self.endpoints}
+            )
+            self._failures = self._manager.dict(
+                {endpoint: 0 for endpoint in self.endpoints}
+            )
+            self._lock = self._manager.Lock()
+
+            _LOG.info("Browser pool using {} endpoints.".format(len(self.endpoints)))
+
+            return self
+
+        self._loop = asyncio.new_event_loop()
+        self._leases = self._manager.Queue()
+        self._returns = self._manager.Queue()
+
+        for _ in range(self.size):
+            browser = self._loop.run_until_complete(self._timed_launch())
+            self.browsers.append(browser)
+            self.pages[browser.wsEndpoint] = 0
+            self._put_lease(browser.wsEndpoint)
+
+        # The supervisor owns the event loop until the pool is closed.
+        self._supervisor = threading.Thread(target=self._supervise, daemon=True)
+        self._supervisor.start()
+
+        _LOG.info("Browser pool started with {} browsers.".format(self.size))
+
+        return self
+
+    def close(self):
+        """Stop the supervisor and close all pool browsers."""
+
+        if self._supervisor:
+            self._returns.put(None)
+            self._supervisor.join()
+            self._supervisor = None
+
+        for browser in self.browsers:
+            try:
+                self._loop.run_until_complete(browser.close())
+            except Exception as err:  # noqa
+                _LOG.error("Error closing pooled browser: " + str(err))
+
+        self.browsers = []
+
+        if self._manager:
+            if self.endpoints:
+                # Read before the shared dict goes away with the manager.
+                self._failures = dict(self._failures)
+            self._manager.shutdown()
+            self._manager = None
+
+        if self._loop:
+            self._loop.close()
+            self._loop = None
+
+    @contextmanager
+    def lease(self):
+        """Lease a browser from the pool, handing it to the supervisor when done.
+
+        A `BrowserCrashedException` raised while leased marks the browser unhealthy.
+
+        """
+
+        lease = self.acquire()
+        try:
+            yield lease
+        except BrowserCrashedException:
+            lease.healthy = False
+            raise
+        finally:
+            self.release(lease)
+
+    def acquire(self):
+        """Lease a browser from the pool.  Blocks until one is free.
+
+        Fleet endpoints are shared, so they are leased at once, to the endpoint with
+        the fewest active leases among those with the fewest failures.
+
+        """
+
+        if not self.endpoints:
+            return BrowserLease(*self._leases.get())
+
+        with self._lock:
+            endpoint = min(
+                self.endpoints,
+                key=lambda endpoint: (self._failures[endpoint], self._load[endpoint]),
+            )
+            self._load[endpoint] += 1
+
+        return BrowserLease(endpoint)
+
+    def release(self, lease):
+        """Hand a leased browser to the supervisor, or return a fleet endpoint."""
+
+        if not self.endpoints:
+            self._returns.put((lease.endpoint, lease.pages, lease.healthy))
+            return
+
+        with self._lock:
+            self._load[lease.endpoint] -= 1
+
+            if lease.healthy:
+                self._failures[lease.endpoint] = 0
+            else:
+                self._failures[lease.endpoint] += 1
+                _LOG.error("Browser endpoint failed: " + lease.endpoint)
+
+    def _supervise(self):
+        """Check returned browsers, replacing them if needed, then lease them again."""
+
+        asyncio.set_event_loop(self._loop)
+
+        while True:
+            returned = self._returns.get()
+            if returned is None:
+                break
+
+            endpoint, pages, healthy = returned
+            self.pages[endpoint] += pages
+
+            try:
+                endpoint = self._loop.run_until_complete(
+                    self._supervise_browser(endpoint, healthy)
+                )
+            except Exception as err:  # noqa
+                _LOG.error("Error relaunching pooled browser: " + str(err))
+
+            self._put_lease(endpoint)
+
+    def _put_lease(self, endpoint):
+        """Make the browser at `endpoint` available for lease, with its process id."""
+
+        browser = next(b for b in self.browsers if b.wsEndpoint == endpoint)
+        process = getattr(browser, "process", None)
+        self._leases.put((endpoint, process.pid if process is not None else None))
+
+    async def _supervise_browser(self, endpoint, healthy):
+        """Replace the browser at `endpoint` if it is unhealthy or due for recycling.
+
+        Returns
+        -------
+        str
+            Endpoint of the browser to lease next.
+
+        """
+
+        browser = next(b for b in self.browsers if b.wsEndpoint == endpoint)
+
+        if not healthy or not await self._is_alive(browser):
+            reason = "crashed"
+        elif self.recycle_pages and self.pages[endpoint] >= self.recycle_pages:
+            reason = "pages"
+        elif self.max_rss and (self._rss(browser) or 0) >= self.max_rss:
+            reason = "memory"
+        else:
+            return endpoint
+
+        _LOG.info(
+            "Relaunching pooled browser ({}) after {} pages.".format(
+                reason, self.pages[endpoint]
+            )
+        )
+
+        try:
+            await asyncio.wait_for(browser.close(), HEALTH_CHECK_TIMEOUT)
+        except Exception as err:  # noqa
+            _LOG.error("Error closing pooled browser: " + str(err))
+
+        replacement = await self._timed_launch()
+
+        self.browsers[self.browsers.index(browser)] = replacement
+        del self.pages[endpoint]
+        self.pages[replacement.wsEndpoint] = 0
+        self.restarts[reason] += 1
+
+        return replacement.wsEndpoint
+
+    @staticmethod
+    async def _is_alive(browser):
+        """Whether the browser process is running and answers over CDP."""
+
+        process = getattr(browser, "process", None)
+        if process is not None and process.poll() is not None:
+            return False
+
+        try:
+            await asyncio.wait_for(browser.version(), HEALTH_CHECK_TIMEOUT)
+        except Exception:  # noqa
+            return False
+
+        return True
+
+    @staticmethod
+    def _rss(browser):
+        """Resident memory of the browser process tree, in bytes."""
+
+        process = getattr(browser, "process", None)
+        return process_tree_rss(process.pid) if process is not None else None
+
+    async def _timed_launch(self):
+        """Launch a browser, recording how long it took."""
+
+        start = time.perf_counter()
+        browser = await self._launch()
+        self.launch_times.append(time.perf_counter() - start)
+
+        return browser
+
+    @staticmethod
+    async def _launch():
+        """Launch a single headless browser."""
+        return await launch(
+            args=["--no-sandbox"],
+            headless=True,
+            handleSIGINT=False,
+            handleSIGTERM=False,
+            handleSIGHUP=False,
+        )
+
+
+class PagePool:
+
+    """Warm, pre-configured pages of one browser context, reused across renders.
+
+    Page setup (user agent, viewport, document scripts, network emulation, CDP session)
+    is paid once per slot.  Pages are reset between renders, and closed instead if a
+    render fails part way.
+
+    """
+
+    def __init__(self, chrome, context, size):
+        """Initialize PagePool Class.
+
+        Parameters
+        ----------
+        chrome: HeadlessChrome
+            Browser wrapper that creates, resets and closes tabs.
+        context: BrowserContext
+            Context to open pages in.
+        size: int
+            Maximum number of pages.
+
+        """
+
+        self.chrome = chrome
+        self.context = context
+        self.size = size
+        self.created = 0
+        self._idle = asyncio.Queue()
+
+    async def acquire(self):
+        """Returns an idle tab, creating one if the pool is not full.
+
+        A `None` in the idle queue is a slot freed by a closed tab, so a coroutine
+        waiting for a tab opens a replacement instead of waiting forever.
+
+        """
+
+        if self._idle.empty() and self.created < self.size:
+            return await self._new_tab()
+
+        tab = await self._idle.get()
+
+        if tab is None:
+            return await self._new_tab()
+
+        return tab
+
+    async def release(self, tab, healthy=True):
+        """Return a tab to the pool after resetting it, or close it if unhealthy."""
+
+        if healthy:
+            try:
+                await self.chrome._reset_tab(tab)
+                self._idle.put_nowait(tab)
+                return
+            except Exception as err:  # noqa
+                _LOG.error("Error resetting page: " + str(err))
+
+        self._free_slot()
+        await self.chrome._close_tab(tab)
+
+    async def _new_tab(self):
+        """Opens a tab in a slot of the pool, freeing the slot again on failure."""
+
+        self.created += 1
+        try:
+            return await self.chrome._new_tab(self.context)
+        except Exception:
+            self._free_slot()
+            raise
+
+    def _free_slot(self):
+        """Frees a slot, waking a coroutine waiting in `acquire`."""
+
+        self.created -= 1
+        self._idle.put_nowait(None)
+
+    async def close(self):
+        """Close all idle tabs."""
+
+        while not self._idle.empty():
+            tab = self._idle.get_nowait()
+            if tab is not None:
+                self.created -= 1
+                await self.chrome._close_tab(tab)
@@ -0,0 +1,203 @@
+#!/usr/bin/env python
+# coding: utf-8
+#
+# Copyright (c) 2020 JR Oakes
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+"""Page readiness policies for Headless renders."""
+
+import re
+import time
+
+from pyppeteer.errors import TimeoutError as PageTimeoutError
+
+from seodeploy.modules.headless.exceptions import IncorrectConfigException
+
+STRATEGIES = ["lifecycle", "dom_stable", "selector"]
+
+LIFECYCLE_EVENTS = ["load", "domcontentloaded", "networkidle0", "networkidle2"]
+
+# Resolves once the DOM has not mutated for `quietMs`, or with 'timeout' after `timeoutMs`.
+DOM_STABLE_SCRIPT = """(quietMs, timeoutMs) => new Promise((resolve) => {
+    let timer = null;
+    let deadline = null;
+    const observer = new MutationObserver(() => {
+        clearTimeout(timer);
+        timer = setTimeout(() => done('dom_stable'), quietMs);
+    });
+    const done = (condition) => {
+        observer.disconnect();
+        clearTimeout(timer);
+        clearTimeout(deadline);
+        resolve(condition);
+    };
+    observer.observe(document, {childList: true, subtree: true, attributes: true, characterData: true});
+    timer = setTimeout(() => done('dom_stable'), quietMs);
+    deadline = setTimeout(() => done('timeout'), timeoutMs);
+})"""
+
+
+class ReadinessPolicy:
+    """Decides when a navigated page is ready for extraction.
+
+    Strategies:
+        * lifecycle: Wait for a navigation lifecycle event (`wait_until`).
+        * dom_stable: Wait for DOMContentLoaded, then until the DOM has not changed for `dom_stable_ms`.
+        * selector: Wait for DOMContentLoaded, then until `selector` appears.
+
+    `overrides` is a list of settings with a `pattern` regex.  The first pattern found
+    in a URL replaces the matching default settings for that URL.
+
+    """
+
+    def __init__(
+        self,
+        strategy="lifecycle",
+        wait_until="networkidle2",
+        dom_stable_ms=500,
+        selector=None,
+        timeout=60000,
+        settle_ms=0,
+        overrides=None,
+    ):
+        """Initialize ReadinessPolicy Class.
+
+        Parameters
+        ----------
+        strategy: str
+            One of `STRATEGIES`.
+        wait_until: str
+            Lifecycle event for the `lifecycle` strategy.  One of `LIFECYCLE_EVENTS`.
+        dom_stable_ms: int
+            Milliseconds without DOM mutations for the `dom_stable` strategy.
+        selector: str
+            CSS selector for the `selector` strategy.
+        timeout: int
+            Milliseconds allowed for the page to become ready.
+        settle_ms: int
+            Fixed milliseconds to wait after the page is ready.
+        overrides: list
+            Per-URL-pattern settings.
+
+        """
+
+        self.strategy = strategy or "lifecycle"
+        self.wait_until = wait_until or "networkidle2"
+        self.dom_stable_ms = int(dom_stable_ms or 500)
+        self.selector = selector
+        self.timeout = int(timeout or 60000)
+        self.settle_ms = int(settle_ms or 0)
+
+        if self.strategy not in STRATEGIES:
+            raise IncorrectConfigException(
+                "Unknown readiness strategy `{}`. Options: {}".format(
+                    self.strategy, ", ".join(STRATEGIES)
+                )
+            )
+
+        if self.wait_until not in LIFECYCLE_EVENTS:
+            raise IncorrectConfigException(
+                "Unknown readiness wait_until `{}`. Options: {}".format(
+                    self.wait_until, ", ".join(LIFECYCLE_EVENTS)
+                )
+            )
+
+        if self.strategy == "selector" and not self.selector:
+            raise IncorrectConfigException(
+                "The `selector` readiness strategy requires a `selector`."
+            )
+
+        # Overrides inherit any setting they do not replace.
+        settings = {
+            "strategy": self.strategy,
+            "wait_until": self.wait_until,
+            "dom_stable_ms": self.dom_stable_ms,
+            "selector": self.selector,
+            "timeout": self.timeout,
+            "settle_ms": self.settle_ms,
+        }
+
+        self.overrides = []
+        for override in overrides or []:
+            override = dict(override)
+            pattern = re.compile(override.pop("pattern"))
+            self.overrides.append(
+                (pattern, ReadinessPolicy(**{**settings, **override}))
+            )
+
+    @classmethod
+    def from_config(cls, config):
+        """Build a ReadinessPolicy from the `readiness` block of the headless config."""
+        settings = getattr(config.headless, "readiness", None) or {}
+        return cls(**settings)
+
+    def for_url(self, url):
+        """Returns the policy that applies to `url`."""
+
+        for pattern, policy in self.overrides:
+            if pattern.search(url):
+                return policy
+
+        return self
+
+    async def navigate(self, page, url, timeout=None):
+        """Navigate `page` to `url` and wait until ready.
+
+        `timeout`, in milliseconds, replaces the policy timeout for this navigation.
+
+        Returns
+        -------
+        tuple
+            response, readiness.  Readiness in format: {'strategy': <str>, 'condition': <str>, 'elapsed': <ms>}
+
+        """
+
+        start = time.monotonic()
+        timeout = timeout or self.timeout
+
+        if self.strategy == "lifecycle":
+            response = await page.goto(url, waitUntil=self.wait_until, timeout=timeout)
+            condition = self.wait_until
+
+        else:
+            response = await page.goto(
+                url, waitUntil="domcontentloaded", timeout=timeout
+            )
+            remaining = max(timeout - (time.monotonic() - start) * 1000, 1)
+
+            if self.strategy == "dom_stable":
+                condition = await page.evaluate(
+                    DOM_STABLE_SCRIPT, self.dom_stable_ms, remaining
+                )
+            else:
+                try:
+                    await page.waitForSelector(self.selector, timeout=remaining)
+                    condition = "selector"
+                except PageTimeoutError:
+                    condition = "timeout"
+
+        readiness = {
+            "strategy": self.strategy,
+            "condition": condition,
+            "elapsed": round((time.monotonic() - start) * 1000, 2),
+        }
+
+        return response, readiness
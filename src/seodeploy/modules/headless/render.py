@@ -23,74 +23,320 @@
 # WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 
 import asyncio
+import time
+from urllib.parse import urljoin, urlsplit
 
-from pyppeteer.errors import NetworkError
-from pyppeteer import launch
+from pyppeteer.errors import ElementHandleError, NetworkError, PyppeteerError
+from pyppeteer.errors import TimeoutError as PageTimeoutError
+from pyppeteer import launch, connect
 
 from seodeploy.lib.logging import get_logger
 from seodeploy.lib.config import Config
+from seodeploy.lib.helpers import environment_auth, get_environments
 
-from seodeploy.modules.headless.exceptions import URLMissingException
+from seodeploy.modules.headless.exceptions import (
+    URLMissingException,
+    BrowserCrashedException,
+)
+from seodeploy.modules.headless.intercept import RequestFilter
+from seodeploy.modules.headless.cache import AssetCache
+from seodeploy.modules.headless.limiter import AsyncHostLimiter
+from seodeploy.modules.headless.budget import RunBudget, BUDGET_ERROR
+from seodeploy.modules.headless.readiness import ReadinessPolicy
+from seodeploy.modules.headless.coverage import CoverageCollector
+from seodeploy.modules.headless.pool import PagePool
 from seodeploy.modules.headless.helpers import (
     format_results,
     parse_numerical_dict,
     parse_performance_timing,
     parse_coverage,
+    is_compared,
+    body_hash,
+    hashes_bodies,
+    timed,
 )
 from seodeploy.modules.headless.helpers import (
     USER_AGENT,
     NETWORK_PRESETS,
     DOCUMENT_SCRIPTS,
     EXTRACTIONS,
+    EXTRACTION_SCRIPTS,
 )
 
 
 _LOG = get_logger(__name__)
 
+# Response headers not stored with cached assets.
+CACHE_EXCLUDED_HEADERS = {"content-encoding", "content-length", "transfer-encoding"}
+
+
+class RenderTab:
+    """Pre-configured page and CDP session, plus the state of its current render."""
+
+    def __init__(self):
+        self.page = None
+        self.client = None
+        self.page_host = None
+        self.coverage = None
+        self.readiness = None
+        self.asset_cache = {"hits": 0, "misses": 0}
+        self.timings = {}
+
 
 class HeadlessChrome:
     """Class which handles rendering and extraction using Chrome Browser and CDP"""
 
-    def __init__(self, config=None):
+    def __init__(self, config=None, endpoint=None, build=True):
 
+        self.endpoint = endpoint
         self.browser = None
-        self.page = None
-        self.coverage = None
-        self.client = None
+        self.contexts = {}
+        self.page_pools = {}
+        self.pages = 0
+        self.crashed = False
+        self.startup = {}
+        self._browser = None
         self.config = config or Config(module="headless")
         self.network = self.config.headless.NETWORK_PRESET or "Regular3G"
         self.user_agent = self.config.headless.USER_AGENT or USER_AGENT
+        self.concurrency = int(getattr(self.config.headless, "tab_concurrency", 1) or 1)
+        self.request_filter = RequestFilter.from_config(self.config)
+        self.asset_cache = AssetCache.from_config(self.config)
+        self.content_mode = (
+            getattr(self.config.headless, "content_mode", None) or "fingerprint"
+        )
+        self.readiness = ReadinessPolicy.from_config(self.config)
+        self.environments = get_environments(self.config.headless)
+        self.hash_bodies = hashes_bodies(self.config)
+
+        # Renders per host adapt to how the host copes, up to `tab_concurrency`.
+        self.limiter = AsyncHostLimiter.from_config(self.config, self.concurrency)
+
+        # Inline tries, the run deadline and navigation timeouts.
+        self.budget = RunBudget.from_config(self.config)
+
+        # Coverage is only collected when some coverage field is compared.
+        self.collect_coverage = is_compared(self.config.headless.ignore, "coverage")
+
+        if build:
+            asyncio.set_event_loop(asyncio.new_event_loop())
+            asyncio.get_event_loop().run_until_complete(self.build_browser())
+
+    @classmethod
+    async def create(cls, config=None, endpoint=None):
+        """Build a HeadlessChrome from within a running event loop."""
+
+        chrome = cls(config=config, endpoint=endpoint, build=False)
+        await chrome.build_browser()
 
-        asyncio.set_event_loop(asyncio.new_event_loop())
-        asyncio.get_event_loop().run_until_complete(self.build_browser())
+        return chrome
 
     async def build_browser(self):
-        """Publicly accessible build browser function."""
+        """Publicly accessible build browser function.
+
+        Connects to a pooled browser if an `endpoint` was given, otherwise launches one.
+        The endpoint is a DevTools WebSocket URL, or the HTTP address of a browser
+        started with remote debugging.
+        """
+
+        phase = "browser_connect" if self.endpoint else "browser_launch"
+
+        with timed(self.startup, phase):
+            if self.endpoint and self.endpoint.startswith("http"):
+                # Remote debugging address, e.g. http://127.0.0.1:9222
+                self._browser = await connect(browserURL=self.endpoint)
+            elif self.endpoint:
+                self._browser = await connect(browserWSEndpoint=self.endpoint)
+            else:
+                self._browser = await launch(args=["--no-sandbox"], headless=True)
+
+            self.browser = await self._browser.createIncognitoBrowserContext()
+
+    def close(self):
+        """Close the incognito context. Pooled browsers are disconnected, not closed."""
+        asyncio.get_event_loop().run_until_complete(self._close_browser())
+
+    async def _close_browser(self):
+        """Dispose of the incognito context and release the browser."""
+
+        if self.crashed:
+            # Nothing is left to close; the pool relaunches the browser.
+            self._browser = None
+            return
+
+        for page_pool in self.page_pools.values():
+            await page_pool.close()
+
+        for context in [self.browser] + list(self.contexts.values()):
+            try:
+                await context.close()
+            except NetworkError as err:
+                _LOG.error("Error closing browser context: " + str(err))
+
+        if self.endpoint:
+            await self._browser.disconnect()
+        else:
+            await self._browser.close()
+
+        self.browser = None
+        self.contexts = {}
+        self.page_pools = {}
+        self._browser = None
+
+    async def _is_alive(self):
+        """Whether the browser still answers over CDP."""
+
+        try:
+            await asyncio.wait_for(self._browser.version(), 10)
+        except Exception:  # noqa
+            return False
 
-        # browser = await launch()
-        browser = await launch(args=["--no-sandbox"], headless=True)
+        return True
 
-        self.browser = await browser.createIncognitoBrowserContext()
+    async def _get_context(self, host):
+        """Return the incognito context dedicated to `host`, creating it if needed."""
+
+        if host not in self.contexts:
+            self.contexts[host] = await self._browser.createIncognitoBrowserContext()
+
+        return self.contexts[host]
 
     def render(self, url):
         """Publicly accessible render function."""
+        return self.render_many([url], concurrency=1)[0]
+
+    def render_many(self, urls, concurrency=None):
+        """Render several URLs at once, each in its own tab.
+
+        Parameters
+        ----------
+        urls: list
+            URLs to render.
+        concurrency: int
+            Maximum number of tabs open at once.  Defaults to `tab_concurrency`.
+
+        Returns
+        -------
+        list
+            Results in the same order as `urls`, in format: {'page_data': <dict>, 'error': <str>}
+
+        """
+
+        concurrency = concurrency or self.concurrency
+
+        return asyncio.get_event_loop().run_until_complete(
+            self._render_many(urls, concurrency)
+        )
+
+    async def _render_many(self, urls, concurrency):
+        """Schedule renders with at most `concurrency` pages open."""
+
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def _bounded(url):
+            async with semaphore:
+                return await self._try_render(url)
+
+        # A crashed browser fails the whole call so it can be retried elsewhere.
+        return await asyncio.gather(*[_bounded(url) for url in urls])
+
+    def render_paired(self, paths, prod_host, stage_host, concurrency=None):
+        """Render the production and staging URL of each path together.
+
+        Each host renders in its own browser context and the two renders of a path
+        are scheduled at the same time, so a path is complete as soon as its pair is.
+
+        Parameters
+        ----------
+        paths: list
+            Paths to render on both hosts.
+        prod_host: str
+            Production host.
+        stage_host: str
+            Staging host.
+        concurrency: int
+            Maximum number of tabs open at once.  Defaults to `tab_concurrency`.
+
+        Returns
+        -------
+        list
+            Joined records, in order of completion, in format:
+            [{'path': <str>, 'prod': <page data>, 'stage': <page data>, 'error': <str>}, ...]
+
+        """
+
+        concurrency = concurrency or self.concurrency
+
+        return asyncio.get_event_loop().run_until_complete(
+            self._render_paired(paths, prod_host, stage_host, concurrency)
+        )
+
+    async def _render_paired(self, paths, prod_host, stage_host, concurrency):
+        """Schedule prod/stage renders of each path together."""
+
+        semaphore = asyncio.Semaphore(concurrency)
+        prod_context = await self._get_context(prod_host)
+        stage_context = await self._get_context(stage_host)
+
+        async def _bounded(url, context):
+            async with semaphore:
+                return await self._try_render(url, context=context)
+
+        async def _pair(path):
+            prod, stage = await asyncio.gather(
+                _bounded(urljoin(prod_host, path), prod_context),
+                _bounded(urljoin(stage_host, path), stage_context),
+            )
+            return {
+                "path": path,
+                "prod": prod["page_data"],
+                "stage": stage["page_data"],
+                "error": prod["error"] or stage["error"],
+            }
+
+        return [await pair for pair in asyncio.as_completed(map(_pair, paths))]
+
+    async def _try_render(self, url, context=None):
+        """Render with multiple tries, returning result dict."""
 
         result = {"page_data": None, "error": None}
+        host = urlsplit(url).hostname if url else None
+
+        # Multiple tries (3), or one when failed renders are retried after the run.
+        for _ in range(self.budget.tries):
+
+            if self.crashed:
+                raise BrowserCrashedException("Browser crashed rendering: " + url)
+
+            if self.budget.exhausted:
+                result["error"] = BUDGET_ERROR + url
+                break
 
-        # Multiple tries (3)
-        for _ in range(3):
             try:
-                result["page_data"] = format_results(
-                    asyncio.get_event_loop().run_until_complete(self._render(url))
-                )
+                # Errors, timeouts and server errors back off the host.
+                async with self.limiter.slot(host) as slot:
+                    dom = await self._render(url, context=context)
+                    slot.failed = (dom["status"] or 0) >= 500
+
+                result["page_data"] = format_results(dom)
                 break
 
             except NetworkError:
-                _LOG.error("Network Error trying url: ", url)
-                asyncio.set_event_loop(asyncio.new_event_loop())
+                _LOG.error("Network Error trying url: " + url)
+
+                # Retrying is pointless once the browser itself is gone.
+                if not self.crashed and not await self._is_alive():
+                    self.crashed = True
+
+            except PageTimeoutError:
+                _LOG.error("Navigation Timeout trying url: " + url)
+
+            # Eg. `net::ERR_NAME_NOT_RESOLVED` from an unreachable host.
+            except PyppeteerError as err:
+                _LOG.error("Render Error trying url: {} ({})".format(url, str(err)))
 
             except URLMissingException:
-                error = "A valid URL was not supplied: " + url
+                error = "A valid URL was not supplied: " + str(url)
                 _LOG.error(error)
                 result["error"] = error
                 break
@@ -102,154 +348,361 @@ class HeadlessChrome:
 
         return result
 
-    async def _render(self, url):
+    async def _render(self, url, context=None):
         """Main render function. Builds page and executes extraction."""
 
         if not url:
             raise URLMissingException("A URL is required to render.")
 
-        response = await self._build_page(url)
+        start = time.perf_counter()
+        page_pool = self._get_page_pool(context or self.browser)
+        tab = await page_pool.acquire()
+        self.pages += 1
+        healthy = False
+
+        # Setup of a new tab, and of the browser on its first render, is timed with
+        # the render that paid for it.
+        timings = tab.timings
+        timings.update(self.startup)
+        self.startup = {}
+
+        try:
+            response = await self._load_page(tab, url)
+
+            dom = {}
 
-        dom = {}
+            dom["status"] = response.status
+            dom["headers"] = response.headers
+            dom["body_hash"] = await self._body_hash(response)
 
-        dom["status"] = response.status
-        dom["headers"] = response.headers
+            # All DOM extractions and browser-side metrics in one round trip.
+            with timed(timings, "evaluate"):
+                payload = await self._evaluate(tab)
 
-        for key, expression in EXTRACTIONS.items():
-            dom[key] = await self.page.evaluate(expression)
+            with timed(timings, "extract_dom"):
+                dom.update(self._extract_dom(payload))
 
-        dom["metrics"] = await self._extract_performance_metrics()
-        dom["coverage"] = self._extract_coverage()
+            with timed(timings, "performance_metrics"):
+                dom["metrics"] = await self._extract_performance_metrics(tab, payload)
 
-        # This removes elements from the page -- run last.
-        dom["content"] = await self._extract_content()
+            dom["coverage"] = self._extract_coverage(tab)
+            dom["text"] = self._extract_content(payload)
+            dom["readiness"] = tab.readiness
+            dom["asset_cache"] = self._extract_asset_cache(tab)
 
-        await self._close_page()
+            healthy = True
+
+        finally:
+            # Pages that failed mid-render are closed rather than reused.
+            with timed(timings, "release"):
+                await page_pool.release(tab, healthy=healthy)
+
+        timings["total"] = time.perf_counter() - start
+        dom["timings"] = {phase: round(value, 4) for phase, value in timings.items()}
 
         return dom
 
-    async def _build_page(self, url):
-        """Main method to build page, setup reports, and navigate to URL"""
+    def _get_page_pool(self, context):
+        """Return the page pool of `context`, creating it if needed."""
 
-        self.page = await self.browser.newPage()
-        await self.page.setBypassCSP(True)  # Ignore content security issues.
-        await self.page.setUserAgent(self.user_agent)
-        await self.page.setViewport({"width": 360, "height": 640, "isMobile": True})
-        await self.page.evaluateOnNewDocument(DOCUMENT_SCRIPTS)
+        if id(context) not in self.page_pools:
+            self.page_pools[id(context)] = PagePool(self, context, self.concurrency)
 
-        self.client = await self.page.target.createCDPSession()
-        self.coverage = {}
+        return self.page_pools[id(context)]
 
-        # Limit network to cosistent slow.
-        await self.client.send(
-            "Network.emulateNetworkConditions", NETWORK_PRESETS[self.network]
-        )
+    async def _new_tab(self, context):
+        """Create a page and CDP session with all per-page setup done once."""
+
+        tab = RenderTab()
+
+        with timed(tab.timings, "page_setup"):
+            tab.page = await context.newPage()
+            await tab.page.setBypassCSP(True)  # Ignore content security issues.
+            await tab.page.setUserAgent(self.user_agent)
+            await tab.page.setViewport({"width": 360, "height": 640, "isMobile": True})
+            await tab.page.evaluateOnNewDocument(DOCUMENT_SCRIPTS)
+
+            tab.client = await tab.page.target.createCDPSession()
+
+            # Limit network to cosistent slow.
+            await tab.client.send(
+                "Network.emulateNetworkConditions", NETWORK_PRESETS[self.network]
+            )
+
+            # Block subresources per the configured interception profile, and serve
+            # cached assets in warm cache mode.
+            if self.request_filter.active or self.asset_cache.serves:
+                await self._intercept_requests(tab)
+
+            if self.asset_cache.active:
+                tab.page.on(
+                    "response",
+                    lambda response: asyncio.ensure_future(self._store_asset(response)),
+                )
+
+        return tab
+
+    async def _load_page(self, tab, url):
+        """Setup per-render reports and navigate to URL"""
 
-        # Enable performance reporting
-        await self.client.send("Performance.enable")
+        tab.page_host = urlsplit(url).hostname
 
-        await self.page.coverage.startJSCoverage()
-        await self.page.coverage.startCSSCoverage()
+        with timed(tab.timings, "reports_start"):
+            # Enable performance reporting
+            await tab.client.send("Performance.enable")
+
+            if self.collect_coverage:
+                tab.coverage = CoverageCollector(tab.client)
+                await tab.coverage.start()
 
         # Authenticate if Staging and user/pass defined.
-        await self._check_auth(url)
+        with timed(tab.timings, "auth"):
+            await self._check_auth(tab, url)
+
+        # Navigate and wait for the page to be ready, per the readiness policy.
+        policy = self.readiness.for_url(url)
+
+        timeout = self.budget.timeout(tab.page_host, policy.timeout)
+
+        with timed(tab.timings, "navigate"):
+            try:
+                response, tab.readiness = await policy.navigate(tab.page, url, timeout)
+            except PageTimeoutError:
+                # Censored at the timeout, so the host's timeouts back off.
+                self.budget.observe(tab.page_host, timeout)
+                raise
 
-        response = await self.page.goto(url, waitUntil="networkidle2", timeout=60000)
+        self.budget.observe(tab.page_host, tab.readiness["elapsed"])
 
-        self.coverage["JSCoverage"] = await self.page.coverage.stopJSCoverage()
-        self.coverage["CSSCoverage"] = await self.page.coverage.stopCSSCoverage()
+        if tab.coverage:
+            with timed(tab.timings, "coverage_stop"):
+                await tab.coverage.stop()
 
-        # Small wait to ensure all is complete.
-        await self.page.waitFor(1000)
+        # Optional fixed wait after the page is ready.
+        if policy.settle_ms:
+            with timed(tab.timings, "settle"):
+                await tab.page.waitFor(policy.settle_ms)
 
         return response
 
-    async def _close_page(self):
-        """Close page and relevant class data after page load"""
+    async def _intercept_requests(self, tab):
+        """Abort requests blocked by the request filter, continue the rest."""
 
-        await self.client.detach()
-        await self.page.close()
-        self.client = None
-        self.page = None
-        self.coverage = None
+        async def _handle(request):
+            try:
+                if self.request_filter.blocks(
+                    request.url, request.resourceType, tab.page_host
+                ):
+                    await request.abort()
+                elif self.asset_cache.serves and self.asset_cache.caches(
+                    request.url, request.resourceType, request.method
+                ):
+                    await self._serve_asset(tab, request)
+                else:
+                    await request.continue_()
+            except PyppeteerError as err:
+                _LOG.error("Request interception error: " + str(err))
+
+        await tab.page.setRequestInterception(True)
+        tab.page.on("request", lambda request: asyncio.ensure_future(_handle(request)))
+
+    async def _serve_asset(self, tab, request):
+        """Respond from the asset cache, or load from the network on a miss."""
+
+        cached = self.asset_cache.get(request.url)
+
+        if cached is None:
+            tab.asset_cache["misses"] += 1
+            await request.continue_()
+        else:
+            tab.asset_cache["hits"] += 1
+            await request.respond(cached)
 
-    async def _check_auth(self, url):
-        """Authenticate if Staging and user/pass defined."""
+    async def _body_hash(self, response):
+        """Hash of the page body, when the baseline cache needs it to revalidate."""
 
-        username = self.config.headless.STAGE_AUTH_USER
-        password = self.config.headless.STAGE_AUTH_PASS
-        stage_host = self.config.headless.STAGE_HOST
+        if not self.hash_bodies or "etag" in response.headers:
+            return None
 
-        if username and password and stage_host in url:
-            await self.page.authenticate({"username": username, "password": password})
+        try:
+            return body_hash(await response.buffer())
+        except PyppeteerError as err:
+            _LOG.error("Error reading page body: " + str(err))
+            return None
 
-    async def _extract_content(self):
-        """Extracts content from the page.  Since this destroys the DOM, it should be run last."""
+    async def _store_asset(self, response):
+        """Store a cacheable asset response, unless it is already cached."""
 
-        await self.page.evaluate(
-            "document.querySelectorAll('script, iframe, style, noscript, link').forEach(function(el){el.remove()})",
-            force_expr=True,
-        )
-        content = await self.page.evaluate("document.body.textContent", force_expr=True)
-        return " ".join(content.split()).strip().lower()
+        request = response.request
+
+        if response.status != 200 or not self.asset_cache.caches(
+            response.url, request.resourceType, request.method
+        ):
+            return
+
+        if self.asset_cache.contains(response.url):
+            return
+
+        try:
+            body = await response.buffer()
+        except PyppeteerError as err:
+            _LOG.error("Error reading asset: " + str(err))
+            return
+
+        # Bodies are stored decoded, so transfer headers no longer apply.
+        headers = {
+            k: v
+            for k, v in response.headers.items()
+            if k.lower() not in CACHE_EXCLUDED_HEADERS
+        }
+
+        try:
+            self.asset_cache.put(response.url, response.status, headers, body)
+        except OSError as err:
+            _LOG.error("Error caching asset: " + str(err))
 
-    async def _extract_performance_metrics(self):
+    @staticmethod
+    async def _reset_tab(tab):
+        """Reset page state between renders so the tab can be reused."""
+
+        await tab.page.goto("about:blank")
+
+        # Duration metrics accumulate while enabled, so restart them per render.
+        await tab.client.send("Performance.disable")
+
+        tab.page_host = None
+        tab.coverage = None
+        tab.readiness = None
+        tab.asset_cache = {"hits": 0, "misses": 0}
+        tab.timings = {}
+
+    @staticmethod
+    async def _close_tab(tab):
+        """Close page and CDP session of the tab"""
+
+        try:
+            if tab.client:
+                await tab.client.detach()
+            if tab.page:
+                await tab.page.close()
+        except PyppeteerError as err:
+            _LOG.error("Error closing page: " + str(err))
+
+        tab.client = None
+        tab.page = None
+        tab.coverage = None
+
+    async def _check_auth(self, tab, url):
+        """Authenticate if the environment of the URL has a user/pass defined."""
+
+        auth = environment_auth(self.environments, url)
+
+        if auth:
+            await tab.page.authenticate({"username": auth[0], "password": auth[1]})
+
+    async def _evaluate(self, tab):
+        """Runs the extraction script, again if its result was lost in transport.
+
+        Extractor failures come back inside the payload, so only a lost round trip,
+        eg. a late redirect destroying the execution context, is worth repeating.
+        """
+
+        script = EXTRACTION_SCRIPTS[self.content_mode]
+
+        try:
+            return await tab.page.evaluate(script)
+        except (NetworkError, ElementHandleError) as err:
+            _LOG.error("Extraction lost in transport ({}). Retrying.".format(str(err)))
+            return await tab.page.evaluate(script)
+
+    @staticmethod
+    def _extract_dom(payload):
+        """Returns extractions from payload, failed extractions as None."""
+
+        dom = payload["extractions"]
+
+        for key in EXTRACTIONS:
+            dom.setdefault(key, None)
+            if key in payload["errors"]:
+                _LOG.error(
+                    "Extraction `{}` failed: {}".format(key, payload["errors"][key])
+                )
+
+        return dom
+
+    @staticmethod
+    def _extract_content(payload):
+        """Text fingerprint of the page, and its normalized text in `text` mode."""
+
+        fingerprint = payload.get("fingerprint") or {}
+
+        return {
+            "content": payload.get("content"),
+            "hash": fingerprint.get("hash"),
+            "minhash": fingerprint.get("minhash"),
+        }
+
+    @staticmethod
+    async def _extract_performance_metrics(tab, payload):
         """Pull timing and calculated metrics from rendered page"""
 
         metrics = {}
 
         # Page Metrics #NOTE: Removing this because no current additive value.
-        # page_metrics = await self.page.metrics()
+        # page_metrics = await tab.page.metrics()
         # metrics['pageMetrics'] = parse_numerical_dict(page_metrics)
 
         # Performance Metrics
-        perf_metrics = await self.client.send("Performance.getMetrics")
+        perf_metrics = await tab.client.send("Performance.getMetrics")
         metrics["performanceMetrics"] = parse_numerical_dict(
             {i["name"]: i["value"] for i in perf_metrics["metrics"] if "name" in i}
         )
 
-        # Timing Metrics
-        timing_metrics = await self.page.evaluate(
-            "() => {return JSON.parse(JSON.stringify(window.performance.timing));}"
-        )
-        metrics["timing"] = parse_numerical_dict(
-            parse_performance_timing(timing_metrics)
-        )
+        # Timing Metrics, None when the page exposed no navigation timing.
+        timing = parse_performance_timing(payload.get("timing"))
+        if timing is None:
+            _LOG.error(
+                "Performance timing missing: {}".format(payload["errors"].get("timing"))
+            )
+        else:
+            timing = parse_numerical_dict(timing)
+        metrics["timing"] = timing
 
         # Calculated Metrics
-        calculated = await self._calculated_metrics(metrics)
-        metrics["calculated"] = parse_numerical_dict(calculated)
+        timing = timing or {}
+        calculated = {
+            "timeToFirstByte": timing.get("responseStart"),
+            "timeToInteractive": timing.get("domInteractive"),
+            "domContentLoaded": timing.get("domContentLoadedEventStart"),
+            "domComplete": timing.get("domComplete"),
+        }
+        calculated.update(payload["calculated"])
+        metrics["calculated"] = parse_numerical_dict(
+            {k: v for k, v in calculated.items() if v is not None}
+        )
 
         return metrics
 
-    async def _calculated_metrics(self, metrics):
-        """Extract and caculate important performance metrics"""
-
-        result = {}
-        expressions = {
-            "timeToFirstByte": (metrics["timing"]["responseStart"],),
-            "firstPaint": "() => {return performance.getEntriesByName('first-paint')[0].startTime;}",
-            "firstContentfulPaint": "() => {return performance.getEntriesByName('first-contentful-paint')[0].startTime;}",  # noqa
-            "largestContentfulPaint": "() => {return window.largestContentfulPaint;}",
-            "timeToInteractive": (metrics["timing"]["domInteractive"],),
-            "domContentLoaded": (metrics["timing"]["domContentLoadedEventStart"],),
-            "domComplete": (metrics["timing"]["domComplete"],),
-            "cumulativeLayoutShift": "() => {return window.cumulativeLayoutShiftScore;}",
-        }
+    def _extract_asset_cache(self, tab):
+        """Asset cache mode and the hits and misses of the render."""
 
-        for key, expression in expressions.items():
-            if isinstance(expression, str):
-                result[key] = await self.page.evaluate(expression)
-            else:
-                result[key] = expression[0]
+        if not self.asset_cache.active:
+            return None
 
-        return result
+        return {"mode": self.asset_cache.mode, **tab.asset_cache}
 
-    def _extract_coverage(self):
+    @staticmethod
+    def _extract_coverage(tab):
         """Handler function to parse coverage from CDP session"""
-        return parse_coverage(self.coverage["JSCoverage"], self.coverage["CSSCoverage"])
+
+        if not tab.coverage:
+            return None
+
+        return parse_coverage(tab.coverage.js, tab.coverage.css)
 
 
 def render_url(url):
     chrome = HeadlessChrome()
-    return chrome.render(url)
+    result = chrome.render(url)
+    chrome.close()
+    return result
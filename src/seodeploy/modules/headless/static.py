@@ -0,0 +1,239 @@
+#!/usr/bin/env python
+# coding: utf-8
+#
+# Copyright (c) 2020 JR Oakes
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+"""Static (no JavaScript) render engine for the Headless module."""
+
+import json
+import time
+from urllib.parse import urlsplit
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from lxml import html as lxml_html
+from lxml.etree import ParserError
+
+from seodeploy.lib.logging import get_logger
+from seodeploy.lib.config import Config
+from seodeploy.lib.helpers import environment_auth, get_environments
+
+from seodeploy.modules.headless.exceptions import URLMissingException
+from seodeploy.modules.headless.limiter import HostLimiter
+from seodeploy.modules.headless.helpers import (
+    content_fingerprint,
+    format_results,
+    body_hash,
+    hashes_bodies,
+    timed,
+    USER_AGENT,
+)
+
+
+_LOG = get_logger(__name__)
+
+
+# Same extractions as `EXTRACTIONS`, for server-rendered HTML.
+STATIC_EXTRACTIONS = {
+    "title": ("//title", "text"),
+    "description": ("//meta[@name='description']", "content"),
+    "h1": ("//h1", "text"),
+    "h2": ("//h2", "text"),
+    "links": ("//a", "href"),
+    "images": ("//img", "src"),
+    "canonical": ("//link[@rel='canonical']", "href"),
+    "robots": ("//meta[@name='robots']", "content"),
+    "schema": ("//script[@type='application/ld+json']", "json"),
+}
+
+# Elements removed before reading page text content.
+STATIC_CONTENT_EXCLUDE = "//script|//iframe|//style|//noscript|//link"
+
+
+class StaticRenderer:
+
+    """Fetches pages over pooled HTTP connections and extracts content without a browser.
+
+    Produces the same `format_results` structure as `HeadlessChrome`.  Performance
+    and coverage data need a browser, so they are returned as unavailable (None).
+
+    """
+
+    def __init__(self, config=None):
+        """Initialize StaticRenderer Class.
+
+        Parameters
+        ----------
+        config: Config class
+            Module config class.
+
+        """
+
+        self.config = config or Config(module="headless")
+        self.user_agent = self.config.headless.USER_AGENT or USER_AGENT
+        self.concurrency = int(getattr(self.config.headless, "tab_concurrency", 1) or 1)
+        self.timeout = int(getattr(self.config.headless, "static_timeout", 30) or 30)
+        self.content_mode = (
+            getattr(self.config.headless, "content_mode", None) or "fingerprint"
+        )
+        self.environments = get_environments(self.config.headless)
+        self.hash_bodies = hashes_bodies(self.config)
+
+        # Requests per host adapt to how the host copes, up to `tab_concurrency`.
+        self.limiter = HostLimiter.from_config(self.config, self.concurrency)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=self.concurrency, pool_maxsize=self.concurrency
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({"User-Agent": self.user_agent})
+
+    def close(self):
+        """Close pooled connections."""
+        self.session.close()
+
+    def render(self, url):
+        """Publicly accessible render function."""
+        return self.render_many([url], concurrency=1)[0]
+
+    def render_many(self, urls, concurrency=None):
+        """Fetch and extract several URLs at once.
+
+        Parameters
+        ----------
+        urls: list
+            URLs to render.
+        concurrency: int
+            Maximum number of requests at once.  Defaults to `tab_concurrency`.
+
+        Returns
+        -------
+        list
+            Results in the same order as `urls`, in format: {'page_data': <dict>, 'error': <str>}
+
+        """
+
+        with ThreadPoolExecutor(max_workers=concurrency or self.concurrency) as pool:
+            return list(pool.map(self._try_render, urls))
+
+    def _try_render(self, url):
+        """Render returning result dict."""
+
+        result = {"page_data": None, "error": None}
+
+        try:
+            # Errors, timeouts and server errors back off the host.
+            with self.limiter.slot(urlsplit(url).hostname if url else None) as slot:
+                dom = self._render(url)
+                slot.failed = dom["status"] >= 500
+
+            result["page_data"] = format_results(dom)
+
+        except URLMissingException:
+            error = "A valid URL was not supplied: " + str(url)
+            _LOG.error(error)
+            result["error"] = error
+
+        except (requests.exceptions.RequestException, ParserError) as err:
+            error = "Static render failed for: {} ({})".format(url, str(err))
+            _LOG.error(error)
+            result["error"] = error
+
+        return result
+
+    def _render(self, url):
+        """Fetch URL and extract page data."""
+
+        if not url:
+            raise URLMissingException("A URL is required to render.")
+
+        start = time.perf_counter()
+        timings = {}
+
+        with timed(timings, "fetch"):
+            response = self.session.get(url, auth=self._auth(url), timeout=self.timeout)
+
+        with timed(timings, "parse"):
+            document = lxml_html.document_fromstring(response.content)
+            document.make_links_absolute(response.url, resolve_base_href=True)
+
+        dom = {
+            "engine": "static",
+            "status": response.status_code,
+            "headers": {k.lower(): v for k, v in response.headers.items()},
+        }
+
+        if self.hash_bodies and "etag" not in dom["headers"]:
+            dom["body_hash"] = body_hash(response.content)
+
+        with timed(timings, "extract_dom"):
+            for key, (xpath, attribute) in STATIC_EXTRACTIONS.items():
+                dom[key] = self._extract(document, xpath, attribute)
+
+            content = self._extract_content(document)
+
+            dom["text"] = {
+                "content": content if self.content_mode == "text" else None,
+                **content_fingerprint(content),
+            }
+
+        timings["total"] = time.perf_counter() - start
+        dom["timings"] = {phase: round(value, 4) for phase, value in timings.items()}
+
+        return dom
+
+    def _auth(self, url):
+        """Basic auth if the environment of the URL has a user/pass defined."""
+        return environment_auth(self.environments, url)
+
+    @staticmethod
+    def _extract(document, xpath, attribute):
+        """Extract values of `attribute` for elements matching `xpath`."""
+
+        elements = document.xpath(xpath)
+
+        if attribute == "text":
+            return [el.text_content() for el in elements]
+
+        if attribute == "json":
+            try:
+                return [json.loads(el.text_content()) for el in elements]
+            except ValueError as err:
+                _LOG.error("Invalid JSON-LD schema: " + str(err))
+                return None
+
+        return [el.get(attribute, "") for el in elements]
+
+    @staticmethod
+    def _extract_content(document):
+        """Extracts normalized text content of the page body."""
+
+        for el in document.xpath(STATIC_CONTENT_EXCLUDE):
+            el.drop_tree()
+
+        body = document.find("body")
+        content = body.text_content() if body is not None else ""
+
+        return " ".join(content.split()).strip().lower()
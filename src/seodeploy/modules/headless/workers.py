@@ -0,0 +1,489 @@
+#!/usr/bin/env python
+# coding: utf-8
+#
+# Copyright (c) 2020 JR Oakes
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+"""Long-lived render worker processes for the Headless module."""
+
+import os
+import time
+import queue
+import asyncio
+import multiprocessing as mp
+from urllib.parse import urljoin
+from concurrent.futures import ThreadPoolExecutor
+
+from seodeploy.lib.logging import get_logger
+
+from seodeploy.modules.headless.render import HeadlessChrome
+from seodeploy.modules.headless.limiter import AsyncHostLimiter
+from seodeploy.modules.headless.budget import RunBudget, BUDGET_ERROR
+from seodeploy.modules.headless.pool import process_tree_rss
+from seodeploy.modules.headless.helpers import renders_paired
+from seodeploy.modules.headless.exceptions import (
+    BrowserCrashedException,
+    HeadlessException,
+)
+
+_LOG = get_logger(__name__)
+
+# Fresh browsers leased for a task after its browser crashes.
+CRASH_RETRIES = 2
+
+# Seconds between checks that workers are still alive, while waiting on results.
+RESULT_POLL = 5
+
+# Seconds workers get to stop once closed, before they are terminated.
+CLOSE_TIMEOUT = 30
+
+# Pages a worker renders between checks of the memory and liveness of its browser.
+BROWSER_CHECK_PAGES = 20
+
+
+def worker_lanes(config):
+    """Number of tasks each worker renders at once.
+
+    Paired tasks render two pages at once, so half as many run.
+    """
+
+    concurrency = int(getattr(config.headless, "tab_concurrency", 1) or 1)
+
+    if renders_paired(config):
+        return max(1, concurrency // 2)
+
+    return concurrency
+
+
+class RenderWorkers:
+    """Long-lived render processes, fed tasks through a queue for the whole run.
+
+    Each worker leases a browser from the pool and keeps it, runs `worker_lanes`
+    renders at once on its own event loop, and takes the next task as soon as a lane
+    is free.  Workers and browsers are started once per run instead of per batch.
+
+    Tasks are tuples of:
+        * ('host', <path>, <host>): Render the path on the host.
+        * ('paired', <path>, <prod host>, <stage host>): Render the path on both
+          hosts together.
+
+    """
+
+    def __init__(self, config, pool, size=None, budget=None):
+        """Initialize RenderWorkers Class.
+
+        Parameters
+        ----------
+        config: Config class
+            Module config class.
+        pool: BrowserPool
+            Pool the workers lease browsers from.
+        size: int
+            Number of worker processes.  Defaults to `render_workers`, then
+            `max_threads`, then the number of CPUs.  At most the pool size, since
+            each worker holds a browser, unless the pool shares fleet endpoints.
+        budget: RunBudget
+            Started run budget.  Workers stop rendering once it is exhausted.
+
+        """
+
+        self.config = config
+        self.pool = pool
+        self.budget = budget or RunBudget.from_config(config)
+        self.size = int(
+            size
+            or getattr(config.headless, "render_workers", None)
+            or getattr(config, "max_threads", None)
+            or os.cpu_count()
+            or 1
+        )
+
+        if self.size > pool.size and not pool.endpoints:
+            _LOG.warning(
+                "render_workers ({}) exceeds browser_pool_size ({}).".format(
+                    self.size, pool.size
+                )
+            )
+            self.size = pool.size
+
+        self.lanes = worker_lanes(config)
+        self.processes = []
+        self._tasks = None
+        self._results = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.close()
+
+    def start(self):
+        """Start the worker processes."""
+
+        self._tasks = mp.Queue()
+        self._results = mp.Queue()
+
+        for _ in range(self.size):
+            process = mp.Process(
+                target=_work,
+                args=(
+                    self.config,
+                    self.pool,
+                    self.budget,
+                    self._tasks,
+                    self._results,
+                    self.lanes,
+                ),
+                daemon=True,
+            )
+            process.start()
+            self.processes.append(process)
+
+        _LOG.info("Started {} render workers.".format(self.size))
+
+        return self
+
+    def close(self):
+        """Stop the workers, terminating any still running after `CLOSE_TIMEOUT`.
+
+        Tasks not started yet are dropped, and results not collected, eg. after a
+        worker died during `map`, are drained so no worker blocks on the result pipe.
+
+        """
+
+        _drain(self._tasks)
+
+        for _ in range(self.size * self.lanes):
+            self._tasks.put(None)
+
+        deadline = time.monotonic() + CLOSE_TIMEOUT
+
+        for process in self.processes:
+            while process.is_alive() and time.monotonic() < deadline:
+                _drain(self._results)
+                process.join(timeout=0.1)
+
+            if process.is_alive():
+                _LOG.warning("Terminating render worker {}.".format(process.pid))
+                process.terminate()
+                process.join()
+
+        self.processes = []
+
+    def map(self, tasks):
+        """Render tasks across the workers.
+
+        Parameters
+        ----------
+        tasks: list
+            Task tuples.
+
+        Returns
+        -------
+        list
+            Records in the same order as `tasks`.  `host` tasks return
+            {'path': <str>, 'page_data': <dict>, 'error': <str>} and `paired` tasks
+            {'path': <str>, 'prod': <dict>, 'stage': <dict>, 'error': <str>}.
+
+        """
+
+        for i, task in enumerate(tasks):
+            self._tasks.put((i, task))
+
+        records = [None] * len(tasks)
+
+        for _ in tasks:
+            i, record = self._get_result()
+            records[i] = record
+
+        return records
+
+    def _get_result(self):
+        """Next finished task, failing if a worker process died."""
+
+        while True:
+            try:
+                return self._results.get(timeout=RESULT_POLL)
+            except queue.Empty:
+                if not all(process.is_alive() for process in self.processes):
+                    raise HeadlessException("A render worker exited unexpectedly.")
+
+
+class _LeasedBrowser:
+    """A leased browser in use by a worker."""
+
+    def __init__(self, lease, chrome):
+        self.lease = lease
+        self.chrome = chrome
+        self.active = 0
+        self.checked = 0
+        self.retiring = False
+        self.closed = asyncio.Event()
+
+
+class _RenderWorker:
+    """Event loop side of a worker process."""
+
+    def __init__(self, config, pool, budget, tasks, results, lanes):
+        self.config = config
+        self.pool = pool
+        self.budget = budget
+        self.tasks = tasks
+        self.results = results
+        self.lanes = lanes
+        self.recycle_pages = int(
+            getattr(config.headless, "browser_recycle_pages", None) or 0
+        )
+        self.max_rss = (
+            int(getattr(config.headless, "browser_max_rss_mb", None) or 0) * 1024 * 1024
+        )
+
+        # Host limits outlive the browsers the worker renders with.
+        self.limiter = AsyncHostLimiter.from_config(
+            config, int(getattr(config.headless, "tab_concurrency", 1) or 1)
+        )
+
+        self.browser = None
+        self._lock = None
+        self._executor = None
+
+    async def run(self):
+        """Run lanes until each receives a stop sentinel."""
+
+        self._lock = asyncio.Lock()
+
+        # Blocking queue and lease calls run in threads, off the event loop.
+        self._executor = ThreadPoolExecutor(max_workers=self.lanes + 1)
+
+        await asyncio.gather(*[self._lane() for _ in range(self.lanes)])
+
+        if self.browser is not None:
+            self.browser.retiring = True
+            await self._close(self.browser)
+
+        self._executor.shutdown()
+
+    async def _lane(self):
+        """Render tasks one at a time, as they arrive."""
+
+        loop = asyncio.get_event_loop()
+
+        while True:
+            item = await loop.run_in_executor(self._executor, self.tasks.get)
+
+            if item is None:
+                break
+
+            i, task = item
+            record = await self._process(task)
+            await loop.run_in_executor(self._executor, self.results.put, (i, record))
+
+    async def _process(self, task):
+        """Render a task, retrying on a new browser if the browser crashes."""
+
+        # Queued tasks are drained without rendering once the budget is spent.
+        if self.budget.exhausted:
+            return _error_record(task, BUDGET_ERROR + task[1])
+
+        for _ in range(CRASH_RETRIES + 1):
+
+            try:
+                browser = await self._get_browser()
+            except BrowserCrashedException as err:
+                _LOG.error(str(err))
+                continue
+
+            crashed = False
+
+            try:
+                return await self._render(browser.chrome, task)
+
+            except BrowserCrashedException as err:
+                _LOG.error(str(err))
+                crashed = True
+
+            # Any other error fails the task only, so the lane keeps running.
+            except Exception as err:  # noqa
+                error = "Render error for {}: {}".format(task[1], str(err))
+                _LOG.error(error)
+                return _error_record(task, error)
+
+            finally:
+                await self._done(browser, crashed)
+
+        return _error_record(
+            task,
+            "Browser crashed {} times rendering: {}".format(CRASH_RETRIES + 1, task[1]),
+        )
+
+    async def _render(self, chrome, task):
+        """Render a task with `chrome`."""
+
+        if task[0] == "paired":
+            _, path, prod_host, stage_host = task
+            records = await chrome._render_paired([path], prod_host, stage_host, 2)
+            return records[0]
+
+        _, path, host = task
+
+        # Each host renders in its own context.
+        result = await chrome._try_render(
+            urljoin(host, path), context=await chrome._get_context(host)
+        )
+
+        return {
+            "path": path,
+            "page_data": result["page_data"],
+            "error": result["error"],
+        }
+
+    async def _get_browser(self):
+        """The worker browser, leasing and connecting one if needed."""
+
+        async with self._lock:
+
+            # A retiring browser is released before another is leased, so workers
+            # never hold two leases.
+            if self.browser is not None and self.browser.retiring:
+                await self.browser.closed.wait()
+                self.browser = None
+
+            if self.browser is None:
+                self.browser = await self._connect()
+
+            self.browser.active += 1
+
+            return self.browser
+
+    async def _connect(self):
+        """Lease a browser and connect to it."""
+
+        loop = asyncio.get_event_loop()
+        lease = await loop.run_in_executor(self._executor, self.pool.acquire)
+
+        try:
+            chrome = await HeadlessChrome.create(
+                config=self.config, endpoint=lease.endpoint
+            )
+        except Exception as err:  # noqa
+            lease.healthy = False
+            await loop.run_in_executor(self._executor, self.pool.release, lease)
+            raise BrowserCrashedException("Browser unreachable: " + str(err))
+
+        chrome.limiter = self.limiter
+        chrome.budget = self.budget
+
+        return _LeasedBrowser(lease, chrome)
+
+    async def _done(self, browser, crashed):
+        """Finish a task on `browser`, releasing it if it crashed or is due a recycle."""
+
+        browser.active -= 1
+
+        if crashed:
+            browser.lease.healthy = False
+            browser.retiring = True
+
+        # The pool recycles the browser once it is returned.
+        if self.recycle_pages and browser.chrome.pages >= self.recycle_pages:
+            browser.retiring = True
+
+        # Leases are kept for the whole run, so the pool only sees the browser when
+        # it is returned.  Its memory and liveness are checked here in between.
+        if (
+            not browser.retiring
+            and browser.chrome.pages >= browser.checked + BROWSER_CHECK_PAGES
+        ):
+            await self._check(browser)
+
+        if browser.retiring and browser.active == 0:
+            await self._close(browser)
+
+    async def _check(self, browser):
+        """Retire `browser` if it stopped answering or grew past `browser_max_rss_mb`."""
+
+        browser.checked = browser.chrome.pages
+
+        if not await browser.chrome._is_alive():
+            _LOG.error("Worker browser stopped answering: " + browser.lease.endpoint)
+            browser.lease.healthy = False
+            browser.retiring = True
+            return
+
+        if not self.max_rss or browser.lease.pid is None:
+            return
+
+        loop = asyncio.get_event_loop()
+        rss = await loop.run_in_executor(
+            self._executor, process_tree_rss, browser.lease.pid
+        )
+
+        # The pool relaunches the browser for memory once it is returned.
+        if rss is not None and rss >= self.max_rss:
+            _LOG.info(
+                "Retiring worker browser using {} MB.".format(rss // (1024 * 1024))
+            )
+            browser.retiring = True
+
+    async def _close(self, browser):
+        """Disconnect from a browser and return its lease."""
+
+        if browser.closed.is_set():
+            return
+
+        browser.closed.set()
+        browser.lease.pages = browser.chrome.pages
+
+        try:
+            await browser.chrome._close_browser()
+        except Exception as err:  # noqa
+            _LOG.error("Error closing worker browser: " + str(err))
+
+        loop = asyncio.get_event_loop()
+        await loop.run_in_executor(self._executor, self.pool.release, browser.lease)
+
+
+def _drain(items):
+    """Discard everything waiting in a queue."""
+
+    while True:
+        try:
+            items.get_nowait()
+        except queue.Empty:
+            return
+
+
+def _error_record(task, error):
+    """Record of a task that could not be rendered."""
+
+    if task[0] == "paired":
+        return {"path": task[1], "prod": None, "stage": None, "error": error}
+
+    return {"path": task[1], "page_data": None, "error": error}
+
+
+def _work(config, pool, budget, tasks, results, lanes):
+    """Worker process entry point."""
+
+    asyncio.set_event_loop(asyncio.new_event_loop())
+    asyncio.get_event_loop().run_until_complete(
+        _RenderWorker(config, pool, budget, tasks, results, lanes).run()
+    )
@@ -23,3 +23,110 @@
 # WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 
 """Package-wide test fixtures."""
+
+import pytest
+
+from seodeploy.modules.headless.pool import BrowserPool
+from seodeploy.modules.headless.exceptions import BrowserCrashedException
+
+
+class FakeProcess:
+    def __init__(self, pid):
+        self.pid = pid
+
+    def poll(self):
+        return None
+
+
+class FakeBrowser:
+    def __init__(self, number):
+        self.wsEndpoint = "ws://127.0.0.1:{}/devtools/browser/id".format(9000 + number)
+        self.process = FakeProcess(90000 + number)
+        self.closed = False
+        self.alive = True
+
+    async def version(self):
+        if not self.alive:
+            raise ConnectionError("Browser closed.")
+        return "HeadlessChrome"
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeChrome:
+    def __init__(self, endpoint=None):
+        self.endpoint = endpoint
+        self.pages = 0
+        self.created = []
+        self.reset = []
+        self.closed = []
+
+    async def _new_tab(self, context):
+        tab = object()
+        self.created.append(tab)
+        return tab
+
+    async def _reset_tab(self, tab):
+        self.reset.append(tab)
+
+    async def _close_tab(self, tab):
+        self.closed.append(tab)
+
+    async def _is_alive(self):
+        return True
+
+    async def _get_context(self, host):
+        return host
+
+    async def _try_render(self, url, context=None):
+        self.pages += 1
+        if "crash" in url:
+            raise BrowserCrashedException("Browser crashed rendering: " + url)
+        if "broken" in url:
+            raise ValueError("Unexpected error")
+        return {"page_data": {"url": url}, "error": None}
+
+    async def _render_paired(self, paths, prod_host, stage_host, concurrency):
+        prod = await self._try_render(prod_host + paths[0])
+        stage = await self._try_render(stage_host + paths[0])
+        return [
+            {
+                "path": paths[0],
+                "prod": prod["page_data"],
+                "stage": stage["page_data"],
+                "error": None,
+            }
+        ]
+
+    async def _close_browser(self):
+        pass
+
+
+@pytest.fixture
+def fake_chrome():
+    return FakeChrome()
+
+
+@pytest.fixture
+def mock_launch(mocker):
+    browsers = []
+
+    async def _launch():
+        browser = FakeBrowser(len(browsers))
+        browsers.append(browser)
+        return browser
+
+    mocker.patch.object(BrowserPool, "_launch", staticmethod(_launch))
+    return browsers
+
+
+@pytest.fixture
+def mock_chrome(mocker):
+    async def _create(config=None, endpoint=None):
+        return FakeChrome(endpoint)
+
+    mocker.patch(
+        "seodeploy.modules.headless.workers.HeadlessChrome.create",
+        side_effect=_create,
+    )
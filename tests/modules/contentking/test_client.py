@@ -0,0 +1,219 @@
+#! /usr/bin/env python
+# coding: utf-8
+#
+# Copyright (c) 2020 JR Oakes
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+"""Test Cases for ContentKing > Client Module"""
+
+import asyncio
+import pytest
+import requests
+
+from seodeploy.lib.config import Config
+from seodeploy.modules.contentking import client as ck_client
+from seodeploy.modules.contentking.client import (
+    AsyncContentKingClient,
+    ContentKingClient,
+    get_client,
+)
+from seodeploy.modules.contentking.exceptions import ContentKingAPIError
+
+
+class FakeResponse:
+    def __init__(self, status_code, data=None, headers=None):
+        self.status_code = status_code
+        self.data = data
+        self.headers = headers or {}
+        self.text = ""
+
+    def json(self):
+        if isinstance(self.data, Exception):
+            raise self.data
+        return self.data
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(str(self.status_code))
+
+
+class FakeSession:
+    def __init__(self, responses):
+        self.responses = responses
+        self.calls = []
+
+    def request(self, method, url, **kwargs):
+        self.calls.append((method, url, kwargs))
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+@pytest.fixture
+def sleeps(mocker):
+    return mocker.patch("seodeploy.modules.contentking.client.time.sleep")
+
+
+def test_client_retries(sleeps):
+
+    client = ContentKingClient("https://api.test/v1", report_api_key="key")
+    client.session = FakeSession(
+        [
+            requests.exceptions.Timeout("timeout"),
+            FakeResponse(429, headers={"Retry-After": "7"}),
+            FakeResponse(200, {"urls": []}),
+        ]
+    )
+
+    assert client.report("websites/1/pages/list", {"page": 1}) == {"urls": []}
+
+    method, url, kwargs = client.session.calls[0]
+    assert (method, url) == ("GET", "https://api.test/v1/websites/1/pages/list")
+    assert kwargs["headers"] == {"Authorization": "token key"}
+    assert kwargs["params"] == {"page": 1}
+
+    # Jittered backoff, then the wait asked for by the API.
+    assert 0 <= sleeps.call_args_list[0][0][0] <= 1
+    assert sleeps.call_args_list[1][0][0] == 7.0
+
+
+def test_client_rate_limit(sleeps, mocker):
+
+    limiter = mocker.Mock()
+    client = ContentKingClient("https://api.test/v1", limiter=limiter)
+    client.session = FakeSession([FakeResponse(503), FakeResponse(200, {})])
+
+    # Every attempt waits for the rate limit of its API.
+    client.check_url("https://locomotive.agency/")
+    assert [c[0][0] for c in limiter.acquire.call_args_list] == ["cms", "cms"]
+
+
+def test_client_failures(sleeps):
+
+    client = ContentKingClient("https://api.test/v1", retries=2)
+
+    # Client errors are not retried.
+    client.session = FakeSession([FakeResponse(404, {"message": "Not found"})])
+    assert client.check_url("https://locomotive.agency/") is None
+    assert not sleeps.called
+
+    # Retries stop after `retries`.
+    client.session = FakeSession([FakeResponse(503)] * 3)
+    assert client.check_url("https://locomotive.agency/") is None
+    assert sleeps.call_count == 2
+
+    client.session = FakeSession([ValueError("bad")])
+    with pytest.raises(ContentKingAPIError):
+        client.check_url("https://locomotive.agency/")
+
+
+def test_client_invalid_json(sleeps):
+
+    client = ContentKingClient("https://api.test/v1", retries=2)
+
+    # Successful responses without a JSON body are retried.
+    client.session = FakeSession(
+        [FakeResponse(200, ValueError("Expecting value")), FakeResponse(200, {})]
+    )
+    assert client.check_url("https://locomotive.agency/") == {}
+    assert sleeps.call_count == 1
+
+    client.session = FakeSession([FakeResponse(200, ValueError("Expecting value"))] * 3)
+    assert client.report("websites") is None
+
+
+def test_client_timeout(sleeps):
+
+    client = ContentKingClient("https://api.test/v1", timeout=20, backoff=0)
+
+    # Attempts never wait past the timeout of the request.
+    client.session = FakeSession([FakeResponse(200, {"urls": []})])
+    assert client.report("websites", timeout=5) == {"urls": []}
+    assert 0 < client.session.calls[0][2]["timeout"] <= 5
+
+    client.session = FakeSession([FakeResponse(200, {})])
+    client.report("websites", timeout=60)
+    assert client.session.calls[0][2]["timeout"] == 20
+
+    # Retries stop once the timeout has passed.
+    client.session = FakeSession([FakeResponse(503)] * 4)
+    assert client.report("websites", timeout=1e-9) is None
+    assert len(client.session.calls) <= 1
+
+
+def test_client_timeout_rate_limit(sleeps, mocker):
+
+    limiter = mocker.Mock()
+    limiter.acquire.return_value = None
+    client = ContentKingClient("https://api.test/v1", limiter=limiter)
+    client.session = FakeSession([FakeResponse(200, {})])
+
+    # No token within the timeout, so the request is not sent.
+    assert client.report("websites", timeout=5) is None
+    assert client.session.calls == []
+    assert 0 < limiter.acquire.call_args[0][1] <= 5
+
+
+def test_client_wait():
+
+    client = ContentKingClient("https://api.test/v1", backoff=2, max_backoff=5)
+
+    assert all(0 <= client.wait(i) <= min(5, 2 * 2**i) for i in range(6))
+    assert client.wait(0, FakeResponse(429, headers={"Retry-After": "-1"})) == 0.0
+    date = FakeResponse(429, headers={"Retry-After": "Wed, 21 Oct 2015 07:28:00 GMT"})
+    assert client.wait(0, date) == 0.0
+
+
+def test_get_client(mocker):
+
+    config = Config(module="contentking", cfiles=["tests/files/seotesting_config.yaml"])
+    mocker.patch.dict(ck_client._CLIENTS, clear=True)
+
+    client = get_client(config)
+
+    assert get_client(config) is client
+    assert client.endpoint == config.contentking.ENDPOINT + "/"
+    assert client.retries == 3
+
+
+def test_async_client():
+
+    client = ContentKingClient("https://api.test/v1", pool_size=2)
+    client.session = FakeSession([FakeResponse(200, {"ok": 1})] * 3)
+    pinger = AsyncContentKingClient(client, concurrency=5)
+
+    async def _run():
+        return await asyncio.gather(
+            pinger.check_url("https://locomotive.agency/a/"),
+            pinger.check_url("https://locomotive.agency/b/"),
+            pinger.report("websites", {"page": 1}),
+        )
+
+    loop = asyncio.new_event_loop()
+    try:
+        assert loop.run_until_complete(_run()) == [{"ok": 1}] * 3
+    finally:
+        loop.close()
+        pinger.close()
+
+    assert pinger.concurrency == 2
+    assert sorted(call[0] for call in client.session.calls) == ["GET", "POST", "POST"]
@@ -0,0 +1,156 @@
+#! /usr/bin/env python
+# coding: utf-8
+#
+# Copyright (c) 2020 JR Oakes
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+"""Test Cases for ContentKing > Functions Module"""
+
+from datetime import datetime, timedelta
+
+import pytz
+import pytest
+
+from seodeploy.lib.config import Config
+from seodeploy.modules.contentking.functions import (
+    load_report,
+    run_check_results,
+    run_path_pings,
+)
+from seodeploy.modules.contentking.exceptions import ContentKingAPIError
+
+
+class FakeClient:
+    pool_size = 10
+
+    def __init__(self, fail=(), pages=0, total=None):
+        self.fail = fail
+        self.urls = []
+        self.pages = pages
+        self.total = total
+        self.requested = []
+
+    def report(self, path, params=None, timeout=None):
+        page, per_page = params["page"], params["per_page"]
+        self.requested.append(page)
+        if page in self.fail:
+            return None
+        count = per_page if page < self.pages else per_page // 2
+        result = {"urls": [{"page": page}] * (count if page <= self.pages else 0)}
+        if self.total is not None:
+            result["total"] = self.total
+        return result
+
+    def check_url(self, url):
+        self.urls.append(url)
+        if url in self.fail:
+            raise ContentKingAPIError("error")
+        return {"ok": True}
+
+
+@pytest.fixture
+def config():
+    return Config(module="contentking", cfiles=["tests/files/seotesting_config.yaml"])
+
+
+def test_run_path_pings(mocker, config):
+
+    client = FakeClient()
+    mocker.patch(
+        "seodeploy.modules.contentking.functions.get_client", return_value=client
+    )
+
+    assert run_path_pings(["/path1/", "/path2/"], config) is True
+    assert sorted(client.urls) == [
+        "https://locomotive.agency/path1/",
+        "https://locomotive.agency/path2/",
+        "https://stg.locomotive.agency/path1/",
+        "https://stg.locomotive.agency/path2/",
+    ]
+
+
+def test_run_path_pings_errors(mocker, config):
+
+    client = FakeClient(fail={"https://stg.locomotive.agency/path2/"})
+    mocker.patch(
+        "seodeploy.modules.contentking.functions.get_client", return_value=client
+    )
+
+    with pytest.raises(ContentKingAPIError, match="stage"):
+        run_path_pings(["/path1/", "/path2/"], config)
+
+
+def test_run_check_results(mocker, config):
+
+    time_zone = pytz.timezone("Europe/Amsterdam")
+    start_time = datetime.now().astimezone(time_zone)
+    checks = []
+
+    def load_report(report, config, timeout=None, id=None, url=None):
+        assert timeout > 0
+        checks.append(url)
+        # Staging is recrawled on the second check.
+        recrawled = "stg" not in url or checks.count(url) > 1
+        checked_at = start_time + timedelta(seconds=1 if recrawled else -1)
+        return {
+            "unstable_last_checked_at": checked_at.isoformat(),
+            "content": [{"type": "title", "content": url}],
+            "open_issues": [],
+            "schema_org": None,
+        }
+
+    mocker.patch(
+        "seodeploy.modules.contentking.functions.load_report", side_effect=load_report
+    )
+    config.contentking.polling = {"initial_delay": 0.01}
+    config.contentking.replace_staging_host = False
+    summary = {}
+
+    result = run_check_results(["/path1/"], start_time, time_zone, config, summary)
+
+    page = result["stage"]["/path1/"]
+    assert page["error"] is None
+    assert page["prod"]["content"]["title"] == ["https://locomotive.agency/path1/"]
+    assert page["stage"]["content"]["title"] == ["https://stg.locomotive.agency/path1/"]
+    assert summary["recrawl checks"] == 3
+    assert summary["recrawl given up"] == 0
+
+
+def test_load_report_pages(mocker, config):
+
+    config.contentking.report_concurrency = 3
+    get_client = mocker.patch("seodeploy.modules.contentking.functions.get_client")
+
+    # Pages past the total are not requested, and pages are yielded in order.
+    get_client.return_value = client = FakeClient(pages=5, total=9)
+    pages = list(load_report("pages", config, id="1-1", per_page=2))
+    assert [page[0]["page"] for page in pages] == [1, 2, 3, 4, 5]
+    assert sorted(client.requested) == [1, 2, 3, 4, 5]
+
+    # Without a total, requests stop at the first short page.
+    get_client.return_value = client = FakeClient(pages=4)
+    pages = list(load_report("pages", config, id="1-1", per_page=2))
+    assert [len(page) for page in pages] == [2, 2, 2, 1]
+
+    # A failed page ends the report.
+    get_client.return_value = client = FakeClient(pages=5, fail={3})
+    pages = list(load_report("pages", config, id="1-1", per_page=2))
+    assert [len(page) for page in pages] == [2, 2, 0]
@@ -27,6 +27,8 @@
 import json
 import pytest
 
+from seodeploy.lib.config import Config
+from seodeploy.lib.exceptions import IncorrectConfigException
 from seodeploy.modules.contentking import SEOTestingModule
 from seodeploy.modules.contentking.exceptions import ContentSamplingError
 
@@ -35,17 +37,19 @@ from seodeploy.modules.contentking.exceptions import ContentSamplingError
 def mock_run_contentking(mocker):
     mock = mocker.patch("seodeploy.modules.contentking.run_contentking")
     mock.return_value = {
-        "/path1/": {
-            "prod": {"content": {"canonical": "test1"}},
-            "stage": {"content": {"canonical": "test1"}},
-            "error": None,
-        },
-        "/path2/": {
-            "prod": {"content": {"canonical": "test2"}},
-            "stage": {"content": {"canonical": "test3"}},
-            "error": None,
-        },
-        "/path3/": {"prod": None, "stage": None, "error": "error3"},
+        "stage": {
+            "/path1/": {
+                "prod": {"content": {"canonical": "test1"}},
+                "stage": {"content": {"canonical": "test1"}},
+                "error": None,
+            },
+            "/path2/": {
+                "prod": {"content": {"canonical": "test2"}},
+                "stage": {"content": {"canonical": "test3"}},
+                "error": None,
+            },
+            "/path3/": {"prod": None, "stage": None, "error": "error3"},
+        }
     }
     return mock
 
@@ -82,6 +86,21 @@ def test_contentking_module(mock_run_contentking):
     ]
 
 
+def test_contentking_module_environments(mock_run_contentking):
+
+    stage = mock_run_contentking.return_value["stage"]
+    mock_run_contentking.return_value = {"stage": stage, "canary": stage}
+
+    contentking = SEOTestingModule()
+    contentking.exclusions = {"content": {"canonical": False}}
+    sample_paths = ["/path1/", "/path2/", "/path3/"]
+
+    messages, errors = contentking.run(sample_paths)
+
+    assert [e["environment"] for e in errors] == ["stage", "canary"]
+    assert [m["environment"] for m in messages] == ["stage", "canary"]
+
+
 def test_contentking_get_pages(mock_load_report):
 
     contentking = SEOTestingModule()
@@ -115,3 +134,19 @@ def test_contentking_get_pages_bad_report(mock_load_report):
     # Bad results
     with pytest.raises(ContentSamplingError):
         contentking.get_samples(site_id, limit)
+
+
+def test_contentking_module_site_id():
+
+    config = Config(module="contentking", cfiles=["tests/files/seotesting_config.yaml"])
+    config.contentking.environments = {"stage": None, "canary": "https://canary.test"}
+
+    # A bare host has no ContentKing website to check.
+    with pytest.raises(IncorrectConfigException, match="canary"):
+        SEOTestingModule(config=config)
+
+    config.contentking.environments["canary"] = {
+        "host": "https://canary.test",
+        "site_id": "5-5671790",
+    }
+    assert SEOTestingModule(config=config)
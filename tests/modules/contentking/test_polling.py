@@ -0,0 +1,103 @@
+#! /usr/bin/env python
+# coding: utf-8
+#
+# Copyright (c) 2020 JR Oakes
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+"""Test Cases for ContentKing > Polling Module"""
+
+import time
+
+from seodeploy.modules.contentking.polling import DEADLINE_ERROR, RecrawlScheduler
+
+
+def test_scheduler_delay():
+
+    scheduler = RecrawlScheduler(None, initial_delay=4, backoff=2, max_delay=10)
+
+    assert 2 <= scheduler.delay(1) <= 4
+    assert 4 <= scheduler.delay(2) <= 8
+    assert 5 <= scheduler.delay(5) <= 10
+
+
+def test_scheduler_run():
+
+    calls = {}
+
+    def check(item, remaining):
+        assert 0 < remaining <= 0.3
+        calls[item] = calls.get(item, 0) + 1
+        if item == "error":
+            raise ValueError("bad")
+        if item == "slow" and calls[item] < 3:
+            return None
+        if item == "never":
+            return None
+        return item.upper()
+
+    scheduler = RecrawlScheduler(
+        check, concurrency=2, initial_delay=0.01, max_delay=0.02, deadline=0.3
+    )
+
+    start = time.monotonic()
+    results = scheduler.run(["fast", "slow", "never", "error"])
+
+    # The slow and never recrawled URLs do not hold up the others.
+    assert time.monotonic() - start < 1
+    assert results["fast"] == ("FAST", None)
+    assert results["slow"] == ("SLOW", None)
+    assert results["error"] == (None, "Unknown Error: bad")
+    assert results["never"] == (None, DEADLINE_ERROR.format(calls["never"]))
+    assert calls["never"] > 3
+    assert scheduler.given_up == 1
+    assert scheduler.checks == sum(calls.values())
+
+
+def test_scheduler_deadline():
+
+    def check(item, remaining):
+        time.sleep(0.1)
+        return None if item == "slow" else item
+
+    # Items due once the deadline has passed are given up without being checked.
+    scheduler = RecrawlScheduler(check, concurrency=1, deadline=0.05)
+    results = scheduler.run(["slow", "queued"])
+
+    assert results["queued"] == (None, DEADLINE_ERROR.format(0))
+    assert scheduler.checks == 1
+    assert scheduler.given_up == 2
+
+
+def test_scheduler_no_deadline():
+
+    calls = []
+
+    def check(item, remaining):
+        calls.append(remaining)
+        return item if len(calls) > 3 else None
+
+    # `0` is unlimited, like the run budget.
+    scheduler = RecrawlScheduler(check, initial_delay=0.01, max_delay=0.01, deadline=0)
+    results = scheduler.run(["slow"])
+
+    assert results["slow"] == ("slow", None)
+    assert calls == [None] * 4
+    assert scheduler.given_up == 0
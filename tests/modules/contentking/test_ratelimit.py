@@ -0,0 +1,119 @@
+#! /usr/bin/env python
+# coding: utf-8
+#
+# Copyright (c) 2020 JR Oakes
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+"""Test Cases for ContentKing > Rate Limit Module"""
+
+import multiprocessing as mp
+import pytest
+
+from seodeploy.lib.config import Config
+from seodeploy.lib.exceptions import IncorrectConfigException
+from seodeploy.modules.contentking import ratelimit
+from seodeploy.modules.contentking.ratelimit import (
+    RateLimiter,
+    TokenBucket,
+    get_rate_limiter,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(mocker):
+    clock = FakeClock()
+    mocker.patch.object(ratelimit.time, "monotonic", clock.monotonic)
+    mocker.patch.object(ratelimit.time, "sleep", clock.sleep)
+    return clock
+
+
+def test_token_bucket(clock):
+
+    bucket = TokenBucket(rate=2, burst=3)
+
+    # The burst is free, then requests are spaced at the rate.
+    assert [bucket.acquire() for _ in range(5)] == [0.0, 0.0, 0.0, 0.5, 0.5]
+
+    # Idle time refills tokens, up to the burst.
+    clock.now += 10
+    assert [bucket.acquire() for _ in range(4)] == [0.0, 0.0, 0.0, 0.5]
+
+    assert bucket.summary == {"requests": 9, "waits": 3, "wait seconds": 1.5}
+
+    with pytest.raises(IncorrectConfigException):
+        TokenBucket(rate=0)
+
+
+def test_token_bucket_timeout(clock):
+
+    bucket = TokenBucket(rate=2, burst=1)
+    assert bucket.acquire(timeout=0) == 0.0
+
+    # The next token is half a second away, so it is not taken within less.
+    assert bucket.acquire(timeout=0.25) is None
+    assert bucket.acquire(timeout=0.5) == 0.5
+    assert bucket.summary["requests"] == 2
+
+
+def _acquire(bucket, count):
+    for _ in range(count):
+        bucket.acquire()
+
+
+def test_token_bucket_processes():
+
+    bucket = TokenBucket(rate=1000, burst=1000)
+
+    processes = [mp.Process(target=_acquire, args=(bucket, 10)) for _ in range(2)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+    assert bucket.summary["requests"] == 20
+
+
+def test_rate_limiter(clock, mocker):
+
+    limiter = RateLimiter(cms={"rate": 1, "burst": 1})
+
+    assert limiter.buckets["reporting"].rate == 5.0
+    assert limiter.acquire("cms") == 0.0
+    assert limiter.acquire("cms") == 1.0
+    assert limiter.summary["cms api wait seconds"] == 1.0
+    assert limiter.summary["reporting api requests"] == 0
+
+    config = Config(module="contentking", cfiles=["tests/files/seotesting_config.yaml"])
+    mocker.patch.dict(ratelimit._LIMITERS, clear=True)
+
+    assert get_rate_limiter(config) is get_rate_limiter(config)
+    assert get_rate_limiter(config).buckets["cms"].burst == 5
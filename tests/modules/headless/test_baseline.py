@@ -0,0 +1,152 @@
+#! /usr/bin/env python
+# coding: utf-8
+#
+# Copyright (c) 2020 JR Oakes
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+"""Test Cases for Headless > Baseline Module"""
+
+import os
+
+from seodeploy.lib.config import Config
+from seodeploy.modules.headless.baseline import BaselineCache, config_fingerprint
+from seodeploy.modules.headless.helpers import body_hash
+
+HOST = "https://www.example.com"
+
+
+class FakeResponse:
+    def __init__(self, status_code, headers=None, content=b""):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.content = content
+
+
+def page_data(etag=None):
+    return {"status": 200, "headers": {"etag": etag} if etag else {}, "title": "A"}
+
+
+def test_baseline_cache_etag(mocker, tmp_path):
+
+    cache = BaselineCache(enabled=True, directory=str(tmp_path), fingerprint="a")
+    get = mocker.patch.object(cache.session, "get")
+
+    cache.store(
+        [
+            {"path": "/path1/", "page_data": page_data('"v1"'), "error": None},
+            {"path": "/path2/", "page_data": None, "error": "error2"},
+        ],
+        HOST,
+    )
+
+    # Stored with the ETag production served, without extra requests.
+    get.assert_not_called()
+
+    get.return_value = FakeResponse(304)
+    assert cache.lookup(["/path1/", "/path2/"], HOST) == {"/path1/": page_data('"v1"')}
+    assert get.call_args[1]["headers"] == {"If-None-Match": '"v1"'}
+
+    get.return_value = FakeResponse(200, {"ETag": '"v2"'})
+    assert cache.lookup(["/path1/"], HOST) == {}
+
+    # Entries are specific to the render settings.
+    get.return_value = FakeResponse(304)
+    other = BaselineCache(enabled=True, directory=str(tmp_path), fingerprint="b")
+    assert other.lookup(["/path1/"], HOST) == {}
+
+
+def test_baseline_cache_body_hash(mocker, tmp_path):
+
+    environments = {"prod": {"host": HOST, "auth_user": "user", "auth_pass": "pass"}}
+    cache = BaselineCache(
+        enabled=True, directory=str(tmp_path), environments=environments
+    )
+    get = mocker.patch.object(cache.session, "get")
+
+    # Stored with the hash of the body the render received, without extra requests.
+    data = {**page_data(), "body_hash": body_hash(b"<html>v1</html>")}
+    cache.store([{"path": "/", "page_data": data, "error": None}], HOST)
+    get.assert_not_called()
+
+    get.return_value = FakeResponse(200, content=b"<html>v1</html>")
+    assert cache.lookup(["/"], HOST) == {"/": data}
+    assert get.call_args[1]["auth"] == ("user", "pass")
+
+    get.return_value = FakeResponse(200, content=b"<html>v2</html>")
+    assert cache.lookup(["/"], HOST) == {}
+
+
+def test_baseline_cache_evict(tmp_path):
+
+    cache = BaselineCache(
+        enabled=True, directory=str(tmp_path), revalidate=False, max_mb=0
+    )
+    cache.store([{"path": "/", "page_data": page_data(), "error": None}], HOST)
+    cache.store([{"path": "/b/", "page_data": page_data(), "error": None}], HOST)
+
+    # Unlimited size keeps unexpired entries.
+    cache.evict()
+    assert len(os.listdir(str(tmp_path))) == 2
+
+    # Least recently used entries go first.
+    first, second = cache._path(HOST + "/"), cache._path(HOST + "/b/")
+    os.utime(first, (0, os.path.getmtime(first)))
+    cache.max_bytes = os.path.getsize(second)
+    cache.evict()
+    assert os.listdir(str(tmp_path)) == [os.path.basename(second)]
+
+    assert BaselineCache().lookup(["/"], HOST) == {}
+
+
+def _fingerprint(tmp_path, *replacements):
+    with open("tests/files/seotesting_config.yaml") as rf:
+        data = rf.read()
+
+    for old, new in replacements:
+        assert old in data
+        data = data.replace(old, new)
+
+    cfile = tmp_path / "config.yaml"
+    cfile.write_text(data)
+
+    return config_fingerprint(Config(module="headless", cfiles=[str(cfile)]))
+
+
+def test_config_fingerprint(tmp_path):
+
+    fingerprint = _fingerprint(tmp_path)
+
+    # Operational, top-level and other module settings do not change page data.
+    assert (
+        _fingerprint(
+            tmp_path,
+            ("batch_size: 5", "batch_size: 100"),
+            ("url_limit: 1000", "url_limit: 500"),
+            ("render_workers: 1", "render_workers: 8"),
+            ("time_col: unstable_last_checked_at", "time_col: last_checked_at"),
+        )
+        == fingerprint
+    )
+
+    changed = _fingerprint(
+        tmp_path, ("content_mode: fingerprint", "content_mode: text")
+    )
+    assert changed != fingerprint
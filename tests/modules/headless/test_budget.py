@@ -0,0 +1,105 @@
+#! /usr/bin/env python
+# coding: utf-8
+#
+# Copyright (c) 2020 JR Oakes
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+"""Test Cases for Headless > Budget Module"""
+
+import time
+import pytest
+
+from seodeploy.lib.config import Config
+from seodeploy.modules.headless.budget import RunBudget, TIMEOUT_MIN_SAMPLES
+from seodeploy.modules.headless.exceptions import IncorrectConfigException
+
+
+def test_run_budget_defaults():
+
+    config = Config(module="headless", cfiles=["tests/files/seotesting_config.yaml"])
+    budget = RunBudget.from_config(config).start()
+
+    # Unlimited budgets keep the inline tries and configured timeouts.
+    assert budget.tries == 3
+    assert budget.remaining is None
+    assert budget.exhausted is False
+    assert budget.timeout("stage.example.com", 60000) == 60000
+    assert budget.summary == {}
+
+
+def test_run_budget_deadline():
+
+    budget = RunBudget(seconds=60, deferred_retries=2)
+    assert budget.exhausted is False
+
+    budget.start()
+    assert budget.tries == 1
+    assert 0 < budget.remaining <= 60
+    assert 59000 < budget.timeout("stage.example.com", 120000) <= 60000
+
+    budget.deadline = time.time() - 1
+    assert budget.exhausted is True
+    assert budget.timeout("stage.example.com", 60000) == 1
+
+    summary = budget.summary
+    assert summary["run budget (s)"] == 60
+    assert summary["deferred retries"] == 0
+    assert "run budget used (%)" in summary
+
+
+def test_run_budget_adaptive_timeout():
+
+    budget = RunBudget(adaptive_timeout=True, timeout_factor=2, min_timeout_ms=1000)
+
+    for _ in range(TIMEOUT_MIN_SAMPLES - 1):
+        budget.observe("stage.example.com", 2000)
+    assert budget.timeout("stage.example.com", 60000) == 60000
+
+    budget.observe("stage.example.com", 2000)
+    assert budget.timeout("stage.example.com", 60000) == 4000
+    assert budget.timeout("stage.example.com", 3000) == 3000
+
+    # Hosts adapt separately, and never below the minimum.
+    for _ in range(TIMEOUT_MIN_SAMPLES):
+        budget.observe("fast.example.com", 100)
+    assert budget.timeout("fast.example.com", 60000) == 1000
+
+    with pytest.raises(IncorrectConfigException):
+        RunBudget(timeout_percentile=101)
+
+
+def test_run_budget_adaptive_timeout_backoff():
+
+    budget = RunBudget(adaptive_timeout=True, timeout_factor=2, min_timeout_ms=1000)
+
+    for _ in range(TIMEOUT_MIN_SAMPLES):
+        budget.observe("stage.example.com", 2000)
+    timeout = budget.timeout("stage.example.com", 60000)
+    assert timeout == 4000
+
+    # Timed out navigations are recorded at their timeout, which backs off.
+    for _ in range(TIMEOUT_MIN_SAMPLES):
+        budget.observe("stage.example.com", timeout)
+        backoff = budget.timeout("stage.example.com", 60000)
+        assert backoff > timeout or backoff == 60000
+        timeout = backoff
+
+    assert timeout == 60000
@@ -0,0 +1,75 @@
+#! /usr/bin/env python
+# coding: utf-8
+#
+# Copyright (c) 2020 JR Oakes
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+"""Test Cases for Headless > Cache Module"""
+
+import os
+import time
+import pytest
+
+from seodeploy.modules.headless.cache import AssetCache
+from seodeploy.modules.headless.exceptions import IncorrectConfigException
+
+
+def test_asset_cache_caches():
+
+    cache = AssetCache(mode="warm", hosts=["cdn.example.com"])
+
+    assert cache.active and cache.serves
+    assert cache.caches("https://cdn.example.com/app.js", "script")
+    assert cache.caches("https://img.cdn.example.com/logo.png", "image")
+    assert not cache.caches("https://cdn.example.com/app.js", "script", "POST")
+    assert not cache.caches("https://cdn.example.com/", "document")
+    assert not cache.caches("https://www.example.com/app.js", "script")
+
+    cold = AssetCache(mode="cold")
+    assert cold.active and not cold.serves
+    assert cold.caches("https://www.example.com/app.js", "script")
+
+    assert not AssetCache().caches("https://www.example.com/app.js", "script")
+
+    with pytest.raises(IncorrectConfigException):
+        AssetCache(mode="hot")
+
+
+def test_asset_cache_store(tmp_path):
+
+    cache = AssetCache(mode="warm", directory=str(tmp_path), ttl=60)
+    url = "https://cdn.example.com/app.css"
+
+    assert cache.get(url) is None
+
+    cache.put(url, 200, {"content-type": "text/css"}, b"body { color: red; }")
+
+    assert cache.get(url) == {
+        "status": 200,
+        "headers": {"content-type": "text/css"},
+        "body": b"body { color: red; }",
+    }
+    assert os.listdir(str(tmp_path)) == ["cdn.example.com"]
+
+    # Expired entries are not served.
+    path = cache._path(url)
+    os.utime(path, (time.time() - 120, time.time() - 120))
+    assert not cache.contains(url)
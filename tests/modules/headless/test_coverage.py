@@ -0,0 +1,70 @@
+#! /usr/bin/env python
+# coding: utf-8
+#
+# Copyright (c) 2020 JR Oakes
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+"""Test Cases for Headless > Coverage Module"""
+
+from seodeploy.modules.headless.coverage import CoverageCollector
+
+
+def test_coverage_collector_parse():
+
+    collector = CoverageCollector(client=None)
+
+    scripts = [
+        {
+            "url": "https://a.com/app.js",
+            "functions": [
+                {"ranges": [{"startOffset": 0, "endOffset": 200, "count": 1}]},
+                {"ranges": [{"startOffset": 50, "endOffset": 150, "count": 0}]},
+            ],
+        },
+        {"url": "", "functions": []},
+        {"url": "__pyppeteer_evaluation_script__", "functions": []},
+    ]
+
+    assert collector._parse_js(scripts) == [
+        {
+            "url": "https://a.com/app.js",
+            "ranges": [{"start": 0, "end": 50}, {"start": 150, "end": 200}],
+            "total": 200,
+        }
+    ]
+
+    collector._on_stylesheet_added(
+        {
+            "header": {
+                "styleSheetId": "1",
+                "sourceURL": "https://a.com/a.css",
+                "length": 80,
+            }
+        }
+    )
+    rule_usage = [
+        {"styleSheetId": "1", "startOffset": 0, "endOffset": 20, "used": True},
+        {"styleSheetId": "1", "startOffset": 20, "endOffset": 80, "used": False},
+    ]
+
+    assert collector._parse_css(rule_usage) == [
+        {"url": "https://a.com/a.css", "ranges": [{"start": 0, "end": 20}], "total": 80}
+    ]
@@ -0,0 +1,191 @@
+#! /usr/bin/env python
+# coding: utf-8
+#
+# Copyright (c) 2020 JR Oakes
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+"""Test Cases for Headless > Functions Module"""
+
+from seodeploy.lib.config import Config
+from seodeploy.modules.headless.functions import (
+    _split_paired_results,
+    _aggregate_runs,
+    _render_timings,
+    _retry_failed,
+    _render_batch,
+)
+from seodeploy.modules.headless.budget import RunBudget, BUDGET_ERROR
+
+
+def test_split_paired_results():
+
+    paired = [
+        {"path": "/path1/", "prod": {"a": 1}, "stage": {"a": 2}, "error": None},
+        {"path": "/path2/", "prod": None, "stage": None, "error": "error2"},
+    ]
+
+    prod_result, stage_result = _split_paired_results(paired)
+
+    assert prod_result == [
+        {"path": "/path1/", "page_data": {"a": 1}, "error": None},
+        {"path": "/path2/", "page_data": None, "error": "error2"},
+    ]
+    assert stage_result == [
+        {"path": "/path1/", "page_data": {"a": 2}, "error": None},
+        {"path": "/path2/", "page_data": None, "error": "error2"},
+    ]
+
+
+def test_aggregate_runs():
+
+    def page_data(fcp):
+        return {"status": 200, "performance": {"first_contentful_paint": fcp}}
+
+    results = [
+        {"path": "/path1/", "page_data": page_data(1.0), "error": None},
+        {"path": "/path2/", "page_data": None, "error": "error2"},
+        {"path": "/path1/", "page_data": page_data(3.0), "error": None},
+        {"path": "/path2/", "page_data": None, "error": "error2"},
+        {"path": "/path1/", "page_data": None, "error": "error1"},
+    ]
+
+    path1, path2 = _aggregate_runs(results, ["page_data"])
+
+    # Failed runs are left out of the aggregates.
+    assert path1["error"] is None
+    assert path1["page_data"]["performance"] == {"first_contentful_paint": 2.0}
+    assert path1["page_data"]["performance_stats"]["first_contentful_paint"] == {
+        "median": 2.0,
+        "p75": 2.5,
+        "iqr": 1.0,
+        "runs": 2,
+    }
+
+    assert path2 == {"path": "/path2/", "page_data": None, "error": "error2"}
+
+
+def test_render_timings():
+
+    records = [
+        {"path": "/path1/", "page_data": {"timings": {"total": 1.0}}, "error": None},
+        {"path": "/path2/", "page_data": None, "error": "error2"},
+    ]
+
+    assert _render_timings(records, "page_data", "prod") == [
+        {"path": "/path1/", "host": "prod", "timings": {"total": 1.0}}
+    ]
+
+
+class FakeWorkers:
+    def __init__(self, fail):
+        self.fail = fail
+        self.tasks = []
+
+    def map(self, tasks):
+        self.tasks.append(tasks)
+        return [
+            (
+                {"path": path, "page_data": None, "error": "error"}
+                if (path, host) in self.fail
+                else {
+                    "path": path,
+                    "page_data": {"timings": {"total": 1.0}},
+                    "error": None,
+                }
+            )
+            for _, path, host in tasks
+        ]
+
+
+def test_retry_failed():
+
+    config = Config(module="headless", cfiles=["tests/files/seotesting_config.yaml"])
+    prod, stage = config.headless.PROD_HOST, config.headless.STAGE_HOST
+    budget = RunBudget(deferred_retries=2)
+    timings = []
+
+    # Paired records share errors, and skipped renders are not retried.
+    prod_result = [
+        {"path": "/path1/", "page_data": {}, "error": "error1"},
+        {"path": "/path2/", "page_data": None, "error": "error2"},
+        {"path": "/path3/", "page_data": None, "error": BUDGET_ERROR + "/path3/"},
+    ]
+    stage_result = [
+        {"path": "/path1/", "page_data": None, "error": "error1"},
+        {"path": "/path2/", "page_data": None, "error": "error2"},
+        {"path": "/path3/", "page_data": None, "error": BUDGET_ERROR + "/path3/"},
+    ]
+
+    workers = FakeWorkers(fail={("/path2/", stage)})
+    results = {"prod": prod_result, "stage": stage_result}
+    environments = {"prod": prod, "stage": stage}
+    _retry_failed(results, environments, config, workers, budget, timings)
+
+    assert workers.tasks == [
+        [
+            ("host", "/path2/", prod),
+            ("host", "/path1/", stage),
+            ("host", "/path2/", stage),
+        ],
+        [("host", "/path2/", stage)],
+    ]
+    assert [r["error"] for r in prod_result] == [None, None, BUDGET_ERROR + "/path3/"]
+    assert [r["error"] for r in stage_result] == [
+        None,
+        "error",
+        BUDGET_ERROR + "/path3/",
+    ]
+    assert budget.retried == 4
+    assert budget.recovered == 2
+    assert len(timings) == 2
+
+
+def test_render_batch_environments():
+
+    config = Config(module="headless", cfiles=["tests/files/seotesting_config.yaml"])
+    config.headless.render_mode = "paired"
+    environments = {
+        "prod": "https://prod.test",
+        "stage": "https://stage.test",
+        "canary": "https://canary.test",
+    }
+    cached = {"/path1/": {}}
+    timings = []
+
+    # Paired mode needs two environments, so every environment is queued at once.
+    workers = FakeWorkers(fail={("/path2/", "https://canary.test")})
+    results = _render_batch(
+        ["/path1/", "/path2/"], config, environments, workers, cached, timings
+    )
+
+    assert workers.tasks == [
+        [
+            ("host", "/path2/", "https://prod.test"),
+            ("host", "/path1/", "https://stage.test"),
+            ("host", "/path2/", "https://stage.test"),
+            ("host", "/path1/", "https://canary.test"),
+            ("host", "/path2/", "https://canary.test"),
+        ]
+    ]
+    assert list(results) == ["prod", "stage", "canary"]
+    assert [r["path"] for r in results["prod"]] == ["/path2/"]
+    assert [r["error"] for r in results["canary"]] == [None, "error"]
+    assert len(timings) == 4
@@ -0,0 +1,203 @@
+#! /usr/bin/env python
+# coding: utf-8
+#
+# Copyright (c) 2020 JR Oakes
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+"""Test Cases for Headless > Helpers Module"""
+
+from seodeploy.modules.headless.helpers import (
+    aggregate_performance,
+    aggregate_timings,
+    annotate_text_similarity,
+    build_extraction_script,
+    content_fingerprint,
+    disjoint_ranges,
+    is_compared,
+    minhash_similarity,
+    parse_coverage_objects,
+    timed,
+    EXTRACTIONS,
+    CALCULATED_METRICS,
+    EXTRACTION_SCRIPT,
+    EXTRACTION_SCRIPTS,
+    MINHASH_SIZE,
+)
+
+
+def test_build_extraction_script():
+
+    script = build_extraction_script({"title": "() => document.title"}, {})
+
+    assert script.startswith("() => {")
+    assert '{"title": () => document.title}' in script
+    assert "cloneNode(true)" in script
+
+    for key in list(EXTRACTIONS) + list(CALCULATED_METRICS):
+        assert '"{}": '.format(key) in EXTRACTION_SCRIPT
+
+    # Page text only leaves the browser in `text` mode.
+    assert "if (false) { result.content = text; }" in EXTRACTION_SCRIPT
+    assert "if (true) { result.content = text; }" in EXTRACTION_SCRIPTS["text"]
+
+
+def test_is_compared():
+
+    ignore = {
+        "content": {"title": False},
+        "coverage": {"js": {"total_bytes": True, "unused_pc": True}},
+        "status": 0.5,
+    }
+
+    assert is_compared(ignore, "content")
+    assert is_compared(ignore, "status")
+    assert not is_compared(ignore, "coverage")
+    assert not is_compared(ignore, "performance")
+
+    ignore["coverage"]["js"]["unused_pc"] = 0.5
+    assert is_compared(ignore, "coverage")
+
+
+def test_disjoint_ranges():
+
+    ranges = [
+        {"startOffset": 0, "endOffset": 100, "count": 1},
+        {"startOffset": 10, "endOffset": 30, "count": 0},
+        {"startOffset": 15, "endOffset": 20, "count": 2},
+        {"startOffset": 50, "endOffset": 60, "count": 0},
+    ]
+
+    assert disjoint_ranges(ranges) == [
+        {"start": 0, "end": 10},
+        {"start": 15, "end": 20},
+        {"start": 30, "end": 50},
+        {"start": 60, "end": 100},
+    ]
+
+
+def test_parse_coverage_objects_total():
+
+    coverage = [
+        {"url": "https://a.com/a.js", "ranges": [{"start": 0, "end": 25}], "total": 100}
+    ]
+
+    assert parse_coverage_objects(coverage)["summary"]["totalUnused"] == 75.0
+
+
+def test_aggregate_performance():
+
+    path_runs = [
+        [
+            {"performance": {"nodes": 10, "first_paint": 1.0}},
+            {"performance": {"nodes": 20, "first_paint": None}},
+            {"performance": {"nodes": 30, "first_paint": 3.0}},
+            {"performance": {"nodes": 40, "first_paint": 4.0}},
+        ],
+        [],
+    ]
+
+    result, missing = aggregate_performance(path_runs, statistic="p75")
+
+    assert missing is None
+    assert result["performance"] == {"nodes": 32.5, "first_paint": 3.5}
+    assert result["performance_stats"]["nodes"] == {
+        "median": 25.0,
+        "p75": 32.5,
+        "iqr": 15.0,
+        "runs": 4,
+    }
+    assert result["performance_stats"]["first_paint"]["runs"] == 3
+
+
+def test_content_fingerprint():
+
+    text = "the quick brown fox jumps over the lazy dog"
+    fingerprint = content_fingerprint(text)
+
+    # Same values as the browser-side script.
+    assert fingerprint["hash"] == "ef693ff0a0ec5a27"
+    assert fingerprint["minhash"][:2] == [193524695, 2066799055]
+    assert len(fingerprint["minhash"]) == MINHASH_SIZE
+
+    assert content_fingerprint("") == {"hash": "811c9dc51f2be47c", "minhash": []}
+
+    edited = content_fingerprint(text + " and then runs far away")
+    similarity = minhash_similarity(fingerprint["minhash"], edited["minhash"])
+
+    assert 0.2 < similarity < 1
+    assert minhash_similarity(fingerprint["minhash"], fingerprint["minhash"]) == 1
+    assert minhash_similarity(fingerprint["minhash"], []) is None
+
+
+def test_annotate_text_similarity():
+
+    page_data = {
+        "/": {
+            "prod": {"text_minhash": [1, 2, 3, 4]},
+            "stage": {"text_minhash": [1, 2, 3, 5]},
+            "error": None,
+        }
+    }
+    diffs = [
+        {
+            "path": "/",
+            "diffs": [
+                {"type": "change", "item": "content.text_hash", "element": ""},
+                {"type": "change", "item": "content.title", "element": ""},
+            ],
+        }
+    ]
+
+    annotate_text_similarity(diffs, page_data)
+
+    assert diffs[0]["diffs"][0]["element"] == "similarity: 0.75"
+    assert diffs[0]["diffs"][1]["element"] == ""
+
+
+def test_timed():
+
+    timings = {"navigate": 1.0}
+
+    with timed(timings, "navigate"):
+        pass
+
+    with timed(timings, "settle"):
+        pass
+
+    # Repeated phases add up.
+    assert 1.0 <= timings["navigate"] < 1.5
+    assert 0 <= timings["settle"] < 0.5
+
+
+def test_aggregate_timings():
+
+    timings = [
+        {"navigate": 1.0, "total": 2.0},
+        {"navigate": 3.0, "total": 4.0, "page_setup": 0.5},
+        {"navigate": 2.0, "total": 3.0},
+    ]
+
+    phases = aggregate_timings(timings)
+
+    assert list(phases) == ["navigate", "total", "page_setup"]
+    assert phases["navigate"] == {"p50": 2.0, "p95": 2.9, "max": 3.0, "count": 3}
+    assert phases["page_setup"] == {"p50": 0.5, "p95": 0.5, "max": 0.5, "count": 1}
+    assert aggregate_timings([]) == {}
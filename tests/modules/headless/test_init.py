@@ -33,17 +33,19 @@ from seodeploy.modules.headless import SEOTestingModule
 def mock_run_render(mocker):
     mock = mocker.patch("seodeploy.modules.headless.run_render")
     mock.return_value = {
-        "/path1/": {
-            "prod": {"content": {"canonical": "test1"}},
-            "stage": {"content": {"canonical": "test1"}},
-            "error": None,
-        },
-        "/path2/": {
-            "prod": {"content": {"canonical": "test2"}},
-            "stage": {"content": {"canonical": "test3"}},
-            "error": None,
-        },
-        "/path3/": {"prod": None, "stage": None, "error": "error3"},
+        "stage": {
+            "/path1/": {
+                "prod": {"content": {"canonical": "test1"}},
+                "stage": {"content": {"canonical": "test1"}},
+                "error": None,
+            },
+            "/path2/": {
+                "prod": {"content": {"canonical": "test2"}},
+                "stage": {"content": {"canonical": "test3"}},
+                "error": None,
+            },
+            "/path3/": {"prod": None, "stage": None, "error": "error3"},
+        }
     }
     return mock
 
@@ -0,0 +1,70 @@
+#! /usr/bin/env python
+# coding: utf-8
+#
+# Copyright (c) 2020 JR Oakes
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+"""Test Cases for Headless > Intercept Module"""
+
+import pytest
+
+from seodeploy.modules.headless.intercept import RequestFilter, domain_match
+from seodeploy.modules.headless.exceptions import IncorrectConfigException
+
+
+def test_domain_match():
+    domains = {"doubleclick.net", "google-analytics.com"}
+    assert domain_match("doubleclick.net", domains)
+    assert domain_match("stats.g.doubleclick.net", domains)
+    assert not domain_match("notdoubleclick.net", domains)
+    assert not domain_match("locomotive.agency", domains)
+
+
+def test_request_filter_profiles():
+    page_host = "www.locomotive.agency"
+
+    passthrough = RequestFilter()
+    assert not passthrough.active
+    assert not passthrough.blocks("https://cdn.com/font.woff2", "font", page_host)
+
+    types = RequestFilter(profile="resource_types", block_resource_types=["font"])
+    assert types.blocks("https://cdn.com/font.woff2", "font", page_host)
+    assert not types.blocks("https://cdn.com/app.js", "script", page_host)
+
+    third_party = RequestFilter(profile="third_party", block_domains=["hotjar.com"])
+    assert third_party.blocks("https://static.hotjar.com/c.js", "script", page_host)
+    assert not third_party.blocks("https://locomotive.agency/a.js", "script", page_host)
+
+    first_party = RequestFilter(profile="first_party", allow_domains=["cdn.net"])
+    assert not first_party.blocks("https://locomotive.agency/a.js", "script", page_host)
+    assert not first_party.blocks(
+        "https://img.locomotive.agency/a.png", "image", page_host
+    )
+    assert not first_party.blocks("https://x.cdn.net/a.css", "stylesheet", page_host)
+    assert first_party.blocks("https://static.hotjar.com/c.js", "script", page_host)
+
+    # Navigation requests are never blocked.
+    assert not first_party.blocks("https://other.com/", "document", page_host)
+
+
+def test_request_filter_bad_profile():
+    with pytest.raises(IncorrectConfigException):
+        RequestFilter(profile="everything")
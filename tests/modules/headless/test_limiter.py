@@ -0,0 +1,144 @@
+#! /usr/bin/env python
+# coding: utf-8
+#
+# Copyright (c) 2020 JR Oakes
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+"""Test Cases for Headless > Limiter Module"""
+
+import time
+import asyncio
+import threading
+import pytest
+
+from seodeploy.modules.headless.limiter import (
+    AsyncHostLimiter,
+    HostLimit,
+    HostLimiter,
+)
+from seodeploy.modules.headless.exceptions import IncorrectConfigException
+
+
+def _state(limiter):
+    """Current limit and number of back offs of each host."""
+    return {
+        host: (int(limit.limit), limit.decreases)
+        for host, limit in limiter.limits.items()
+    }
+
+
+def test_host_limit():
+
+    limit = HostLimit(initial=2, minimum=1, maximum=4, backoff=0.5, latency_factor=3)
+
+    # Additive increase: about one per round of `limit` healthy requests.
+    for _ in range(3):
+        limit.update(1.0, failed=False)
+    assert limit.limit == pytest.approx(3.245, abs=0.001)
+    assert limit.latency == 1.0
+
+    # Multiplicative decrease on failures, once for requests already in flight.
+    limit.active = 2
+    assert limit.update(1.0, failed=True) is True
+    assert limit.limit == pytest.approx(1.622, abs=0.001)
+    assert limit.update(1.0, failed=True) is False
+    assert limit.update(1.0, failed=True) is True
+    assert limit.decreases == 2
+
+    # Latency spikes back off too, but never below the minimum.
+    assert limit.limit == 1.0
+    assert limit.update(5.0, failed=False) is False
+    assert limit.limit == 1.0
+
+    # Never above the maximum.
+    for _ in range(50):
+        limit.update(1.0, failed=False)
+    assert limit.limit == 4.0
+
+
+def test_host_limiter_threads():
+
+    limiter = HostLimiter(enabled=True, initial=1, maximum=4, latency_factor=1e9)
+    running = []
+    peak = []
+    lock = threading.Lock()
+
+    def _request():
+        with limiter.slot("stage.example.com"):
+            with lock:
+                running.append(1)
+                peak.append(len(running))
+            time.sleep(0.01)
+            with lock:
+                running.pop()
+
+    threads = [threading.Thread(target=_request) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert max(peak) <= 4
+    assert _state(limiter)["stage.example.com"] == (4, 0)
+
+    # Exceptions count as failures.
+    with pytest.raises(ValueError):
+        with limiter.slot("stage.example.com"):
+            raise ValueError("timeout")
+
+    assert _state(limiter)["stage.example.com"] == (2, 1)
+
+
+def test_async_host_limiter():
+
+    limiter = AsyncHostLimiter(enabled=True, initial=2, maximum=2, latency_factor=100)
+    running = {"now": 0, "peak": 0}
+
+    async def _render(host):
+        async with limiter.slot(host) as slot:
+            running["now"] += 1
+            running["peak"] = max(running["peak"], running["now"])
+            await asyncio.sleep(0.01)
+            running["now"] -= 1
+            slot.failed = host == "down.example.com"
+
+    async def _run():
+        await asyncio.gather(*[_render("stage.example.com") for _ in range(6)])
+        await _render("down.example.com")
+
+    asyncio.new_event_loop().run_until_complete(_run())
+
+    assert running["peak"] == 2
+    assert _state(limiter) == {"stage.example.com": (2, 0), "down.example.com": (1, 1)}
+
+
+def test_host_limiter_disabled():
+
+    limiter = HostLimiter(maximum=1)
+
+    with limiter.slot("stage.example.com"):
+        with limiter.slot("stage.example.com") as slot:
+            slot.failed = True
+
+    assert _state(limiter) == {}
+
+    with pytest.raises(IncorrectConfigException):
+        HostLimiter(backoff=1.5)
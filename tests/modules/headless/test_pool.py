@@ -0,0 +1,191 @@
+#! /usr/bin/env python
+# coding: utf-8
+#
+# Copyright (c) 2020 JR Oakes
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+"""Test Cases for Headless > Pool Module"""
+
+import os
+import asyncio
+import pickle
+import pytest
+
+from seodeploy.lib.config import Config
+from seodeploy.modules.headless.pool import (
+    BrowserPool,
+    PagePool,
+    parse_endpoints,
+    process_tree_rss,
+)
+from seodeploy.modules.headless.exceptions import BrowserCrashedException
+
+
+def test_browser_pool_lease(mock_launch):
+
+    config = Config(module="headless", cfiles=["tests/files/seotesting_config.yaml"])
+
+    with BrowserPool(config=config, size=2) as pool:
+        assert len(mock_launch) == 2
+
+        with pool.lease() as first:
+            with pool.lease() as second:
+                assert {first.endpoint, second.endpoint} == {
+                    b.wsEndpoint for b in mock_launch
+                }
+
+        # Leases are returned to the pool.
+        with pool.lease() as third:
+            assert third.endpoint in {b.wsEndpoint for b in mock_launch}
+
+        # Workers receive only the lease queue.
+        worker_pool = pickle.loads(pickle.dumps(pool))
+        assert worker_pool.browsers == []
+        with worker_pool.lease() as lease:
+            assert lease.endpoint in {b.wsEndpoint for b in mock_launch}
+
+    assert all(b.closed for b in mock_launch)
+
+
+def test_browser_pool_supervisor(mock_launch):
+
+    config = Config(module="headless", cfiles=["tests/files/seotesting_config.yaml"])
+    config.headless.browser_recycle_pages = 10
+    config.headless.browser_max_rss_mb = 0
+
+    with BrowserPool(config=config, size=1) as pool:
+
+        # Recycled after `browser_recycle_pages` pages, across leases.
+        for pages in (6, 4):
+            with pool.lease() as lease:
+                lease.pages = pages
+
+        # Crashes reported by workers relaunch the browser.
+        with pytest.raises(BrowserCrashedException):
+            with pool.lease() as lease:
+                assert lease.endpoint == mock_launch[1].wsEndpoint
+                raise BrowserCrashedException("crashed")
+
+        # Browsers that stop answering are relaunched on return.
+        with pool.lease() as lease:
+            assert lease.endpoint == mock_launch[2].wsEndpoint
+            mock_launch[2].alive = False
+
+        with pool.lease() as lease:
+            assert lease.endpoint == mock_launch[3].wsEndpoint
+
+        assert all(b.closed for b in mock_launch[:3])
+        assert pool.restarts == {"crashed": 2, "pages": 1, "memory": 0}
+        assert pool.summary["browser restarts"] == 3
+
+
+def test_browser_pool_endpoints(mock_launch):
+
+    config = Config(module="headless", cfiles=["tests/files/seotesting_config.yaml"])
+    config.headless.browser_endpoints = "ws://fleet-a:9222/id, http://fleet-b:9222"
+
+    with BrowserPool(config=config) as pool:
+        assert pool.size == 2
+        assert mock_launch == []
+
+        # Shared endpoints are leased least-loaded, without waiting.
+        first, second, third = pool.acquire(), pool.acquire(), pool.acquire()
+        assert [first.endpoint, second.endpoint, third.endpoint] == [
+            "ws://fleet-a:9222/id",
+            "http://fleet-b:9222",
+            "ws://fleet-a:9222/id",
+        ]
+
+        pool.release(second)
+        assert pool.acquire().endpoint == "http://fleet-b:9222"
+
+        # Failed endpoints are avoided while another endpoint is healthy.
+        first.healthy = False
+        pool.release(first)
+        worker_pool = pickle.loads(pickle.dumps(pool))
+        assert worker_pool.acquire().endpoint == "http://fleet-b:9222"
+
+    assert pool.summary == {"browser endpoint failures": 1}
+
+
+def test_parse_endpoints():
+
+    assert parse_endpoints(None) == []
+    assert parse_endpoints("ws://a/id,") == ["ws://a/id"]
+    assert parse_endpoints(["ws://a/id", " ws://b/id "]) == ["ws://a/id", "ws://b/id"]
+
+
+def test_process_tree_rss():
+
+    assert process_tree_rss(os.getpid()) > 0
+    assert process_tree_rss(-1) is None
+
+
+def test_page_pool_reuse(fake_chrome):
+
+    chrome = fake_chrome
+    page_pool = PagePool(chrome, context=None, size=2)
+
+    async def _run():
+        first = await page_pool.acquire()
+        second = await page_pool.acquire()
+        await page_pool.release(first)
+
+        # Released tabs are reused rather than new pages opened.
+        assert await page_pool.acquire() is first
+
+        # Unhealthy tabs are closed and their slot freed.
+        await page_pool.release(second, healthy=False)
+        assert second in chrome.closed
+        await page_pool.acquire()
+        assert len(chrome.created) == 3
+
+        await page_pool.release(first)
+        await page_pool.close()
+
+    asyncio.new_event_loop().run_until_complete(_run())
+
+    assert chrome.reset == [chrome.created[0], chrome.created[0]]
+    assert chrome.created[0] in chrome.closed
+    assert page_pool.created == 1
+
+
+def test_page_pool_release_wakes_waiter(fake_chrome):
+
+    chrome = fake_chrome
+    page_pool = PagePool(chrome, context=None, size=1)
+
+    async def _run():
+        tab = await page_pool.acquire()
+        waiter = asyncio.ensure_future(page_pool.acquire())
+        await asyncio.sleep(0)
+        assert not waiter.done()
+
+        # Closing the only tab frees its slot, so the waiter opens a replacement.
+        await page_pool.release(tab, healthy=False)
+        replacement = await asyncio.wait_for(waiter, 1)
+
+        assert replacement is not tab
+        assert page_pool.created == 1
+
+    asyncio.new_event_loop().run_until_complete(_run())
+
+    assert len(chrome.created) == 2
@@ -0,0 +1,60 @@
+#! /usr/bin/env python
+# coding: utf-8
+#
+# Copyright (c) 2020 JR Oakes
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+"""Test Cases for Headless > Readiness Module"""
+
+import pytest
+
+from seodeploy.modules.headless.readiness import ReadinessPolicy
+from seodeploy.modules.headless.exceptions import IncorrectConfigException
+
+
+def test_readiness_overrides():
+
+    policy = ReadinessPolicy(
+        strategy="dom_stable",
+        timeout=30000,
+        overrides=[
+            {"pattern": "/blog/", "strategy": "selector", "selector": "article"}
+        ],
+    )
+
+    assert policy.for_url("https://locomotive.agency/") is policy
+
+    blog = policy.for_url("https://locomotive.agency/blog/post/")
+    assert blog.strategy == "selector"
+    assert blog.selector == "article"
+    assert blog.timeout == 30000
+
+
+def test_readiness_bad_config():
+
+    with pytest.raises(IncorrectConfigException):
+        ReadinessPolicy(strategy="whenever")
+
+    with pytest.raises(IncorrectConfigException):
+        ReadinessPolicy(wait_until="networkidle5")
+
+    with pytest.raises(IncorrectConfigException):
+        ReadinessPolicy(strategy="selector")
@@ -0,0 +1,278 @@
+#! /usr/bin/env python
+# coding: utf-8
+#
+# Copyright (c) 2020 JR Oakes
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+"""Test Cases for Headless > Render Module"""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from pyppeteer.errors import NetworkError, PageError
+
+from seodeploy.lib.config import Config
+from seodeploy.modules.headless.render import HeadlessChrome
+from seodeploy.modules.headless.budget import RunBudget
+from seodeploy.modules.headless.functions import _retry_failed
+from seodeploy.modules.headless.helpers import EXTRACTIONS
+
+PROD = "https://prod.test"
+STAGE = "https://stage.test"
+
+
+class FakeResponse:
+    status = 200
+    headers = {"content-type": "text/html"}
+
+
+class FakeClient:
+    async def send(self, method, params=None):
+        return {"metrics": []}
+
+    async def detach(self):
+        pass
+
+
+class FakeTarget:
+    async def createCDPSession(self):
+        return FakeClient()
+
+
+class FakePage:
+    def __init__(self, context):
+        self.context = context
+        self.url = None
+        self.target = FakeTarget()
+
+    async def setBypassCSP(self, enabled):
+        pass
+
+    async def setUserAgent(self, user_agent):
+        pass
+
+    async def setViewport(self, viewport):
+        pass
+
+    async def evaluateOnNewDocument(self, script):
+        pass
+
+    async def authenticate(self, credentials):
+        pass
+
+    async def goto(self, url, **kwargs):
+        events = self.context.events
+
+        if url == "about:blank":
+            events.append(("reset", self.url))
+            self.url = None
+            return None
+
+        if url in self.context.unreachable:
+            self.context.unreachable.remove(url)
+            raise PageError("net::ERR_NAME_NOT_RESOLVED at " + url)
+
+        self.url = url
+        events.append(("start", url))
+        self.context.in_flight += 1
+        self.context.max_in_flight = max(
+            self.context.max_in_flight, self.context.in_flight
+        )
+
+        await asyncio.sleep(self.context.delays.get(url, 0))
+
+        self.context.in_flight -= 1
+        events.append(("end", url))
+        return FakeResponse()
+
+    async def evaluate(self, script, *args):
+        timing = {"navigationStart": 1, "responseStart": 2, "domInteractive": 3}
+        timing.update({"domContentLoadedEventStart": 4, "domComplete": 5})
+        return {
+            "extractions": {key: [self.url] for key in EXTRACTIONS},
+            "errors": {},
+            "timing": timing,
+            "calculated": {},
+            "fingerprint": {"hash": self.url, "minhash": []},
+        }
+
+    async def close(self):
+        pass
+
+
+class FakeContext:
+    def __init__(self, delays=None, events=None, unreachable=None):
+        self.delays = delays or {}
+        self.unreachable = list(unreachable or [])
+        self.events = [] if events is None else events
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.pages = 0
+
+    async def newPage(self):
+        self.pages += 1
+        return FakePage(self)
+
+
+@pytest.fixture
+def chrome():
+    config = Config(module="headless", cfiles=["tests/files/seotesting_config.yaml"])
+    config.headless.adaptive_concurrency = {"enabled": False}
+    asyncio.set_event_loop(asyncio.new_event_loop())
+
+    chrome = HeadlessChrome(config=config, build=False)
+    chrome.collect_coverage = False
+    chrome.browser = FakeContext()
+
+    yield chrome
+
+    asyncio.get_event_loop().close()
+
+
+def test_render_paired(chrome):
+
+    events = []
+    contexts = {
+        PROD: FakeContext({PROD + "/a/": 0.05}, events),
+        STAGE: FakeContext({}, events),
+    }
+
+    async def _get_context(host):
+        return contexts[host]
+
+    chrome._get_context = _get_context
+
+    records = chrome.render_paired(["/a/", "/b/"], PROD, STAGE, concurrency=4)
+
+    # Both renders of a path are scheduled together, each in its host context.
+    assert events.index(("start", STAGE + "/a/")) < events.index(("end", PROD + "/a/"))
+    assert events.index(("end", STAGE + "/a/")) < events.index(("end", PROD + "/a/"))
+    assert contexts[PROD].pages == contexts[STAGE].pages == 2
+
+    # Joined as soon as both sides finish, so the slow path comes last.
+    assert [record["path"] for record in records] == ["/b/", "/a/"]
+    record = records[1]
+    assert record["error"] is None
+    assert record["prod"]["content"]["title"] == [PROD + "/a/"]
+    assert record["stage"]["content"]["title"] == [STAGE + "/a/"]
+
+
+def test_extract_dom_failures(chrome):
+
+    payload = {"extractions": {"title": None}, "errors": {"title": "TypeError"}}
+
+    dom = chrome._extract_dom(payload)
+
+    # Failures arrive as nulls and are not re-run; keys lost in transit are None.
+    assert set(dom) == set(EXTRACTIONS)
+    assert dom["title"] is None
+    assert all(value is None for value in dom.values())
+
+
+def test_evaluate_transport_error(chrome):
+
+    calls = []
+
+    async def evaluate(script):
+        calls.append(script)
+        if len(calls) == 1:
+            raise NetworkError("Execution context was destroyed.")
+        return {"extractions": {}}
+
+    tab = SimpleNamespace(page=SimpleNamespace(evaluate=evaluate))
+    payload = asyncio.get_event_loop().run_until_complete(chrome._evaluate(tab))
+
+    assert payload == {"extractions": {}}
+    assert len(calls) == 2
+
+
+def test_performance_metrics_without_timing(chrome):
+
+    tab = SimpleNamespace(client=FakeClient())
+    payload = {
+        "timing": None,
+        "calculated": {"firstPaint": 1.5},
+        "errors": {"timing": "TypeError"},
+    }
+
+    metrics = asyncio.get_event_loop().run_until_complete(
+        chrome._extract_performance_metrics(tab, payload)
+    )
+
+    assert metrics["timing"] is None
+    assert metrics["calculated"] == {"firstPaint": 1.5}
+
+
+def test_render_many(chrome):
+
+    urls = [PROD + "/{}/".format(i) for i in range(6)]
+
+    # Earlier URLs are slower, so renders finish in reverse order.
+    chrome.browser = FakeContext({url: 0.01 * (6 - i) for i, url in enumerate(urls)})
+
+    results = chrome.render_many(urls, concurrency=2)
+
+    assert [result["page_data"]["content"]["title"] for result in results] == [
+        [url] for url in urls
+    ]
+    assert all(result["error"] is None for result in results)
+    assert chrome.browser.max_in_flight == 2
+    assert chrome.browser.pages <= 2
+
+
+def test_try_render_page_error(chrome):
+
+    url = PROD + "/a/"
+    chrome.browser = FakeContext(unreachable=[url] * 3)
+
+    # Navigation errors fail the URL once its tries are spent, without raising.
+    result = asyncio.get_event_loop().run_until_complete(chrome._try_render(url))
+
+    assert result == {"page_data": None, "error": "Max tries exhausted for: " + url}
+
+
+def test_page_error_deferred_retry(chrome):
+
+    url = PROD + "/a/"
+    chrome.budget = RunBudget(deferred_retries=1).start()
+    chrome.browser = FakeContext(unreachable=[url])
+    loop = asyncio.get_event_loop()
+
+    class Workers:
+        def map(self, tasks):
+            return [
+                {
+                    "path": path,
+                    **loop.run_until_complete(chrome._try_render(host + path)),
+                }
+                for _, path, host in tasks
+            ]
+
+    # Tried once inline, so the unreachable host fails the first pass.
+    results = {"prod": Workers().map([("host", "/a/", PROD), ("host", "/b/", PROD)])}
+    assert results["prod"][0]["error"] == "Max tries exhausted for: " + url
+
+    _retry_failed(results, {"prod": PROD}, chrome.config, Workers(), chrome.budget, [])
+
+    assert results["prod"][0]["error"] is None
+    assert results["prod"][0]["page_data"]["content"]["title"] == [url]
+    assert chrome.budget.retried == chrome.budget.recovered == 1
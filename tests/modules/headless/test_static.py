@@ -0,0 +1,108 @@
+#! /usr/bin/env python
+# coding: utf-8
+#
+# Copyright (c) 2020 JR Oakes
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+"""Test Cases for Headless > Static Module"""
+
+from seodeploy.lib.config import Config
+from seodeploy.modules.headless.static import StaticRenderer
+from seodeploy.modules.headless.helpers import body_hash, content_fingerprint
+
+HTML = b"""<html><head>
+<title>Page Title</title>
+<meta name="description" content="A description">
+<meta name="robots" content="index, follow">
+<link rel="canonical" href="/page/">
+<script type="application/ld+json">{"@type": "Organization"}</script>
+<script>var hidden = 1;</script>
+</head><body>
+<h1>Main  Heading</h1><h2>Sub</h2>
+<a href="/other/">Other</a><a>No href</a>
+<img src="img.png">
+</body></html>"""
+
+TEXT = "main headingsub otherno href"
+
+
+class FakeResponse:
+    status_code = 200
+    url = "https://locomotive.agency/page/"
+    content = HTML
+    headers = {"Content-Type": "text/html"}
+
+
+def test_static_render(mocker):
+
+    config = Config(module="headless", cfiles=["tests/files/seotesting_config.yaml"])
+    renderer = StaticRenderer(config=config)
+    mocker.patch.object(renderer.session, "get", return_value=FakeResponse())
+
+    result = renderer.render("https://locomotive.agency/page/")
+    page_data = result["page_data"]
+
+    assert result["error"] is None
+    assert page_data["engine"] == "static"
+    assert page_data["status"] == 200
+    assert page_data["headers"] == {"content-type": "text/html"}
+    assert page_data["content"] == {
+        "canonical": ["https://locomotive.agency/page/"],
+        "robots": ["index, follow"],
+        "title": ["Page Title"],
+        "meta_description": ["A description"],
+        "h1": ["Main  Heading"],
+        "h2": ["Sub"],
+        "links": ["https://locomotive.agency/other/", ""],
+        "images": ["https://locomotive.agency/page/img.png"],
+        "schema": [{"@type": "Organization"}],
+        "text": None,
+        "text_hash": content_fingerprint(TEXT)["hash"],
+    }
+    assert page_data["text_minhash"] == content_fingerprint(TEXT)["minhash"]
+    assert page_data["performance"]["first_paint"] is None
+    assert page_data["coverage"]["js"]["total_bytes"] is None
+    assert list(page_data["timings"]) == ["fetch", "parse", "extract_dom", "total"]
+
+
+def test_static_render_text_mode(mocker):
+
+    config = Config(module="headless", cfiles=["tests/files/seotesting_config.yaml"])
+    config.headless.content_mode = "text"
+    renderer = StaticRenderer(config=config)
+    mocker.patch.object(renderer.session, "get", return_value=FakeResponse())
+
+    page_data = renderer.render("https://locomotive.agency/page/")["page_data"]
+
+    assert page_data["content"]["text"] == TEXT
+
+
+def test_static_render_body_hash(mocker):
+
+    config = Config(module="headless", cfiles=["tests/files/seotesting_config.yaml"])
+    config.headless.baseline_cache = {"enabled": True}
+    renderer = StaticRenderer(config=config)
+    mocker.patch.object(renderer.session, "get", return_value=FakeResponse())
+
+    # Pages without an ETag carry the body hash the baseline cache revalidates with.
+    page_data = renderer.render("https://locomotive.agency/page/")["page_data"]
+
+    assert page_data["body_hash"] == body_hash(HTML)
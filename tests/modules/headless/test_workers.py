@@ -0,0 +1,145 @@
+#! /usr/bin/env python
+# coding: utf-8
+#
+# Copyright (c) 2020 JR Oakes
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+"""Test Cases for Headless > Workers Module"""
+
+import time
+
+import pytest
+
+from seodeploy.lib.config import Config
+from seodeploy.modules.headless.pool import BrowserPool
+from seodeploy.modules.headless.workers import (
+    CLOSE_TIMEOUT,
+    RenderWorkers,
+    worker_lanes,
+)
+
+
+@pytest.fixture
+def config(mock_launch, mock_chrome):
+    return Config(module="headless", cfiles=["tests/files/seotesting_config.yaml"])
+
+
+def test_worker_lanes(config):
+
+    config.headless.tab_concurrency = 4
+    config.headless.render_mode = "paired"
+    assert worker_lanes(config) == 2
+
+    config.headless.render_mode = "sequential"
+    assert worker_lanes(config) == 4
+
+    # Paired mode falls back to single renders beyond two environments.
+    config.headless.render_mode = "paired"
+    config.headless.environments = {"stage": None, "canary": "https://canary.test"}
+    assert worker_lanes(config) == 4
+
+
+def test_render_workers(config):
+
+    prod = config.headless.prod_host
+    stage = config.headless.stage_host
+
+    with BrowserPool(config=config, size=2) as pool:
+        with RenderWorkers(config, pool, size=4) as workers:
+
+            # Workers are limited to the pool size.
+            assert workers.size == 2
+
+            tasks = [("host", "/path{}/".format(i), stage) for i in range(10)]
+            tasks += [("paired", "/paired/", prod, stage), ("host", "/crash/", prod)]
+            tasks += [("host", "/broken/", prod)]
+
+            records = workers.map(tasks)
+
+            # A second batch reuses the running workers.
+            assert workers.map([("host", "/again/", prod)])[0]["error"] is None
+
+        restarts = pool.restarts
+
+    assert [r["path"] for r in records[:10]] == [
+        "/path{}/".format(i) for i in range(10)
+    ]
+    assert records[3]["page_data"] == {"url": stage + "/path3/"}
+
+    assert records[10]["prod"] == {"url": prod + "/paired/"}
+    assert records[10]["stage"] == {"url": stage + "/paired/"}
+
+    # Crashes are retried on relaunched browsers, then reported.
+    assert records[11]["page_data"] is None
+    assert "Browser crashed 3 times" in records[11]["error"]
+    assert restarts["crashed"] == 3
+
+    # Unexpected errors fail their task only, and the workers keep running.
+    assert records[12]["page_data"] is None
+    assert records[12]["error"] == "Render error for /broken/: Unexpected error"
+
+
+def test_render_workers_close(config):
+
+    prod = config.headless.prod_host
+
+    with BrowserPool(config=config, size=1) as pool:
+        workers = RenderWorkers(config, pool, size=1).start()
+
+        # Results nobody collects fill the result pipe, and block the worker.
+        path = "/" + "x" * 100000
+        for i in range(4):
+            workers._tasks.put((i, ("host", path, prod)))
+
+        start = time.monotonic()
+        workers.close()
+
+    assert workers.processes == []
+    assert time.monotonic() - start < CLOSE_TIMEOUT
+
+
+def test_render_workers_memory(config, mock_launch, mocker):
+
+    config.headless.browser_max_rss_mb = 1
+    config.headless.browser_recycle_pages = 0
+    prod = config.headless.prod_host
+
+    # Only the first browser is over the memory limit.
+    def rss(pid):
+        return 2 * 1024 * 1024 if pid == 90000 else 1024
+
+    mocker.patch("seodeploy.modules.headless.workers.BROWSER_CHECK_PAGES", 5)
+    mocker.patch("seodeploy.modules.headless.workers.process_tree_rss", rss)
+    mocker.patch("seodeploy.modules.headless.pool.process_tree_rss", rss)
+
+    with BrowserPool(config=config, size=1) as pool:
+        with RenderWorkers(config, pool, size=1) as workers:
+            tasks = [("host", "/path{}/".format(i), prod) for i in range(20)]
+            records = workers.map(tasks)
+
+            # Retired by the worker's own check, while it still runs.
+            restarts = dict(pool.restarts)
+            launched = len(mock_launch)
+
+    assert all(record["error"] is None for record in records)
+    assert restarts == {"crashed": 0, "pages": 0, "memory": 1}
+    assert launched == 2
+    assert mock_launch[0].closed
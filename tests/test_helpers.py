@@ -4,7 +4,7 @@ import pytest
 
 from seodeploy.lib import helpers
 from seodeploy.lib.config import Config
-from seodeploy.lib.exceptions import ModuleNotImplemented
+from seodeploy.lib.exceptions import ModuleNotImplemented, IncorrectConfigException
 
 
 def test_helpers_group_batcher():
@@ -80,3 +80,41 @@ def test_helpers_process_page_data():
         "/path2/": {"prod": ["data2"], "stage": ["data2"], "error": None},
         "/path3/": {"prod": None, "stage": None, "error": "error3"},
     }
+
+
+def test_helpers_get_environments():
+
+    config = Config(module="headless", cfiles=["tests/files/seotesting_config.yaml"])
+
+    environments = helpers.get_environments(config.headless)
+    assert list(environments) == ["prod", "stage"]
+    assert environments["stage"]["auth_user"] == "user"
+
+    config.headless.environments = {
+        "stage": None,
+        "canary": "https://canary.locomotive.agency/",
+    }
+    config.headless.baseline_environment = "stage"
+
+    environments = helpers.get_environments(config.headless)
+    assert list(environments) == ["stage", "prod", "canary"]
+    assert environments["canary"] == {"host": "https://canary.locomotive.agency"}
+
+    config.headless.baseline_environment = "missing"
+    with pytest.raises(IncorrectConfigException):
+        helpers.get_environments(config.headless)
+
+
+def test_helpers_process_environment_data():
+
+    config = Config(module="headless", cfiles=["tests/files/seotesting_config.yaml"])
+    config.headless.environments = {"stage": None, "canary": "https://canary.test"}
+    config.headless.replace_staging_host = False
+
+    data = [{"path": "/path1/", "page_data": ["data1"], "error": None}]
+    results = {"prod": data, "stage": data, "canary": data}
+
+    assert helpers.process_environment_data(["/path1/"], results, config.headless) == {
+        "stage": {"/path1/": {"prod": ["data1"], "stage": ["data1"], "error": None}},
+        "canary": {"/path1/": {"prod": ["data1"], "stage": ["data1"], "error": None}},
+    }